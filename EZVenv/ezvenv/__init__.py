@@ -1 +1,9 @@
-from .core import init_env
+__all__ = ["init_env", "activate"]
+
+
+def __getattr__(name):
+    # Import ezvenv.core on first use so "import ezvenv" stays cheap.
+    if name in __all__:
+        from . import core
+        return getattr(core, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,147 @@
+import os
+import shlex
+import site
+import sys
+
+SHELLS = ("bash", "zsh")
+
+
+def activation_diff(env_path, bin_dir, pythonpath=None):
+    """
+    Compute the environment changes that activate a virtual environment, as a diff
+    against whatever environment it is applied to (the same changes bin/activate makes).
+
+    Parameters:
+        env_path (str): The virtual environment.
+        bin_dir (str): Its scripts directory (bin, or Scripts on Windows).
+        pythonpath (str): An entry to prepend to PYTHONPATH, if any.
+
+    Returns:
+        dict: {"set": {name: value}, "prepend": {name: entry}, "unset": [names]}.
+    """
+    diff = {"set": {"VIRTUAL_ENV": env_path}, "prepend": {"PATH": bin_dir}, "unset": ["PYTHONHOME"]}
+    if pythonpath:
+        diff["prepend"]["PYTHONPATH"] = pythonpath
+    return diff
+
+
+def render(diff):
+    """
+    Render a diff as POSIX shell code (valid for bash and zsh).
+    """
+    lines = []
+    for name, value in diff["set"].items():
+        lines.append(f"export {name}={shlex.quote(value)}")
+    for name, entry in diff["prepend"].items():
+        lines.append(f'export {name}={shlex.quote(entry)}"${{{name}:+:${name}}}"')
+    for name in diff["unset"]:
+        lines.append(f"unset {name}")
+    return "\n".join(lines) + "\n"
+
+
+def cache_path(cache_dir, project_dir):
+    """
+    Return the cached activation script of a project. The name is the project path
+    with "/" replaced by "%", so the shell hook can compute it without a subprocess.
+    """
+    return os.path.join(cache_dir, project_dir.replace("/", "%") + ".sh")
+
+
+def write_cache(cache_dir, project_dir, diff):
+    """
+    Write the rendered diff of a project to its cache file (see cache_path()).
+
+    Returns:
+        str: The rendered diff.
+    """
+    script = render(diff)
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(cache_dir, project_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as file:
+        file.write(script)
+    os.replace(tmp_path, path)
+    return script
+
+
+_HOOK = r'''_ezvenv_deactivate() {
+    PATH=$_EZVENV_OLD_PATH
+    if [ -n "$_EZVENV_HAD_VIRTUAL_ENV" ]; then export VIRTUAL_ENV=$_EZVENV_OLD_VIRTUAL_ENV; else unset VIRTUAL_ENV; fi
+    if [ -n "$_EZVENV_HAD_PYTHONPATH" ]; then export PYTHONPATH=$_EZVENV_OLD_PYTHONPATH; else unset PYTHONPATH; fi
+    if [ -n "$_EZVENV_HAD_PYTHONHOME" ]; then export PYTHONHOME=$_EZVENV_OLD_PYTHONHOME; fi
+    unset _EZVENV_PROJECT _EZVENV_OLD_PATH _EZVENV_OLD_VIRTUAL_ENV _EZVENV_HAD_VIRTUAL_ENV
+    unset _EZVENV_OLD_PYTHONPATH _EZVENV_HAD_PYTHONPATH _EZVENV_OLD_PYTHONHOME _EZVENV_HAD_PYTHONHOME
+    hash -r 2>/dev/null
+}
+
+_ezvenv_hook() {
+    [ "$PWD" = "$_EZVENV_PWD" ] && return
+    _EZVENV_PWD=$PWD
+    local dir=$PWD
+    while [ -n "$dir" ] && [ ! -f "$dir/ezvenv.yaml" ]; do dir=${dir%/*}; done
+    [ "$dir" = "$_EZVENV_PROJECT" ] && return
+    [ -n "$_EZVENV_PROJECT" ] && _ezvenv_deactivate
+    [ -z "$dir" ] && return
+    local cache=__CACHE_DIR__/${dir//\//%}.sh
+    if [ ! "$cache" -nt "$dir/ezvenv.yaml" ]; then
+        __COMMAND__ hook __SHELL__ --project "$dir" >/dev/null 2>&1 || return
+    fi
+    [ -f "$cache" ] || return
+    _EZVENV_PROJECT=$dir
+    _EZVENV_OLD_PATH=$PATH
+    _EZVENV_OLD_VIRTUAL_ENV=${VIRTUAL_ENV-}; _EZVENV_HAD_VIRTUAL_ENV=${VIRTUAL_ENV+1}
+    _EZVENV_OLD_PYTHONPATH=${PYTHONPATH-}; _EZVENV_HAD_PYTHONPATH=${PYTHONPATH+1}
+    _EZVENV_OLD_PYTHONHOME=${PYTHONHOME-}; _EZVENV_HAD_PYTHONHOME=${PYTHONHOME+1}
+    . "$cache"
+    hash -r 2>/dev/null
+}
+'''
+
+_INSTALL = {
+    "bash": 'case ";${PROMPT_COMMAND:-};" in *";_ezvenv_hook;"*) ;; '
+            '*) PROMPT_COMMAND="_ezvenv_hook${PROMPT_COMMAND:+;$PROMPT_COMMAND}" ;; esac\n',
+    "zsh": "autoload -Uz add-zsh-hook\nadd-zsh-hook precmd _ezvenv_hook\n",
+}
+
+
+def hook_script(shell, cache_dir, command):
+    """
+    Return the shell code printed by "ezvenv hook <shell>".
+
+    The hook runs before each prompt but only does work when the directory changed:
+    it looks for the nearest ezvenv.yaml upwards and sources the project's cached
+    activation diff, calling command (once) to write it when it is missing or older
+    than ezvenv.yaml. Leaving the project restores the previous variables.
+    """
+    if shell not in SHELLS:
+        raise ValueError(f"Unsupported shell {shell!r} (supported: {', '.join(SHELLS)})")
+    script = (_HOOK.replace("__CACHE_DIR__", shlex.quote(cache_dir))
+              .replace("__COMMAND__", command)
+              .replace("__SHELL__", shell))
+    return script + _INSTALL[shell]
+
+
+def apply(diff, site_packages):
+    """
+    Activate an environment in the running interpreter: apply the diff to os.environ
+    and put the environment's site-packages (and the PYTHONPATH entry) first on
+    sys.path, like virtualenv's activate_this.py.
+    """
+    for name, value in diff["set"].items():
+        os.environ[name] = value
+    for name, entry in diff["prepend"].items():
+        current = os.environ.get(name, "")
+        parts = [part for part in current.split(os.pathsep) if part and part != entry]
+        os.environ[name] = os.pathsep.join([entry] + parts)
+    for name in diff["unset"]:
+        os.environ.pop(name, None)
+
+    previous = list(sys.path)
+    site.addsitedir(site_packages)
+    pythonpath = diff["prepend"].get("PYTHONPATH")
+    if pythonpath and pythonpath not in sys.path:
+        sys.path.append(pythonpath)
+    added = [entry for entry in sys.path if entry not in previous]
+    sys.path[:] = added + [entry for entry in sys.path if entry not in added]
+    env_path = diff["set"]["VIRTUAL_ENV"]
+    sys.prefix = sys.exec_prefix = env_path
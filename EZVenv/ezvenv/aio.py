@@ -0,0 +1,135 @@
+import asyncio
+import contextvars
+import functools
+import subprocess
+import sys
+import threading
+import time
+
+from . import process, trace
+
+
+async def run(command, check=True, timeout=None, output="stream", prefix=None, cwd=None, env=None):
+    """
+    Run a subprocess on the event loop, so several can run concurrently.
+
+    Parameters:
+        command (list): The command.
+        check (bool): Raise subprocess.CalledProcessError on a non-zero exit status.
+        timeout (float): Seconds before the child is killed and subprocess.TimeoutExpired is raised.
+        output (str): "inherit" (the child writes to our stdout/stderr), "stream"
+          (lines are copied to stdout with prefix) or "capture" (returned only).
+        prefix (str): Prefix of streamed lines (e.g. "[venv] ").
+        cwd (str), env (dict): As for subprocess.
+
+    Returns:
+        subprocess.CompletedProcess: stdout holds the combined output unless output is "inherit".
+
+    Raises:
+        asyncio.CancelledError: If the task is cancelled; the child is killed first.
+    """
+    pipe = None if output == "inherit" else asyncio.subprocess.PIPE
+    start = time.time()
+    wall = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(*command, stdout=pipe,
+                                                stderr=None if pipe is None else asyncio.subprocess.STDOUT,
+                                                cwd=cwd, env=process.child_env(env))
+    lines = []
+
+    async def pump():
+        if proc.stdout is None:
+            return
+        async for raw in proc.stdout:
+            line = raw.decode(errors="replace")
+            lines.append(line)
+            if output == "stream":
+                sys.stdout.write((prefix or "") + line)
+                sys.stdout.flush()
+
+    try:
+        await asyncio.wait_for(asyncio.gather(pump(), proc.wait()), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        await _terminate(proc)
+        trace.record(process._command_name(command), start, time.perf_counter() - wall, "killed",
+                     category="subprocess", command=[str(part) for part in command])
+        if isinstance(e, asyncio.TimeoutError):
+            raise subprocess.TimeoutExpired(command, timeout, output="".join(lines)) from None
+        raise
+    trace.record(process._command_name(command), start, time.perf_counter() - wall,
+                 "ok" if proc.returncode == 0 else f"exit {proc.returncode}",
+                 category="subprocess", command=[str(part) for part in command], exitCode=proc.returncode)
+    result = subprocess.CompletedProcess(command, proc.returncode, None if pipe is None else "".join(lines))
+    if check:
+        result.check_returncode()
+    return result
+
+
+async def _terminate(proc):
+    if proc.returncode is not None:
+        return
+    proc.terminate()
+    try:
+        await asyncio.wait_for(proc.wait(), process.KILL_GRACE)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+
+
+async def call(func, *args, timeout=None, output="inherit", prefix=None, **kwargs):
+    """
+    Run a blocking EZVenv step (e.g. EZVenv.sync) in a worker thread under a
+    process.Scope, so it can be awaited next to other steps.
+
+    Cancelling the awaiting task, or passing the timeout, kills the subprocess the
+    step is running (and any it would start next); the step's own Python work is
+    not interrupted. The step's subprocess output is inherited, streamed with
+    prefix or captured in the scope.
+
+    Returns:
+        The step's return value.
+
+    Raises:
+        subprocess.TimeoutExpired: If the step ran past its timeout.
+        asyncio.CancelledError: If the task was cancelled.
+    """
+    scope = process.Scope(deadline=time.monotonic() + timeout if timeout else None, output=output, prefix=prefix)
+    context = contextvars.copy_context()
+    context.run(process._scope.set, scope)
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(None, context.run, functools.partial(func, *args, **kwargs))
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        scope.cancelled.set()
+        try:
+            await future
+        except BaseException:
+            pass
+        raise
+    except process.Cancelled:
+        raise asyncio.CancelledError() from None
+
+
+def run_sync(coro):
+    """
+    Run a coroutine to completion from synchronous code. Inside a running event
+    loop (e.g. a notebook) it runs on a private loop in a helper thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    result = {}
+
+    def target():
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result.get("value")
@@ -0,0 +1,351 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from urllib.parse import unquote, urlparse
+
+from . import installer, process, store, wheelhouse
+
+
+class Backend:
+    """
+    Base installer backend. A backend installs and removes packages inside the
+    virtual environment of an EZVenv instance; EZVenv selects one from pkgManager.
+    """
+
+    name = None
+
+    def __init__(self, env):
+        self.env = env
+
+    def install(self, args, upgrade=False):
+        """
+        Install requirement arguments into the environment.
+
+        Raises:
+            subprocess.CalledProcessError: If the install fails.
+        """
+        raise NotImplementedError
+
+    def uninstall(self, names):
+        """
+        Remove distributions from the environment.
+
+        Raises:
+            subprocess.CalledProcessError: If the removal fails.
+        """
+        raise NotImplementedError
+
+    def install_locked(self, packages):
+        """
+        Install exact, already-resolved packages from ezvenv.lock without resolution.
+
+        Parameters:
+            packages (list): Lock entries (dicts with name, version, file, url, hash).
+
+        Raises:
+            subprocess.CalledProcessError: If the install fails.
+        """
+        raise NotImplementedError
+
+    def sync_project(self, upgrade=False):
+        """
+        Sync the project with the backend's own project files (pyproject.toml, Pipfile).
+
+        Returns:
+            bool: False if the backend does not manage the project, in which case
+              EZVenv syncs from requirements.txt instead.
+        """
+        return False
+
+
+class PipBackend(Backend):
+    """
+    Installs with the environment's pip, through the local wheelhouse unless it is disabled.
+    """
+
+    name = "pip"
+
+    @property
+    def wheel_dir(self):
+        from .core import WHEEL_DIR
+        return WHEEL_DIR
+
+    @property
+    def store_root(self):
+        """
+        The content-addressed package store, or None if it is disabled.
+        Read-only shared files cannot be deleted on Windows, so it is POSIX only.
+        """
+        if not self.env.useStore or os.name == "nt":
+            return None
+        from .core import STORE_DIR
+        return STORE_DIR
+
+    def install(self, args, upgrade=False):
+        env = self.env
+        pip_executable = env._get_executable_path("pip")
+        before = self._dist_infos()
+        if not env.useWheelhouse:
+            process.run([pip_executable, "install"] + (["--upgrade"] if upgrade else []) + args, check=True)
+        else:
+            wheelhouse.install(pip_executable, args, self.wheel_dir, upgrade=upgrade, offline=env.offline,
+                               max_size=env.wheelhouseMaxSize * 1024 * 1024)
+        if self.store_root:
+            self._dedupe(self._dist_infos() - before)
+
+    def install_locked(self, packages):
+        env = self.env
+        pip_executable = env._get_executable_path("pip")
+        require_hashes = all(package.get("hash") for package in packages)
+        fd, req_path = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(fd, "w") as file:
+            for package in packages:
+                line = f"{package['name']}=={package['version']}"
+                if require_hashes:
+                    line += f" --hash={package['hash']}"
+                file.write(line + "\n")
+        command = [pip_executable, "install", "--no-deps"] + (["--require-hashes"] if require_hashes else [])
+        if env.useWheelhouse:
+            command += ["--find-links", self.wheel_dir] + (["--no-index"] if env.offline else [])
+        before = self._dist_infos()
+        try:
+            with wheelhouse.lock(self.wheel_dir) if env.useWheelhouse else contextlib.nullcontext():
+                process.run(command + ["-r", req_path], check=True)
+        finally:
+            os.remove(req_path)
+        if self.store_root:
+            self._dedupe(self._dist_infos() - before)
+
+    def _dist_infos(self):
+        site_packages = self.env._get_site_packages()
+        if not site_packages:
+            return set()
+        return {entry for entry in os.listdir(site_packages) if entry.endswith(".dist-info")}
+
+    def _dedupe(self, dist_infos):
+        """
+        Move the site-packages files of freshly installed distributions into the
+        store and hardlink them back, so identical files are stored once.
+        """
+        site_packages = self.env._get_site_packages()
+        shared = 0
+        for dist_info in dist_infos:
+            name = dist_info.split("-")[0]
+            for path in installer.recorded_files(site_packages, name):
+                if not path.startswith(site_packages + os.sep) or path.endswith(("RECORD", "INSTALLER")):
+                    continue
+                try:
+                    shared += store.dedupe_file(self.store_root, path)
+                except OSError as e:
+                    logging.warning("Could not share %s through the store: %s", path, str(e))
+        logging.info("Shared %d files of %d distributions through the store.", shared, len(dist_infos))
+
+    def uninstall(self, names):
+        process.run([self.env._get_executable_path("pip"), "uninstall", "-y"] + list(names), check=True)
+
+
+class _ProjectToolBackend(PipBackend):
+    """
+    Shared logic of the poetry and pipenv backends: the project is synced with the
+    tool when its project file exists; plain package installs (core components,
+    requirements.txt projects) go through pip.
+    """
+
+    project_file = None
+    install_command = None
+    update_command = None
+
+    def manages_project(self):
+        return os.path.exists(os.path.join(self.env.envDir, self.project_file))
+
+    def sync_project(self, upgrade=False):
+        if not self.manages_project():
+            return False
+        command = self.update_command if upgrade else self.install_command
+        # Both tools install into the active virtual environment when VIRTUAL_ENV is set.
+        child_env = dict(os.environ, VIRTUAL_ENV=self.env.envPath)
+        print(f"📦 Syncing dependencies with {self.name} ({' '.join(command)})...")
+        process.run(command, cwd=self.env.envDir, env=child_env, check=True)
+        return True
+
+
+class PoetryBackend(_ProjectToolBackend):
+    name = "poetry"
+    project_file = "pyproject.toml"
+    install_command = ["poetry", "install", "--no-root"]
+    update_command = ["poetry", "update"]
+
+    def manages_project(self):
+        path = os.path.join(self.env.envDir, self.project_file)
+        if not os.path.exists(path):
+            return False
+        with open(path, "r") as file:
+            return "[tool.poetry" in file.read()
+
+
+class PipenvBackend(_ProjectToolBackend):
+    name = "pipenv"
+    project_file = "Pipfile"
+    install_command = ["pipenv", "install"]
+    update_command = ["pipenv", "update"]
+
+
+class NativeBackend(PipBackend):
+    """
+    Installs wheels directly from Python, without a pip install subprocess.
+
+    The set of wheels to install is resolved against the local wheelhouse (pip is
+    only used for that resolution, with --dry-run, and to fill the wheelhouse on a
+    miss); the wheels themselves are unpacked in-process by ezvenv.installer.
+    On Windows, where console script launchers are .exe files, pip is used instead.
+    """
+
+    name = "native"
+
+    def install(self, args, upgrade=False):
+        if os.name == "nt":
+            return super().install(args, upgrade=upgrade)
+        env = self.env
+        with wheelhouse.lock(self.wheel_dir):
+            wheels = self.resolve(args, upgrade)
+            try:
+                self.install_wheels(wheels)
+            except (installer.InstallError, OSError) as e:
+                logging.error("Native install failed: %s", str(e))
+                raise subprocess.CalledProcessError(1, ["native-install"] + wheels, stderr=str(e))
+        if env.wheelhouseMaxSize:
+            wheelhouse.evict(self.wheel_dir, env.wheelhouseMaxSize * 1024 * 1024, wait=False)
+
+    def resolve(self, args, upgrade=False):
+        """
+        Resolve requirement arguments to the wheelhouse files that need installing.
+
+        Returns:
+            list: Paths of the wheels to install (already installed, satisfied
+              requirements are not included).
+        """
+        env = self.env
+        pip_executable = env._get_executable_path("pip")
+        if upgrade and not env.offline:
+            wheelhouse.fill(pip_executable, args, self.wheel_dir)
+        try:
+            return self._dry_run(pip_executable, args, upgrade, quiet=not (env.offline or upgrade))
+        except subprocess.CalledProcessError:
+            if env.offline or upgrade:
+                raise
+            wheelhouse.fill(pip_executable, args, self.wheel_dir)
+            return self._dry_run(pip_executable, args, upgrade)
+
+    def _dry_run(self, pip_executable, args, upgrade, quiet=False):
+        wheel_dir = self.wheel_dir
+        fd, report_path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        command = [pip_executable, "install", "--dry-run", "--quiet", "--no-index", "--find-links", wheel_dir,
+                   "--report", report_path] + (["--upgrade"] if upgrade else []) + args
+        try:
+            result = process.run(command, stderr=subprocess.PIPE if quiet else None, text=True)
+            if result.returncode != 0:
+                raise subprocess.CalledProcessError(result.returncode, command, stderr=result.stderr)
+            wheelhouse.touch_used(report_path, wheel_dir)
+            with open(report_path, "r") as file:
+                report = json.load(file)
+        finally:
+            os.remove(report_path)
+        wheels = []
+        for item in report.get("install", []):
+            url = item.get("download_info", {}).get("url", "")
+            path = unquote(urlparse(url).path)
+            if not url.startswith("file:") or not path.endswith(".whl"):
+                raise subprocess.CalledProcessError(1, command, stderr=f"Resolved {url} is not a local wheel")
+            wheels.append(path)
+        return wheels
+
+    def install_locked(self, packages):
+        """
+        Install locked wheels straight from the wheelhouse. Missing wheels are
+        downloaded with "pip download --no-deps"; every wheel is checked against the
+        lock's hash. Packages locked to an sdist are installed with pip.
+        """
+        if os.name == "nt":
+            return super().install_locked(packages)
+        env = self.env
+        pip_executable = env._get_executable_path("pip")
+        wheels = []
+        others = []
+        with wheelhouse.lock(self.wheel_dir):
+            for package in packages:
+                path = os.path.join(self.wheel_dir, package["file"])
+                if not package["file"].endswith(".whl"):
+                    others.append(package)
+                    continue
+                if not os.path.exists(path):
+                    if env.offline:
+                        raise subprocess.CalledProcessError(1, ["native-install"], stderr=f"{package['file']} is not in the wheelhouse")
+                    process.run([pip_executable, "download", "--no-deps", "--only-binary", ":all:",
+                                    "--dest", self.wheel_dir, f"{package['name']}=={package['version']}"], check=True)
+                if package.get("hash") and _file_hash(path) != package["hash"]:
+                    raise subprocess.CalledProcessError(1, ["native-install"], stderr=f"Hash mismatch for {package['file']}")
+                os.utime(path)
+                wheels.append(path)
+            if wheels:
+                try:
+                    self.install_wheels(wheels)
+                except (installer.InstallError, OSError) as e:
+                    logging.error("Native install failed: %s", str(e))
+                    raise subprocess.CalledProcessError(1, ["native-install"] + wheels, stderr=str(e))
+        if others:
+            super().install_locked(others)
+
+    def install_wheels(self, wheels):
+        """
+        Install resolved wheels concurrently (see installer.install_wheels), replacing
+        any installed version of the same distributions.
+        """
+        site_packages = self.env._get_site_packages()
+        scheme = installer.env_scheme(self.env.envPath, site_packages)
+        start = time.perf_counter()
+        installer.install_wheels(wheels, scheme, jobs=self.env.installJobs, store_root=self.store_root)
+        for wheel in wheels:
+            print(f"📦 Installed {os.path.basename(wheel)}")
+        logging.info("Natively installed %d wheels into %s in %.2fs", len(wheels), self.env.envPath,
+                     time.perf_counter() - start)
+
+    def uninstall(self, names):
+        site_packages = self.env._get_site_packages()
+        for name in names:
+            installer.uninstall(site_packages, name)
+
+
+def _file_hash(path):
+    """
+    Return "sha256:<hex>" for a file, in the format used by ezvenv.lock.
+    """
+    sha = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return "sha256:" + sha.hexdigest()
+
+
+BACKENDS = {
+    "pip": PipBackend,
+    "poetry": PoetryBackend,
+    "pipenv": PipenvBackend,
+    "native": NativeBackend,
+}
+
+
+def get_backend(env):
+    """
+    Return the installer backend selected by env.pkgManager (pip if unknown).
+    """
+    backend = BACKENDS.get(env.pkgManager)
+    if backend is None:
+        logging.warning("Unknown package manager %r. Falling back to pip.", env.pkgManager)
+        backend = PipBackend
+    return backend(env)
@@ -0,0 +1,217 @@
+import logging
+import os
+import shutil
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .registry import dir_size
+
+
+def dir_sizes(paths, jobs=None):
+    """
+    Measure several directory trees in parallel. Each tree is split at its top
+    level so a single large environment is also walked by several threads.
+
+    Returns:
+        dict: path -> disk usage in bytes (see registry.dir_size).
+    """
+    tasks = []
+    sizes = {}
+    for path in paths:
+        sizes[path] = 0
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                tasks.append((path, entry.path))
+            else:
+                sizes[path] += st.st_blocks * 512 if hasattr(st, "st_blocks") else st.st_size
+    with ThreadPoolExecutor(max_workers=jobs or min(32, (os.cpu_count() or 1) * 4)) as pool:
+        for (path, _), size in zip(tasks, pool.map(lambda task: dir_size(task[1]), tasks)):
+            sizes[path] += size
+    return sizes
+
+
+def last_use(env, evidence=()):
+    """
+    Return the most recent sign of use of a registered environment: its recorded
+    last use, last sync or creation, or the access/modification time of files read
+    whenever it is used. pyvenv.cfg is read by every interpreter start in the
+    environment and bin/activate by "source bin/activate"; evidence adds others
+    (e.g. the activation cache the shell hook sources). Access times are only as
+    fresh as the filesystem keeps them (relatime updates them at least daily).
+    """
+    stamps = [env.get("last_used") or 0, env.get("last_sync") or 0, env.get("created") or 0]
+    for path in [os.path.join(env["path"], "pyvenv.cfg"), os.path.join(env["path"], "bin", "activate")] + list(evidence):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stamps.append(max(st.st_atime, st.st_mtime))
+    return max(stamps)
+
+
+def select(environments, max_age, max_total, protected=(), now=None, duplicates=False, configured=None):
+    """
+    Pick the environments to delete.
+
+    Parameters:
+        environments (list): Registry rows with a "size" measured just before and,
+          optionally, "last_seen" (see last_use(); computed when missing).
+        max_age (float): Seconds since last use after which an environment is
+          unused; None disables the check.
+        max_total (int): Byte budget for all kept environments; least recently used
+          ones are deleted beyond it. None disables the check.
+        protected (iterable): Environment paths that are never deleted (e.g. the active one).
+        now (float): The current time.
+        duplicates (bool): Also delete every environment of a project except one:
+          its configured environment if registered, else the most recently used.
+        configured (dict): Project directory -> the environment path its config
+          currently selects.
+
+    Returns:
+        list: (row, reason) pairs; reason is "missing" (only the registry row is
+          dropped), "orphaned", "duplicate", "unused" or "over size cap".
+    """
+    now = now or time.time()
+    protected = set(protected)
+    configured = configured or {}
+    selected = []
+    kept = []
+    candidates = []
+    for env in environments:
+        if not os.path.isdir(env["path"]):
+            selected.append((env, "missing"))
+            continue
+        if "last_seen" not in env:
+            env["last_seen"] = last_use(env)
+        if env["path"] in protected:
+            kept.append(env)
+        elif not os.path.isdir(env["project_dir"]):
+            selected.append((env, "orphaned"))
+        else:
+            candidates.append(env)
+
+    if duplicates:
+        protected_projects = {env["project_dir"] for env in kept}
+        by_project = {}
+        for env in candidates:
+            by_project.setdefault(env["project_dir"], []).append(env)
+        candidates = []
+        for project_dir, envs in by_project.items():
+            # One environment per project is kept: the protected one, else the
+            # configured one, else the most recently used.
+            envs.sort(key=lambda env: (env["path"] == configured.get(project_dir), env["last_seen"]), reverse=True)
+            if project_dir not in protected_projects:
+                candidates.append(envs.pop(0))
+            selected.extend((env, "duplicate") for env in envs)
+
+    for env in candidates:
+        if max_age is not None and now - env["last_seen"] > max_age:
+            selected.append((env, "unused"))
+        else:
+            kept.append(env)
+    if max_total is not None:
+        total = sum(env["size"] or 0 for env in kept)
+        for env in sorted(kept, key=lambda env: env["last_seen"]):
+            if total <= max_total:
+                break
+            if env["path"] in protected:
+                continue
+            selected.append((env, "over size cap"))
+            total -= env["size"] or 0
+    return selected
+
+
+def remove_environment(path):
+    """
+    Delete an environment directory. Only directories holding a pyvenv.cfg are
+    removed, so a corrupt registry row can never delete anything else.
+
+    Returns:
+        bool: True if the directory was deleted.
+    """
+    if not os.path.isfile(os.path.join(path, "pyvenv.cfg")):
+        logging.warning("Not deleting %s: it is not a virtual environment.", path)
+        return False
+    shutil.rmtree(path)
+    return True
+
+
+def trim_file(path, max_size):
+    """
+    Keep only the newest max_size bytes (whole lines) of a file such as the log.
+    The file is rewritten in place, so processes appending to it keep logging into it.
+
+    Returns:
+        int: The number of bytes removed.
+    """
+    try:
+        current = os.path.getsize(path)
+    except OSError:
+        return 0
+    if current <= max_size:
+        return 0
+    with open(path, "r+b") as file:
+        file.seek(current - max_size)
+        tail = file.read()
+        newline = tail.find(b"\n")
+        tail = tail[newline + 1:] if newline >= 0 else tail
+        file.seek(0)
+        file.write(tail)
+        file.truncate()
+    return current - len(tail)
+
+
+def prune_store(root, min_age=3600):
+    """
+    Delete store objects no environment links to any more (link count 1). Objects
+    whose inode changed within min_age seconds are kept, since an install may be
+    about to link them.
+
+    Returns:
+        int: The number of bytes freed.
+    """
+    now = time.time()
+    freed = 0
+    objects_dir = os.path.join(root, "objects")
+    if not os.path.isdir(objects_dir):
+        return 0
+    for prefix in os.scandir(objects_dir):
+        for entry in os.scandir(prefix.path):
+            st = entry.stat(follow_symlinks=False)
+            if st.st_nlink == 1 and now - st.st_ctime > min_age:
+                os.remove(entry.path)
+                freed += st.st_size
+    return freed
+
+
+def prune_older_than(directory, max_age, now=None):
+    """
+    Delete the entries (files or directories) of a directory not modified for max_age seconds.
+
+    Returns:
+        int: The number of bytes freed.
+    """
+    now = now or time.time()
+    freed = 0
+    if not os.path.isdir(directory):
+        return 0
+    for entry in os.scandir(directory):
+        st = entry.stat(follow_symlinks=False)
+        if now - st.st_mtime <= max_age:
+            continue
+        if stat.S_ISDIR(st.st_mode):
+            freed += dir_size(entry.path)
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            freed += st.st_size
+            os.remove(entry.path)
+    return freed
@@ -1,25 +1,187 @@
-
 import argparse
-from .core import EZVenv, init_env
+import sys
 
-def main():
+# Commands the ezvenvd daemon may run on behalf of the CLI. "init" stays in-process
+# since it prompts and activates the environment in the calling process.
+DAEMON_COMMANDS = {"install", "update", "rebuild", "rollback", "lock", "list", "show", "gc"}
+
+
+def build_parser():
     parser = argparse.ArgumentParser(description="EZVenv - Python Virtual Environment Manager")
-    # The 'command' is required and must be one of init, install, update.
-    parser.add_argument("command", choices=["init", "install", "update"], help="Command to run")
-    # Optional directory argument for 'init'
-    parser.add_argument("dir", nargs="?", help="Directory to initialize (if omitted, current directory is used)")
-    args = parser.parse_args()
+    # The 'command' is required and must be one of the commands below.
+    parser.add_argument("command", choices=["init", "install", "update", "rebuild", "rollback", "lock", "hook", "list",
+                                                "show", "gc"],
+                        help="Command to run")
+    # Optional directory argument for 'init' and 'show' (the shell name for 'hook')
+    parser.add_argument("dir", nargs="?",
+                        help="Directory to initialize or show (if omitted, current directory is used); "
+                             "for 'hook', the shell (bash or zsh)")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Initialize every project (requirements.txt or ezvenv.yaml) below the directory")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Number of parallel workers for --recursive and gc (default: based on CPU cores)")
+    parser.add_argument("--project", default=None,
+                        help="hook: write and print the cached activation diff of this project directory")
+    parser.add_argument("--dry-run", action="store_true", help="gc: only report what would be deleted")
+    parser.add_argument("--max-age", type=float, default=None,
+                        help="gc: delete environments unused for this many days (default: gcMaxAge, 30)")
+    parser.add_argument("--max-size", type=float, default=None,
+                        help="gc: total size cap for kept environments in MB (default: gcMaxTotalSize)")
+    parser.add_argument("--duplicates", action="store_true",
+                        help="gc: also delete the environments of a project other than its configured one")
+    parser.add_argument("--json", action="store_true", help="list/show: print JSON")
+    parser.add_argument("--trace", metavar="FILE", default=None,
+                        help="Record phase and subprocess timing spans to FILE "
+                             "(JSON lines if it ends with .jsonl, Chrome trace-event JSON otherwise)")
+    parser.add_argument("--no-daemon", action="store_true",
+                        help="Run in-process even if the ezvenvd daemon is running")
+    return parser
+
+
+def run(args):
+    """
+    Run a parsed command in this process.
 
-    if args.command == "init":
+    Returns:
+        int: The exit status.
+    """
+    if args.trace:
+        from . import trace
+        trace.enable(args.trace)
+        with trace.span(f"ezvenv {args.command}"):
+            return _run(args)
+    return _run(args)
+
+
+def _run(args):
+    # Imported after argument parsing so "ezvenv --help" does not pay for it.
+    from .core import EZVenv, garbage_collect, init_env, init_tree
+
+    if args.command == "hook":
+        return hook(args)
+    if args.command in ("list", "show"):
+        return show(args)
+    if args.command == "gc":
+        garbage_collect(max_age=args.max_age, max_total=args.max_size, dry_run=args.dry_run, jobs=args.jobs,
+                        duplicates=args.duplicates)
+        return 0
+    if args.command == "init" and args.recursive:
+        results = init_tree(args.dir or ".", jobs=args.jobs)
+        if not all(results.values()):
+            return 1
+    elif args.command == "init":
         # Pass the optional directory to init_env; interactive checks occur there.
         init_env(env_dir=args.dir)
     else:
-        # For install and update, use the current directory settings.
+        # For install, update, rebuild, rollback and lock, use the current directory settings.
         ezvenv = EZVenv()
         if args.command == "install":
-            ezvenv.install_deps()
+            with ezvenv.build_lock():
+                ezvenv.sync(force=True)
+                ezvenv.register(synced=True, used=True)
         elif args.command == "update":
-            ezvenv.update_deps()
+            with ezvenv.build_lock():
+                ezvenv.sync(upgrade=True, force=True)
+                ezvenv.register(synced=True, used=True)
+        elif args.command == "rebuild":
+            ezvenv.rebuild()
+        elif args.command == "rollback":
+            if not ezvenv.rollback():
+                return 1
+        elif args.command == "lock":
+            if ezvenv.lock() is None:
+                return 1
+            ezvenv._touch_registry()
+    return 0
+
+
+def hook(args):
+    """
+    Print the shell hook (eval "$(ezvenv hook bash)"), or with --project, write and
+    print the cached activation diff the hook sources for that project.
+    """
+    import os
+    import shlex
+    from . import activation
+    from .core import ACTIVATE_CACHE_DIR, EZVenv
+
+    shell = args.dir or "bash"
+    if shell not in activation.SHELLS:
+        print(f"❌ Unsupported shell {shell!r} (supported: {', '.join(activation.SHELLS)}).", file=sys.stderr)
+        return 1
+    if args.project:
+        project_dir = os.path.abspath(args.project)
+        config_file = os.path.join(project_dir, "ezvenv.yaml")
+        ezvenv = EZVenv(config_file=config_file if os.path.exists(config_file) else None, env_dir=project_dir)
+        script = ezvenv.write_activation_cache()
+        if script is None:
+            return 1
+        ezvenv._touch_registry()
+        print(script, end="")
+        return 0
+    command = f"{shlex.quote(sys.executable)} -m ezvenv.cli"
+    print(activation.hook_script(shell, ACTIVATE_CACHE_DIR, command), end="")
+    return 0
+
+
+def _format_size(size):
+    for unit in ("B", "K", "M", "G"):
+        if size < 1024 or unit == "G":
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+
+
+def _format_time(timestamp):
+    import time
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp)) if timestamp else "-"
+
+
+def show(args):
+    """
+    Print the registered environments ("list"), or the environments of one project
+    or environment directory ("show [dir]").
+    """
+    import json
+    import os
+    from . import registry
+    from .core import REGISTRY_DB
+
+    if args.command == "list":
+        environments = registry.list_environments(REGISTRY_DB)
+    else:
+        environments = registry.find(REGISTRY_DB, os.path.abspath(args.dir or "."))
+        if not environments:
+            print(f"❌ No registered environment for {os.path.abspath(args.dir or '.')}.", file=sys.stderr)
+            return 1
+    if args.json:
+        print(json.dumps(environments, indent=2))
+    elif args.command == "list":
+        print(f"{'LAST USED':<17} {'LAST SYNC':<17} {'SIZE':>7} {'PYTHON':<8} PATH")
+        for env in environments:
+            exists = "" if os.path.isdir(env["path"]) else "  (missing)"
+            print(f"{_format_time(env['last_used']):<17} {_format_time(env['last_sync']):<17} "
+                  f"{_format_size(env['size'] or 0):>7} {env['python_version'] or '-':<8} {env['path']}{exists}")
+    else:
+        for env in environments:
+            for column in registry.COLUMNS:
+                value = env[column]
+                if column in ("created", "last_used", "last_sync"):
+                    value = _format_time(value)
+                elif column == "size":
+                    value = _format_size(value or 0)
+                print(f"{column + ':':<19} {value if value is not None else '-'}")
+            print()
+    return 0
+
+
+def main():
+    args = build_parser().parse_intermixed_args()
+    if args.command in DAEMON_COMMANDS and not args.no_daemon:
+        from .daemon import client_run
+        status = client_run(sys.argv[1:])
+        if status is not None:
+            sys.exit(status)
+    sys.exit(run(args))
 
 if __name__ == "__main__":
     main()
@@ -1,24 +1,283 @@
+import hashlib
 import os
+import re
 import subprocess
 import sys
 import shutil
-import yaml
-import json
 import logging
+import time
+
+from . import process, trace
+
+# yaml, json and the helper modules (template, backends, ...) are imported where they
+# are used, so "import ezvenv.core" stays cheap for scripts that are already activated.
 
 # Determine the user's home directory and config directory
 HOME_DIR = os.path.expanduser("~")
 CONFIG_DIR = os.path.join(HOME_DIR, ".EZVenv")
-if not os.path.exists(CONFIG_DIR):
+_LOG_FILE_ = os.path.join(CONFIG_DIR, "ezvenv.log")
+_SETUP_DONE = False
+
+
+# Rotated copies of the log kept next to it (ezvenv.log.1 ...); see ezvenv.logs.
+LOG_BACKUPS = 3
+
+
+def _setup():
+    """
+    Create the config directory and set up logging on first use.
+
+    The log file is placed inside the config directory for persistence. Records are
+    written by a background thread (see ezvenv.logs) and the file is rotated at
+    "logMaxSize" MB. This runs when an EZVenv instance is created (or a tree init
+    starts) rather than at import time, so importing ezvenv has no filesystem or
+    logging side effects.
+    """
+    global _SETUP_DONE
+    if _SETUP_DONE:
+        return
+    _SETUP_DONE = True
+    from . import logs
     os.makedirs(CONFIG_DIR, exist_ok=True)
+    logs.configure(_LOG_FILE_, 10 * 1024 * 1024, LOG_BACKUPS)
 
-# Set up logging: Log file is placed inside the config directory for persistence.
-_LOG_FILE_ = os.path.join(CONFIG_DIR, "ezvenv.log")
-logging.basicConfig(
-    filename=_LOG_FILE_,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+# Core packages kept up to date in every virtual environment.
+CORE_PACKAGES = ["pip", "setuptools", "pyyaml"]
+
+# State file written inside each virtual environment (requirements fingerprints, etc.).
+STATE_FILE = "ezvenv-state.json"
+
+# Cached base virtual environments, one per interpreter, cloned by create_env.
+TEMPLATE_DIR = os.path.join(CONFIG_DIR, "templates")
+TEMPLATE_MAX_AGE = 7 * 24 * 3600
+
+# Local wheelhouse used by the pip and native backends (see ezvenv.wheelhouse).
+WHEEL_DIR = os.path.join(CONFIG_DIR, "wheels")
+
+# Content-addressed store of installed files, hardlinked into environments (see ezvenv.store).
+STORE_DIR = os.path.join(CONFIG_DIR, "store")
+
+# Persistent resolver results (see EZVenv._resolve_cached and ezvenv.resolvecache).
+RESOLVE_CACHE_DIR = os.path.join(CONFIG_DIR, "cache", "resolve")
+
+# Parsed config files, keyed by path and invalidated by mtime/size (see load_config).
+CONFIG_CACHE_DIR = os.path.join(CONFIG_DIR, "cache", "config")
+
+# Package index pages and wheel metadata, revalidated with ETag/Last-Modified (see ezvenv.indexcache).
+INDEX_CACHE_DIR = os.path.join(CONFIG_DIR, "cache", "index")
+
+# Cached activation diffs read by the "ezvenv hook" shell hook (see ezvenv.activation).
+ACTIVATE_CACHE_DIR = os.path.join(CONFIG_DIR, "cache", "activate")
+
+# SQLite registry of every environment EZVenv created (see ezvenv.registry).
+REGISTRY_DB = os.path.join(CONFIG_DIR, "registry.db")
+
+# Per-environment build locks and the state of the latest build (see ezvenv.envlock).
+BUILD_LOCK_DIR = os.path.join(CONFIG_DIR, "locks")
+
+# The local index proxy of this process, started on first use (see EZVenv._start_index_cache).
+_INDEX_PROXY = None
+
+# Matches "name[extras] specifier" requirement lines.
+_REQUIREMENT_RE = re.compile(r"^([A-Za-z0-9][A-Za-z0-9._-]*)\s*(\[[^\]]*\])?\s*(.*)$")
+
+
+def _normalize_name(name):
+    """
+    Normalize a distribution name as described in PEP 503.
+    """
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _parse_requirements(reqPath):
+    """
+    Parse the simple "name[extras] specifier" lines of a requirements file.
+
+    Parameters:
+        reqPath (str): Path to the requirements.txt file.
+
+    Returns:
+        tuple: (list of (normalized name, specifier, original line), complete), where
+          complete is False if the file contains lines that cannot be diffed locally
+          (pip options, URLs, environment markers).
+    """
+    requirements = []
+    complete = True
+    with open(reqPath, "r") as file:
+        for raw in file:
+            line = raw.split(" #", 1)[0].strip()
+            if not line or line.startswith("#"):
+                continue
+            match = _REQUIREMENT_RE.match(line)
+            if line.startswith("-") or "://" in line or ";" in line or "@" in line or not match:
+                complete = False
+                continue
+            requirements.append((_normalize_name(match.group(1)), match.group(3).replace(" ", ""), line))
+    return requirements, complete
+
+
+def _version_satisfies(version, spec):
+    """
+    Check whether an installed version satisfies a requirement specifier.
+
+    Returns:
+        bool: True if satisfied. Unknown versions, or specifiers that cannot be evaluated
+          because the "packaging" library is unavailable, count as unsatisfied.
+    """
+    if not spec:
+        return True
+    if version is None:
+        return False
+    try:
+        from packaging.specifiers import SpecifierSet
+    except ImportError:
+        try:
+            from pip._vendor.packaging.specifiers import SpecifierSet
+        except ImportError:
+            return False
+    try:
+        return SpecifierSet(spec).contains(version, prereleases=True)
+    except Exception:
+        return False
+
+
+def _config_cache_path(config_file):
+    """
+    Return the path of the parsed-config cache entry for a config file.
+    """
+    key = hashlib.sha256(os.path.abspath(config_file).encode()).hexdigest()[:32]
+    return os.path.join(CONFIG_CACHE_DIR, key + ".marshal")
+
+
+# Parsed configs kept in memory by path (see _read_config_cache); the ezvenvd
+# daemon fills it once so every command it serves starts with it warm.
+_CONFIG_MEMO = {}
+
+# shutil.which() results by (name, PATH): (time, path), see _which.
+_WHICH_MEMO = {}
+_WHICH_MEMO_TTL = 60
+
+
+def _which(name):
+    """
+    shutil.which() memoized per PATH, so repeated tool probes (detect_pkg_manager)
+    only search PATH once. Results expire after _WHICH_MEMO_TTL seconds, or as soon
+    as a found tool is gone, so a long-running ezvenvd notices tools installed or
+    removed after it started.
+    """
+    key = (name, os.environ.get("PATH", ""))
+    memo = _WHICH_MEMO.get(key)
+    if memo is None or time.time() - memo[0] > _WHICH_MEMO_TTL or (memo[1] and not os.path.exists(memo[1])):
+        memo = _WHICH_MEMO[key] = (time.time(), shutil.which(name))
+    return memo[1]
+
+
+def _read_config_cache(config_file, stat):
+    """
+    Return the cached parsed config if it matches the file's mtime and size,
+    from memory or from CONFIG_DIR/cache/config.
+
+    Returns:
+        dict or None: The cached config, or None on a miss.
+    """
+    import marshal
+    memo = _CONFIG_MEMO.get(os.path.abspath(config_file))
+    if memo and memo["mtime"] == stat.st_mtime_ns and memo["size"] == stat.st_size:
+        return dict(memo["config"])
+    try:
+        with open(_config_cache_path(config_file), "rb") as file:
+            entry = marshal.load(file)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if entry.get("mtime") != stat.st_mtime_ns or entry.get("size") != stat.st_size:
+        return None
+    _CONFIG_MEMO[os.path.abspath(config_file)] = entry
+    return dict(entry.get("config"))
+
+
+def _write_config_cache(config_file, stat, config):
+    """
+    Store a parsed config in the cache. Configs holding values that marshal cannot
+    serialize (e.g. YAML timestamps) are simply not cached.
+    """
+    import marshal
+    entry = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "config": config}
+    _CONFIG_MEMO[os.path.abspath(config_file)] = entry
+    cachePath = _config_cache_path(config_file)
+    try:
+        data = marshal.dumps(entry)
+        os.makedirs(CONFIG_CACHE_DIR, exist_ok=True)
+        tmpPath = f"{cachePath}.{os.getpid()}.tmp"
+        with open(tmpPath, "wb") as file:
+            file.write(data)
+        os.replace(tmpPath, cachePath)
+    except (OSError, ValueError) as e:
+        logging.info("Not caching config %s: %s", config_file, str(e))
+
+
+def _pyvenv_cfg(envPath):
+    """
+    Read the key/value pairs of a virtual environment's pyvenv.cfg.
+    """
+    values = {}
+    try:
+        with open(os.path.join(envPath, "pyvenv.cfg"), "r") as file:
+            for line in file:
+                key, _, value = line.partition("=")
+                values[key.strip()] = value.strip()
+    except OSError:
+        pass
+    return values
+
+
+def _system_site_packages_enabled(envPath):
+    """
+    Check whether a virtual environment includes the system site-packages.
+    """
+    return _pyvenv_cfg(envPath).get("include-system-site-packages", "").lower() == "true"
+
+
+def _site_packages_provide(site_packages, package):
+    """
+    Check whether a top-level package is importable from a site-packages directory,
+    by looking at the directory itself, installed metadata (*.dist-info, *.egg-info,
+    *.egg-link) and the paths or editable finders listed in *.pth files.
+
+    Parameters:
+        site_packages (str): The site-packages directory.
+        package (str): The top-level package name (e.g. "ezvenv").
+
+    Returns:
+        bool: True if the package is provided.
+    """
+    if os.path.exists(os.path.join(site_packages, package, "__init__.py")):
+        return True
+    if os.path.exists(os.path.join(site_packages, package + ".py")):
+        return True
+    for entry in os.listdir(site_packages):
+        if _normalize_name(entry.split("-")[0].split(".")[0]) == _normalize_name(package) \
+                and entry.endswith((".dist-info", ".egg-info", ".egg-link")):
+            return True
+        if not entry.endswith(".pth"):
+            continue
+        try:
+            with open(os.path.join(site_packages, entry), "r") as file:
+                lines = file.read().splitlines()
+        except OSError:
+            continue
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("import"):
+                # Editable installs register an import hook from a .pth file named after the project.
+                if package in entry.lower():
+                    return True
+                continue
+            path = os.path.join(site_packages, line)
+            if os.path.exists(os.path.join(path, package, "__init__.py")):
+                return True
+    return False
 
 
 class EZVenv:
@@ -40,6 +299,7 @@ class EZVenv:
             auto_activate (bool): If True, the script will automatically re-exec
               itself with the environment's Python interpreter if not already activated.
         """
+        _setup()
         # Set default config file path if not provided.
         self.configFile = config_file or os.path.join(CONFIG_DIR, "ezvenv.yaml")
         self.config = self.load_config()
@@ -55,10 +315,33 @@ class EZVenv:
 
         # Detect package manager from config or by auto-detecting available tools.
         self.pkgManager = self.detect_pkg_manager()
+        self._backend = None
+        # Set while a new build is staged next to envPath (see _build_staged_async).
+        self._staging = False
         self.autoInstall = self.config.get("autoInstall", True)
         self.autoUpdate = self.config.get("autoUpdate", True)
+        self.useTemplate = self.config.get("useTemplate", True)
+        self.useWheelhouse = self.config.get("useWheelhouse", True)
+        self.wheelhouseMaxSize = self.config.get("wheelhouseMaxSize", 2048)
+        self.offline = self.config.get("offline", False)
+        self.installJobs = self.config.get("installJobs", None)
+        self.useStore = self.config.get("useStore", True)
+        self.resolveCacheTTL = self.config.get("resolveCacheTTL", 24 * 3600)
+        self.resolveCacheMaxEntries = self.config.get("resolveCacheMaxEntries", 500)
+        self.useIndexCache = self.config.get("useIndexCache", False)
+        self.indexUrl = self.config.get("indexUrl", None)
+        self.indexCacheMaxAge = self.config.get("indexCacheMaxAge", 600)
+        self.indexCacheMaxSize = self.config.get("indexCacheMaxSize", 256)
+        self.gcMaxAge = self.config.get("gcMaxAge", 30)
+        self.gcMaxTotalSize = self.config.get("gcMaxTotalSize", None)
+        self.logMaxSize = self.config.get("logMaxSize", 10)
+        self.logFormat = self.config.get("logFormat", "text")
         self.autoActivate = auto_activate
 
+        from . import logs
+        logs.configure(_LOG_FILE_, self.logMaxSize * 1024 * 1024, LOG_BACKUPS, self.logFormat)
+        logs.bind(self.envPath)
+
         if save_defaults:
             self.save_config()
 
@@ -66,20 +349,33 @@ class EZVenv:
         """
         Load configuration from the YAML (or JSON) file.
 
+        A parsed copy is cached under CONFIG_DIR/cache/config, keyed by the file's
+        path, mtime and size, so unchanged files (e.g. on every auto-activation
+        re-exec) are loaded without running the YAML parser. The libyaml C loader
+        is used when available.
+
         Returns:
             dict: Configuration settings.
         """
         if os.path.exists(self.configFile):
             try:
+                stat = os.stat(self.configFile)
+                cached = _read_config_cache(self.configFile, stat)
+                if cached is not None:
+                    logging.info("Configuration loaded from %s (cached)", self.configFile)
+                    return cached
                 with open(self.configFile, "r") as file:
                     if self.configFile.endswith(".json"):
+                        import json
                         config = json.load(file)
                     elif self.configFile.endswith(".yaml") or self.configFile.endswith(".yml"):
-                        config = yaml.safe_load(file)
+                        import yaml
+                        config = yaml.load(file, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
                     else:
                         config = {}
                     logging.info("Configuration loaded from %s", self.configFile)
-                    return config or {}
+                _write_config_cache(self.configFile, stat, config or {})
+                return config or {}
             except Exception as e:
                 logging.error("Error loading config file: %s", str(e))
                 print("⚠️ Error reading config file. Using default settings.")
@@ -98,8 +394,25 @@ class EZVenv:
             "pythonVer": self.pythonVer,
             "autoInstall": self.autoInstall,
             "autoUpdate": self.autoUpdate,
+            "useTemplate": self.useTemplate,
+            "useWheelhouse": self.useWheelhouse,
+            "wheelhouseMaxSize": self.wheelhouseMaxSize,
+            "offline": self.offline,
+            "installJobs": self.installJobs,
+            "useStore": self.useStore,
+            "resolveCacheTTL": self.resolveCacheTTL,
+            "resolveCacheMaxEntries": self.resolveCacheMaxEntries,
+            "useIndexCache": self.useIndexCache,
+            "indexUrl": self.indexUrl,
+            "indexCacheMaxAge": self.indexCacheMaxAge,
+            "indexCacheMaxSize": self.indexCacheMaxSize,
+            "gcMaxAge": self.gcMaxAge,
+            "gcMaxTotalSize": self.gcMaxTotalSize,
+            "logMaxSize": self.logMaxSize,
+            "logFormat": self.logFormat,
             "pkgManager": self.pkgManager
         }
+        import yaml
         try:
             with open(self.configFile, "w") as file:
                 yaml.dump(config_data, file, default_flow_style=False)
@@ -112,16 +425,19 @@ class EZVenv:
         """
         Detect which package manager to use.
 
+        Set "pkgManager: native" in the config to install wheels in-process
+        instead of with a pip subprocess (see ezvenv.backends.NativeBackend).
+
         Returns:
-            str: Package manager name ("poetry", "pipenv", or "pip").
+            str: Package manager name ("poetry", "pipenv", "pip" or "native").
         """
         manager = self.config.get("pkgManager", "auto")
         if manager != "auto":
             return manager
         # Auto-detect available package managers in order of preference.
-        if shutil.which("poetry"):
+        if _which("poetry"):
             return "poetry"
-        if shutil.which("pipenv"):
+        if _which("pipenv"):
             return "pipenv"
         return "pip"
 
@@ -143,19 +459,29 @@ class EZVenv:
             # On Unix-like systems, executables are located in the bin directory.
             return os.path.join(self.envPath, "bin", executable)
 
+    @trace.span("create_env")
     def create_env(self):
         """
         Create the virtual environment if it does not exist.
         If the environment exists, log the occurrence and proceed gracefully.
+
+        New environments are cloned from a cached per-interpreter template under
+        CONFIG_DIR/templates when possible, which skips both "python -m venv" and
+        the core component upgrade. Set "useTemplate: false" in the config to disable.
         """
         if os.path.exists(self.envPath):
             logging.info("Virtual environment already exists at %s", self.envPath)
             print(f"✅ Virtual environment already exists at {self.envPath}.")
+        elif self._clone_from_template():
+            # The template already carries up-to-date core components.
+            print(f"🟢 Virtual environment is ready: {self.envPath}")
+            self.register()
+            return
         else:
             try:
                 logging.info("Creating virtual environment at %s using Python %s.", self.envPath, self.pythonVer)
                 print(f"🔧 Creating virtual environment at {self.envPath} using Python {self.pythonVer}...")
-                subprocess.run([self.pythonVer, "-m", "venv", self.envPath], check=True)
+                process.run([self.pythonVer, "-m", "venv", self.envPath], check=True)
             except subprocess.CalledProcessError as e:
                 logging.error("Failed to create virtual environment: %s", str(e))
                 print("❌ Failed to create virtual environment.")
@@ -163,71 +489,705 @@ class EZVenv:
         print(f"🟢 Virtual environment is ready: {self.envPath}")
         # After ensuring the environment exists, update core components.
         self.update_core_components()
+        self.register()
+
+    @trace.span("register")
+    def register(self, synced=False, used=False):
+        """
+        Record the environment in the registry (CONFIG_DIR/registry.db) in a single
+        transaction: path, project directory, interpreter, Python version and size,
+        plus the requirements hash and sync time after a sync and the last-use time
+        after an activation. Registry errors are logged and never fail a build.
+
+        The size is only measured again when site-packages changed (its mtime moves
+        whenever a distribution is added or removed) since the last measurement, so
+        registering an unchanged environment does not walk it.
+
+        Parameters:
+            synced (bool): Dependencies were just synced.
+            used (bool): The environment was just activated.
+        """
+        import sqlite3
+        from . import registry
+        if self._staging:
+            # Staged builds are registered once they are swapped in.
+            return
+        pyvenv = _pyvenv_cfg(self.envPath)
+        if not pyvenv:
+            return
+        now = time.time()
+        fields = {
+            "interpreter": pyvenv.get("executable") or pyvenv.get("home"),
+            "python_version": pyvenv.get("version") or pyvenv.get("version_info"),
+        }
+        site_packages = self._get_site_packages()
+        size_stamp = os.stat(site_packages).st_mtime_ns if site_packages else None
+        if size_stamp is None or self._read_state().get("sizeStamp") != size_stamp:
+            fields["size"] = registry.dir_size(self.envPath)
+            self._write_state(sizeStamp=size_stamp)
+        if synced:
+            from .lock import requirements_hash
+            reqPath = os.path.join(self.envDir, "requirements.txt")
+            fields["requirements_hash"] = requirements_hash(reqPath) if os.path.exists(reqPath) else None
+            fields["last_sync"] = now
+        if used:
+            fields["last_used"] = now
+        try:
+            registry.record(REGISTRY_DB, self.envPath, self.envDir, **fields)
+        except (sqlite3.Error, OSError) as e:
+            logging.warning("Failed to update the environment registry: %s", str(e))
+
+    def _touch_registry(self):
+        """
+        Update the environment's last-use time in the registry.
+        """
+        import sqlite3
+        from . import registry
+        try:
+            registry.touch(REGISTRY_DB, self.envPath)
+        except (sqlite3.Error, OSError) as e:
+            logging.warning("Failed to update the environment registry: %s", str(e))
+
+    def _clone_from_template(self):
+        """
+        Create the virtual environment by cloning the cached base template for
+        the selected interpreter (see ezvenv.template).
 
+        Returns:
+            bool: True if the environment was cloned, False if the caller should
+              fall back to "python -m venv" (templates disabled, unsupported
+              platform, or the template could not be built/cloned).
+        """
+        if not self.useTemplate or os.name == "nt":
+            return False
+        from . import template
+        try:
+            template_path = template.ensure_template(
+                self.pythonVer, TEMPLATE_DIR, CORE_PACKAGES, TEMPLATE_MAX_AGE, lock_dir=BUILD_LOCK_DIR)
+            start = time.perf_counter()
+            with template.using(template_path, BUILD_LOCK_DIR):
+                template.clone_template(template_path, self.envPath)
+        except Exception as e:
+            logging.warning("Template clone failed, falling back to venv: %s", str(e))
+            shutil.rmtree(self.envPath, ignore_errors=True)
+            return False
+        logging.info("Cloned virtual environment at %s from template %s in %.2fs.",
+                     self.envPath, template_path, time.perf_counter() - start)
+        print(f"⚡ Cloned virtual environment at {self.envPath} from cached template.")
+        return True
+
+    @trace.span("update_core_components")
     def update_core_components(self):
         """
         Update core packages (pip, setuptools, etc.) within the virtual environment.
         This ensures that the environment is up-to-date.
+
+        All core packages are upgraded in a single pip invocation so the interpreter
+        startup and index resolution are paid once. If the batched run fails, each
+        package is retried on its own so failures are still reported per package.
         """
-        core_packages = ["pip", "setuptools", "pyyaml"]
         print("🔄 Updating core components...")
-        pip_executable = self._get_executable_path("pip")
-        for package in core_packages:
+        start = time.perf_counter()
+        try:
+            self._install_packages(CORE_PACKAGES, upgrade=True)
+            failed = []
+        except subprocess.CalledProcessError as e:
+            logging.warning("Batched core update failed (%s). Retrying packages individually.", str(e))
+            failed = self._update_core_individually()
+        elapsed = time.perf_counter() - start
+        logging.info("Core components updated in %.2fs (%d packages, %d failed).",
+                     elapsed, len(CORE_PACKAGES), len(failed))
+        if not failed:
+            print(f"✅ Core components updated in {elapsed:.2f}s.")
+        elif len(failed) == len(CORE_PACKAGES):
+            print(f"❌ Failed to update core components ({', '.join(failed)}) in {elapsed:.2f}s.")
+        else:
+            print(f"⚠️ Core components partially updated in {elapsed:.2f}s; failed: {', '.join(failed)}.")
+
+    def _get_backend(self):
+        """
+        Return the installer backend selected by pkgManager (see ezvenv.backends).
+        """
+        if self._backend is None:
+            from .backends import get_backend
+            self._start_index_cache()
+            self._backend = get_backend(self)
+        return self._backend
+
+    def _start_index_cache(self):
+        """
+        Route the index traffic of every pip subprocess (installs, resolution,
+        wheelhouse fills) through a local caching proxy when "useIndexCache" is set.
+
+        The proxy serves the upstream index ("indexUrl", else PIP_INDEX_URL, else PyPI)
+        from CONFIG_DIR/cache/index: project pages are revalidated with
+        ETag/Last-Modified after "indexCacheMaxAge" seconds and wheel metadata is kept
+        as is. The cache is compacted to "indexCacheMaxSize" MB when the proxy starts.
+        It is started once per process and handed to the subprocesses EZVenv starts
+        through PIP_INDEX_URL; our own environment is left alone, so a shell or script
+        activate_env() execs into never points pip at the proxy.
+        """
+        global _INDEX_PROXY
+        if not self.useIndexCache or self.offline or _INDEX_PROXY is not None:
+            return
+        from . import indexcache
+        try:
+            cache = indexcache.IndexCache(INDEX_CACHE_DIR, max_age=self.indexCacheMaxAge)
+            cache.compact(self.indexCacheMaxSize * 1024 * 1024)
+            _INDEX_PROXY = indexcache.IndexProxy(
+                cache, self.indexUrl or os.environ.get("PIP_INDEX_URL") or indexcache.DEFAULT_INDEX_URL).start()
+        except OSError as e:
+            logging.warning("Could not start the index cache: %s", str(e))
+            return
+        process.set_env("PIP_INDEX_URL", _INDEX_PROXY.url)
+        logging.info("Serving %s through the index cache at %s", _INDEX_PROXY.upstream, _INDEX_PROXY.url)
+
+    def _install_packages(self, args, upgrade=False):
+        """
+        Install packages inside the virtual environment with the selected backend.
+
+        Parameters:
+            args (list): Requirement arguments passed to the backend.
+            upgrade (bool): Upgrade to the newest allowed versions.
+
+        Raises:
+            subprocess.CalledProcessError: If the install fails.
+        """
+        self._get_backend().install(args, upgrade=upgrade)
+
+    def _update_core_individually(self):
+        """
+        Fallback for update_core_components: upgrade each core package on its own.
+
+        Returns:
+            list: The names of the packages that failed to update.
+        """
+        failed = []
+        for package in CORE_PACKAGES:
             try:
-                subprocess.run([pip_executable, "install", "--upgrade", package], check=True)
+                self._install_packages([package], upgrade=True)
             except subprocess.CalledProcessError as e:
                 logging.error("Failed to update package %s: %s", package, str(e))
                 print(f"❌ Failed to update {package}.")
-        print("✅ Core components updated.")
+                failed.append(package)
+        return failed
 
-    def install_deps(self):
+    def _get_site_packages(self):
         """
-        Install dependencies listed in the requirements.txt file, if it exists.
+        Locate the site-packages directory of the virtual environment.
+
+        Returns:
+            str or None: The site-packages path, or None if it cannot be found.
         """
-        reqPath = os.path.join(self.envDir, "requirements.txt")
-        pip_executable = self._get_executable_path("pip")
-        if os.path.exists(reqPath):
-            print(f"📦 Installing dependencies from {reqPath}...")
-            try:
-                subprocess.run([pip_executable, "install", "-r", reqPath], check=True)
-                logging.info("Dependencies installed successfully.")
-            except subprocess.CalledProcessError as e:
-                logging.error("Failed to install dependencies: %s", str(e))
-                print("❌ Failed to install dependencies.")
+        if os.name == "nt":
+            candidates = [os.path.join(self.envPath, "Lib", "site-packages")]
         else:
-            print("⚠️ No requirements.txt found in the project directory. Skipping dependency installation.")
+            import glob
+            candidates = sorted(glob.glob(os.path.join(self.envPath, "lib", "python*", "site-packages")))
+        for candidate in candidates:
+            if os.path.isdir(candidate):
+                return candidate
+        return None
 
-    def update_deps(self):
+    def _deps_fingerprint(self, reqPath):
         """
-        Update project dependencies using the requirements.txt file if it exists.
+        Compute a fingerprint of the dependency state of the environment.
+
+        The fingerprint covers the content of requirements.txt (and ezvenv.lock),
+        the environment's interpreter, and the set of installed distributions (read from the
+        *.dist-info / *.egg-info entries in site-packages, so pip is not started).
+
+        Parameters:
+            reqPath (str): Path to the requirements.txt file.
 
-        This method:
-          - Constructs the absolute path to requirements.txt based on the project directory.
-          - Checks if the file exists. If not, it prints a warning and skips the update.
-          - If the file exists, it uses the pip executable from the virtual environment to update dependencies.
-          - Handles errors gracefully, logging them and informing the user.
+        Returns:
+            str: A hex digest identifying the current state.
         """
-        # Construct the absolute path to the requirements.txt file in the project directory.
-        reqPath = os.path.join(self.envDir, "requirements.txt")
+        digest = hashlib.sha256()
+        with open(reqPath, "rb") as file:
+            digest.update(file.read())
+        env_python = self._get_executable_path("python")
+        digest.update(os.path.realpath(env_python).encode())
+        for path in (os.path.join(self.envPath, "pyvenv.cfg"), self._lock_path()):
+            if os.path.exists(path):
+                with open(path, "rb") as file:
+                    digest.update(file.read())
+        site_packages = self._get_site_packages()
+        if site_packages:
+            for entry in sorted(os.listdir(site_packages)):
+                if entry.endswith((".dist-info", ".egg-info")):
+                    digest.update(entry.encode() + b"\0")
+        return digest.hexdigest()
 
-        # Obtain the correct pip executable from the project's virtual environment.
-        pip_executable = self._get_executable_path("pip")
+    def _read_state(self):
+        """
+        Read the EZVenv state file stored inside the virtual environment.
+
+        Returns:
+            dict: The stored state, or an empty dict if none is available.
+        """
+        import json
+        statePath = os.path.join(self.envPath, STATE_FILE)
+        try:
+            with open(statePath, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_state(self, **updates):
+        """
+        Merge the given keys into the EZVenv state file inside the virtual environment.
+        """
+        import json
+        state = self._read_state()
+        state.update(updates)
+        statePath = os.path.join(self.envPath, STATE_FILE)
+        try:
+            with open(statePath, "w") as file:
+                json.dump(state, file, indent=2)
+        except OSError as e:
+            logging.warning("Failed to write state file %s: %s", statePath, str(e))
+
+    def _deps_satisfied(self, reqPath, stages):
+        """
+        Check whether a previous install/update already matches the current state.
+
+        Parameters:
+            reqPath (str): Path to the requirements.txt file.
+            stages (tuple): State keys ("install", "update") that count as satisfied.
+
+        Returns:
+            bool: True if the stored fingerprint of any of the stages is still current.
+        """
+        state = self._read_state()
+        recorded = [state.get(stage) for stage in stages if state.get(stage)]
+        if not recorded:
+            return False
+        return self._deps_fingerprint(reqPath) in recorded
+
+    def _installed_distributions(self):
+        """
+        Read the installed distributions from the environment's site-packages metadata.
+
+        Returns:
+            dict: Normalized distribution name -> version (None if unknown).
+        """
+        installed = {}
+        site_packages = self._get_site_packages()
+        if not site_packages:
+            return installed
+        for entry in os.listdir(site_packages):
+            for suffix in (".dist-info", ".egg-info"):
+                if entry.endswith(suffix):
+                    parts = entry[:-len(suffix)].split("-")
+                    version = parts[1] if len(parts) > 1 else None
+                    installed[_normalize_name(parts[0])] = version
+        return installed
+
+    @trace.span("sync")
+    def sync(self, upgrade=False, force=False):
+        """
+        Bring the virtual environment in line with requirements.txt in a single pass.
+
+        The diff between the installed distributions and the requirements is computed
+        once. If anything is missing, the requirements are resolved once (or taken from
+        the resolver cache) and the backend installs the exact resolved set in one call.
+        It is called at most once more to remove packages that a previous sync installed
+        from requirements.txt but that are no longer listed.
+        Projects managed by poetry (pyproject.toml) or pipenv (Pipfile) are synced by
+        that tool when it is the selected package manager.
 
-        # Check if the requirements file exists before attempting to update dependencies.
+        Parameters:
+            upgrade (bool): Upgrade every requirement to the newest allowed version
+              (the previous update_deps behaviour) instead of only installing what is missing.
+            force (bool): Run even if the requirements fingerprint is unchanged.
+        """
+        reqPath = os.path.join(self.envDir, "requirements.txt")
+        stage = "update" if upgrade else "install"
+        # poetry/pipenv projects are synced by their own tool.
+        try:
+            if self._get_backend().sync_project(upgrade=upgrade):
+                logging.info("Dependencies synced with %s.", self.pkgManager)
+                return
+        except subprocess.CalledProcessError as e:
+            logging.error("Failed to sync dependencies with %s: %s", self.pkgManager, str(e))
+            print(f"❌ Failed to sync dependencies with {self.pkgManager}.")
+            return
         if not os.path.exists(reqPath):
-            print("⚠️ No requirements.txt found. Skipping update.")
-            logging.info("No requirements.txt found at %s. Skipping dependency update.", reqPath)
+            print("⚠️ No requirements.txt found in the project directory. Skipping dependency sync.")
+            logging.info("No requirements.txt found at %s. Skipping dependency sync.", reqPath)
+            return
+
+        # Nothing changed since the last sync: skip pip entirely.
+        stages = ("update",) if upgrade else ("install", "update")
+        if not force and self._deps_satisfied(reqPath, stages):
+            logging.info("Requirements unchanged since last %s. Skipping dependency sync.", stage)
+            print("✅ Dependencies already up to date. Skipping sync.")
+            return
+
+        # A lockfile makes resolution unnecessary: install the pinned set directly.
+        if self._sync_from_lock(reqPath, upgrade, stage):
             return
 
-        # If the file exists, proceed to update dependencies.
-        print("🔄 Updating dependencies...")
+        requirements, complete = _parse_requirements(reqPath)
+        installed = self._installed_distributions()
+        if not complete:
+            # requirements.txt uses options, URLs or markers: let pip handle the whole file.
+            to_install = ["-r", reqPath]
+        elif upgrade:
+            to_install = [line for name, spec, line in requirements]
+        else:
+            to_install = [line for name, spec, line in requirements
+                          if name not in installed or not _version_satisfies(installed[name], spec)]
+
+        # Resolve once (or reuse a cached resolution) and install the exact set without
+        # further resolution. Upgrades always resolve fresh and refresh the cache; plain
+        # installs pin every installed distribution that is not being installed, so
+        # packages that already satisfy their requirement are never up- or downgraded.
+        resolved = None
+        if complete and to_install:
+            pins = None
+            if not upgrade:
+                missing = {name for name, spec, line in requirements if line in to_install}
+                pins = {name: version for name, version in installed.items() if version and name not in missing}
+            resolved = self._resolve_cached(reqPath, requirements, refresh=upgrade, constraints=pins)
+        if resolved is not None:
+            to_install = [dict(resolved[name], name=name) for name in sorted(resolved)
+                          if installed.get(name) != resolved[name]["version"]]
+
+        # Only remove packages that EZVenv itself installed from requirements.txt before.
+        wanted = {name for name, spec, line in requirements}
+        previous = self._read_state().get("managed", [])
+        to_remove = []
+        if complete:
+            to_remove = sorted(name for name in previous
+                               if name not in wanted and name in installed
+                               and name not in [_normalize_name(p) for p in CORE_PACKAGES])
+
+        if not to_install and not to_remove:
+            print("✅ Dependencies already in sync.")
         try:
-            subprocess.run([pip_executable, "install", "--upgrade", "-r", reqPath], check=True)
-            logging.info("Dependencies updated successfully using %s", reqPath)
+            if to_install:
+                print(f"📦 Syncing dependencies from {reqPath}...")
+                if resolved is not None:
+                    self._get_backend().install_locked(to_install)
+                else:
+                    self._install_packages(to_install, upgrade=upgrade)
+            if to_remove:
+                print(f"🧹 Removing dependencies no longer required: {', '.join(to_remove)}")
+                self._get_backend().uninstall(to_remove)
         except subprocess.CalledProcessError as e:
-            logging.error("Failed to update dependencies: %s", str(e))
-            print("❌ Failed to update dependencies.")
+            logging.error("Failed to sync dependencies: %s", str(e))
+            print("❌ Failed to sync dependencies.")
+            return
+        logging.info("Dependencies synced from %s (%d installed, %d removed).",
+                     reqPath, len(to_install), len(to_remove))
+        managed = sorted(wanted) if complete else previous
+        self._write_state(managed=managed, **{stage: self._deps_fingerprint(reqPath)})
 
+    @trace.span("resolve_cached")
+    def _resolve_cached(self, reqPath, requirements, refresh=False, constraints=None):
+        """
+        Resolve requirements to a pinned package set, reusing the persistent resolver
+        cache under CONFIG_DIR/cache/resolve when possible.
+
+        Entries are keyed by the normalized requirements and pins, the interpreter (version,
+        executable, platform, machine) and the index (its upstream URL plus the optional
+        "indexSnapshot" config value), expire after "resolveCacheTTL" seconds and are
+        evicted beyond "resolveCacheMaxEntries".
+
+        Parameters:
+            reqPath (str): Path to the requirements.txt file.
+            requirements (list): Parsed requirements (see _parse_requirements).
+            refresh (bool): Ignore a cached entry and resolve again.
+            constraints (dict): Normalized name -> version pins (e.g. the installed
+              versions to keep); part of the cache key.
+
+        Returns:
+            dict or None: Normalized name -> lock entry, or None if resolution failed
+              (the caller then falls back to a plain pip install).
+        """
+        from . import lock as lockfile
+        from . import resolvecache
+        import platform
+
+        pyvenv = _pyvenv_cfg(self.envPath)
+        interpreter = {
+            "version": pyvenv.get("version"),
+            "executable": pyvenv.get("executable") or pyvenv.get("home"),
+            "platform": sys.platform,
+            "machine": platform.machine(),
+        }
+        self._start_index_cache()
+        upstream = _INDEX_PROXY.upstream if _INDEX_PROXY else os.environ.get("PIP_INDEX_URL", "")
+        index_id = f"{upstream}|{self.config.get('indexSnapshot', '')}"
+        lines = [re.sub(r"\s+", "", line).lower() for name, spec, line in requirements]
+        key = resolvecache.cache_key(lines, constraints, interpreter, index_id)
+
+        if not refresh:
+            packages = resolvecache.get(RESOLVE_CACHE_DIR, key, self.resolveCacheTTL)
+            if packages is not None:
+                logging.info("Resolver cache hit for %s.", reqPath)
+                print("⚡ Reusing cached dependency resolution.")
+                return packages
+        start = time.perf_counter()
+        try:
+            report = lockfile.resolve(self._get_executable_path("pip"), ["-r", reqPath], constraints)
+        except (subprocess.CalledProcessError, OSError) as e:
+            logging.warning("Resolution failed, falling back to pip install: %s", str(e))
+            return None
+        files_url = _INDEX_PROXY.files_url if _INDEX_PROXY else None
+        packages = lockfile.build_lock(report, requirements, reqPath, files_url)["packages"]
+        resolvecache.put(RESOLVE_CACHE_DIR, key, packages, self.resolveCacheMaxEntries)
+        logging.info("Resolved %s in %.2fs (%d packages).", reqPath, time.perf_counter() - start, len(packages))
+        return packages
+
+    def _lock_path(self):
+        """
+        Return the path of the project's lockfile (next to its ezvenv.yaml).
+        """
+        from .lock import LOCK_FILE
+        return os.path.join(self.envDir, LOCK_FILE)
+
+    @trace.span("lock")
+    def lock(self, update=False):
+        """
+        Resolve requirements.txt and write a pinned, hashed lockfile (ezvenv.lock).
+
+        The lock records every resolved distribution with its version, artifact,
+        sha256 hash and dependencies, plus the environment markers it was resolved
+        for. With update=True an existing lock is refreshed incrementally: packages
+        reachable from unchanged requirements stay pinned, so only the subtrees of
+        added or modified requirements are re-resolved.
+
+        Parameters:
+            update (bool): Refresh an existing lock instead of resolving from scratch.
+
+        Returns:
+            dict or None: The lock data, or None if resolution failed.
+        """
+        from . import lock as lockfile
+
+        reqPath = os.path.join(self.envDir, "requirements.txt")
+        if not os.path.exists(reqPath):
+            print("⚠️ No requirements.txt found in the project directory. Nothing to lock.")
+            return None
+        pip_executable = self._get_executable_path("pip")
+        if not os.path.exists(pip_executable):
+            print(f"❌ No virtual environment at {self.envPath}. Run 'ezvenv init' first.")
+            return None
+
+        self._start_index_cache()
+        requirements, complete = _parse_requirements(reqPath)
+        previous = lockfile.read(self._lock_path()) if update else None
+        constraints = None
+        if previous:
+            constraints, changed = lockfile.incremental_constraints(previous, requirements)
+            print(f"🔒 Refreshing lock (re-resolving: {', '.join(changed) or 'nothing'})...")
+        else:
+            print(f"🔒 Resolving {reqPath}...")
+        try:
+            try:
+                report = lockfile.resolve(pip_executable, ["-r", reqPath], constraints)
+            except subprocess.CalledProcessError:
+                if not constraints:
+                    raise
+                logging.warning("Incremental lock refresh failed. Re-resolving everything.")
+                report = lockfile.resolve(pip_executable, ["-r", reqPath])
+        except subprocess.CalledProcessError as e:
+            logging.error("Failed to resolve dependencies for the lock: %s", str(e))
+            print("❌ Failed to resolve dependencies.")
+            return None
+        data = lockfile.build_lock(report, requirements, reqPath, _INDEX_PROXY.files_url if _INDEX_PROXY else None)
+        lockfile.write(self._lock_path(), data)
+        logging.info("Wrote lock %s with %d packages.", self._lock_path(), len(data["packages"]))
+        print(f"✅ Locked {len(data['packages'])} packages in {self._lock_path()}")
+        return data
+
+    @trace.span("sync_from_lock")
+    def _sync_from_lock(self, reqPath, upgrade, stage):
+        """
+        Sync the environment from ezvenv.lock without a resolution step.
+
+        The lock is refreshed first (incrementally) when upgrading or when
+        requirements.txt changed since it was written. Only packages whose installed
+        version differs from the lock are installed, with --no-deps and hash checks.
+
+        Returns:
+            bool: True if the sync was handled from the lock, False if there is no
+              usable lock (none, or resolved for another interpreter/platform).
+        """
+        from . import lock as lockfile
+        import platform
+
+        data = lockfile.read(self._lock_path())
+        if data is None:
+            return False
+        if upgrade or data["requirementsHash"] != lockfile.requirements_hash(reqPath):
+            data = self.lock(update=True)
+            if data is None:
+                return True
+        python_version = _pyvenv_cfg(self.envPath).get("version")
+        if not lockfile.environment_matches(data, python_version, sys.platform, platform.machine()):
+            print("⚠️ ezvenv.lock was resolved for another interpreter or platform. Ignoring it.")
+            logging.warning("Lock %s does not match the environment. Falling back to resolution.",
+                            self._lock_path())
+            return False
+
+        installed = self._installed_distributions()
+        packages = data["packages"]
+        to_install = [dict(packages[name], name=name) for name in sorted(packages)
+                      if installed.get(name) != packages[name]["version"]]
+        # "lockManaged" holds every package a lock installed, transitive ones included;
+        # "managed" only the top-level requirements, since a sync without the lock
+        # removes whatever it lists that is no longer required.
+        state = self._read_state()
+        previous = set(state.get("managed", [])) | set(state.get("lockManaged", []))
+        core = [_normalize_name(p) for p in CORE_PACKAGES]
+        to_remove = sorted(name for name in previous
+                           if name not in packages and name in installed and name not in core)
+        if not to_install and not to_remove:
+            print("✅ Dependencies already match ezvenv.lock.")
+        try:
+            if to_install:
+                print(f"📦 Installing {len(to_install)} locked packages from {self._lock_path()}...")
+                self._get_backend().install_locked(to_install)
+            if to_remove:
+                print(f"🧹 Removing dependencies no longer locked: {', '.join(to_remove)}")
+                self._get_backend().uninstall(to_remove)
+        except subprocess.CalledProcessError as e:
+            logging.error("Failed to install from lock: %s", str(e))
+            print("❌ Failed to install dependencies from ezvenv.lock.")
+            return True
+        logging.info("Dependencies synced from lock %s (%d installed, %d removed).",
+                     self._lock_path(), len(to_install), len(to_remove))
+        self._write_state(managed=sorted(data.get("requirements", {})), lockManaged=sorted(packages),
+                          **{stage: self._deps_fingerprint(reqPath)})
+        return True
+
+    def install_deps(self, force=False):
+        """
+        Install dependencies listed in the requirements.txt file, if it exists.
+        Only missing or unsatisfied requirements are passed to pip (see sync()).
+
+        Parameters:
+            force (bool): Run pip even if the requirements fingerprint is unchanged.
+        """
+        self.sync(upgrade=False, force=force)
+
+    def update_deps(self, force=False):
+        """
+        Update project dependencies using the requirements.txt file if it exists.
+        Every requirement is upgraded in one pip run (see sync()).
+
+        Parameters:
+            force (bool): Run pip even if the requirements fingerprint is unchanged.
+        """
+        self.sync(upgrade=True, force=force)
+
+    def _ezvenv_importable(self):
+        """
+        Decide whether "import ezvenv" would succeed with the environment's Python,
+        without starting that interpreter.
+
+        PYTHONPATH is checked first, then the environment's site-packages for an
+        ezvenv package, dist-info/egg-info, egg-link or .pth entry. The site-packages
+        result is cached in the environment's state file and reused until
+        site-packages changes.
+
+        Returns:
+            bool: True if ezvenv is importable in the environment.
+        """
+        for entry in os.environ.get("PYTHONPATH", "").split(os.pathsep):
+            if entry and os.path.exists(os.path.join(entry, "ezvenv", "__init__.py")):
+                return True
+        site_packages = self._get_site_packages()
+        if not site_packages:
+            return False
+        mtime = os.stat(site_packages).st_mtime_ns
+        cached = self._read_state().get("ezvenvImportable")
+        if cached and cached.get("mtime") == mtime:
+            return cached["value"]
+
+        if _system_site_packages_enabled(self.envPath):
+            # The base interpreter's site-packages are visible too: ask the interpreter.
+            result = process.run([self._get_executable_path("python"), "-c", "import ezvenv"],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            value = result.returncode == 0
+        else:
+            value = _site_packages_provide(site_packages, "ezvenv")
+        self._write_state(ezvenvImportable={"mtime": mtime, "value": value})
+        return value
+
+    def _master_site_packages(self):
+        """
+        Return the master environment's site-packages for the running Python version,
+        or None if it does not exist.
+        """
+        master_env = os.path.join(os.path.expanduser("~"), ".EZVenv", "EZVenv-Master")
+        python_version = f"python{sys.version_info.major}.{sys.version_info.minor}"
+        master_site_packages = os.path.join(master_env, "lib", python_version, "site-packages")
+        return master_site_packages if os.path.exists(master_site_packages) else None
+
+    def activation_diff(self):
+        """
+        Compute the environment changes (VIRTUAL_ENV, PATH, PYTHONPATH, PYTHONHOME)
+        that activate this virtual environment, without starting a process.
+        The master environment's site-packages is added to PYTHONPATH when ezvenv
+        is not importable in the environment, as activate_env() does.
+
+        Returns:
+            dict or None: The diff (see ezvenv.activation), or None if the environment does not exist.
+        """
+        from . import activation
+        if not os.path.exists(os.path.join(self.envPath, "pyvenv.cfg")):
+            return None
+        bin_dir = os.path.dirname(self._get_executable_path("python"))
+        pythonpath = None if self._ezvenv_importable() else self._master_site_packages()
+        return activation.activation_diff(self.envPath, bin_dir, pythonpath)
+
+    def write_activation_cache(self):
+        """
+        Write the activation diff of this project for the shell hook ("ezvenv hook").
+
+        Returns:
+            str or None: The rendered diff, or None if the environment does not exist.
+        """
+        from . import activation
+        diff = self.activation_diff()
+        if diff is None:
+            return None
+        return activation.write_cache(ACTIVATE_CACHE_DIR, self.envDir, diff)
+
+    def activate_in_process(self):
+        """
+        Activate the virtual environment inside the running interpreter, without
+        re-executing it: os.environ gets the activation diff and the environment's
+        site-packages is put first on sys.path. The environment must use the same
+        Python version as the running interpreter.
+
+        Returns:
+            bool: True if the environment is now active.
+        """
+        from . import activation
+        diff = self.activation_diff()
+        site_packages = self._get_site_packages()
+        if diff is None or not site_packages:
+            print(f"❌ No virtual environment at {self.envPath}.")
+            return False
+        python_version = f"python{sys.version_info.major}.{sys.version_info.minor}"
+        if os.name != "nt" and os.path.basename(os.path.dirname(site_packages)) != python_version:
+            print(f"❌ {self.envPath} was not built for {python_version}. Use activate_env() instead.")
+            return False
+        if os.environ.get("VIRTUAL_ENV") == self.envPath and site_packages in sys.path:
+            return True
+        activation.apply(diff, site_packages)
+        os.environ["EZVENV_ALREADY_ACTIVATED"] = "1"
+        self._touch_registry()
+        logging.info("Activated %s in-process.", self.envPath)
+        return True
+
+    @trace.span("activate_env")
     def activate_env(self):
         """
         Programmatically activate the new virtual environment by either:
@@ -237,8 +1197,7 @@ class EZVenv:
 
         The user is prompted if the current interpreter belongs to the master environment.
         """
-        import subprocess
-
+        from . import logs
         # Determine the full path to the target (new) environment's Python interpreter.
         env_python = self._get_executable_path("python")
         current_executable = os.path.abspath(sys.executable)
@@ -263,12 +1222,16 @@ class EZVenv:
                 # Set a flag to indicate activation has been attempted to avoid looping.
                 os.environ["EZVENV_ALREADY_ACTIVATED"] = "1"
                 # Launch a new interactive bash shell that sources the new environment.
+                trace.flush()
+                logs.flush()
                 os.execv("/bin/bash", ["/bin/bash", "-c", f"source {new_activate_script} && exec bash"])
             elif choice == "2":
                 print("Proceeding to activate the new environment on top of the master environment...")
                 # Continue to re-execute with the new environment's Python.
                 os.environ["EZVENV_ALREADY_ACTIVATED"] = "1"
                 try:
+                    trace.flush()
+                    logs.flush()
                     os.execv(env_python, [env_python] + sys.argv)
                 except Exception as e:
                     print(f"❌ Failed to activate virtual environment: {e}")
@@ -280,18 +1243,10 @@ class EZVenv:
         # If we're not in the master environment, or if we already re-executed:
         if os.path.abspath(sys.executable) != os.path.abspath(env_python):
             # Check if EZVenv is importable in the new environment.
-            try:
-                subprocess.run(
-                    [env_python, "-c", "import ezvenv"],
-                    check=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE
-                )
-            except subprocess.CalledProcessError:
+            if not self._ezvenv_importable():
                 print("🔄 Adding master environment's site-packages to PYTHONPATH for auto-activation...")
-                python_version = f"python{sys.version_info.major}.{sys.version_info.minor}"
-                master_site_packages = os.path.join(master_env, "lib", python_version, "site-packages")
-                if os.path.exists(master_site_packages):
+                master_site_packages = self._master_site_packages()
+                if master_site_packages:
                     current_pythonpath = os.environ.get("PYTHONPATH", "")
                     os.environ["PYTHONPATH"] = master_site_packages + (
                         os.pathsep + current_pythonpath if current_pythonpath else "")
@@ -302,6 +1257,8 @@ class EZVenv:
             print(f"🔄 Activating virtual environment using {env_python} ...")
             os.environ["EZVENV_ALREADY_ACTIVATED"] = "1"
             try:
+                trace.flush()
+                logs.flush()
                 os.execv(env_python, [env_python] + sys.argv)
             except Exception as e:
                 print(f"❌ Failed to activate virtual environment: {e}")
@@ -310,21 +1267,64 @@ class EZVenv:
             # We are now running with the new environment's Python.
             print(f"✅ New environment activated: {self.envPath}")
 
+    @trace.span("setup_env")
     def setup_env(self):
         """
         High-level method to create, configure, and optionally activate the virtual environment.
         It:
             1. Creates the environment if it doesn't exist.
             2. Updates core components.
-            3. Installs and updates project dependencies.
+            3. Installs and updates project dependencies (single sync pass).
             4. Optionally, re-launches the script with the virtual environment's Python.
+
+        This is a thin wrapper over setup_env_async().
         """
-        self.create_env()
-        print(f"🔗 Preparing to activate environment: {self.envPath}")
+        from . import aio
+        aio.run_sync(self.setup_env_async())
+
+    async def setup_env_async(self, timeout=None):
+        """
+        Awaitable variant of setup_env(). Its steps are the blocking methods run in
+        worker threads (see the *_async methods); what runs concurrently is their
+        subprocesses.
+
+        When the environment does not exist yet, the wheels of requirements.txt are
+        prefetched into the wheelhouse with the base interpreter's pip while the
+        environment is being built, so the sync step installs from local wheels.
+        A new (or incomplete) environment is built in a staging directory and only
+        swapped into envPath once it is complete (POSIX only).
+
+        Parameters:
+            timeout (float): Per-step timeout in seconds (create, sync); a step that
+              runs past it has its subprocess killed and raises subprocess.TimeoutExpired.
+        """
+        import asyncio
+        # Concurrent setups of the same environment are serialized; a process that
+        # waited for a build of the same requirements reuses its result.
+        build = self.build_lock()
+        await asyncio.to_thread(build.acquire)
+        try:
+            if build.reusable():
+                logging.info("Reusing %s, built by pid %s.", self.envPath, build.builder)
+                print(f"♻️ Reusing the environment just built by process {build.builder}: {self.envPath}")
+                self.register(used=self.autoActivate)
+            else:
+                from . import staging
+                if os.name != "nt" and not staging.is_valid(self.envPath, self._get_executable_path("python")):
+                    # New (or half-built) environments are built next to their final place.
+                    await self._build_staged_async(timeout)
+                else:
+                    await self._build_async(timeout)
+                self.register(synced=True, used=self.autoActivate)
 
-        # Install dependencies and update them
-        self.install_deps()
-        self.update_deps()
+            try:
+                self.write_activation_cache()
+            except OSError as e:
+                logging.warning("Failed to write the activation cache: %s", str(e))
+        except BaseException:
+            build.release("failed")
+            raise
+        build.release("done")
 
         logging.info("Environment setup completed successfully.")
         # If auto-activation is enabled, attempt to re-launch the process with the env's Python.
@@ -333,6 +1333,291 @@ class EZVenv:
         else:
             print("ℹ️ Auto-activation is disabled. Please activate the virtual environment manually if needed.")
 
+    async def _build_async(self, timeout=None):
+        """
+        Create the environment (overlapped with a wheel prefetch when it is new) and
+        sync its dependencies, in place.
+        """
+        import asyncio
+        reqPath = os.path.join(self.envDir, "requirements.txt")
+        steps = [self.create_env_async(timeout=timeout)]
+        if (not os.path.exists(self.envPath) and self.useWheelhouse and not self.offline
+                and os.path.exists(reqPath) and self.pkgManager in ("pip", "native")):
+            steps.append(self._prefetch_wheels(reqPath, timeout))
+        await asyncio.gather(*steps)
+        print(f"🔗 Preparing to activate environment: {self.envPath}")
+
+        # Install and update dependencies in a single pass.
+        await self.sync_async(upgrade=True, timeout=timeout)
+
+    async def _build_staged_async(self, timeout=None, keep_previous=None):
+        """
+        Build the environment in a staging directory next to envPath, validate it,
+        rewrite the paths embedded in it and swap it in (see ezvenv.staging), so an
+        interrupted build never leaves a half-populated environment at envPath.
+        Call it with the build lock held.
+
+        Parameters:
+            keep_previous (bool): Keep the replaced environment at "<envPath>.previous"
+              for rollback(). Defaults to keeping it unless it is broken.
+
+        Raises:
+            RuntimeError: If the staged environment fails validation.
+        """
+        from . import staging
+        target = self.envPath
+        if keep_previous is None:
+            keep_previous = staging.is_valid(target, self._get_executable_path("python"))
+        staging.remove_stale(target)
+        staged = staging.staging_path(target)
+        reqPath = os.path.join(self.envDir, "requirements.txt")
+        self.envPath = staged
+        self._staging = True
+        try:
+            await self._build_async(timeout)
+            staging.validate(staged, self._get_executable_path("python"))
+            # Keep the recorded dependency fingerprints valid after the rewrite.
+            before = self._deps_fingerprint(reqPath) if os.path.exists(reqPath) else None
+            staging.relocate(staged, staged, target)
+            if before is not None:
+                after = self._deps_fingerprint(reqPath)
+                state = self._read_state()
+                self._write_state(**{key: after for key, value in state.items() if value == before})
+            staging.swap(staged, target, keep_previous)
+        except BaseException:
+            shutil.rmtree(staged, ignore_errors=True)
+            raise
+        finally:
+            self.envPath = target
+            self._staging = False
+        logging.info("Swapped the new build into %s.", target)
+        print(f"🔁 Swapped the new build into {target}.")
+
+    @trace.span("rebuild")
+    def rebuild(self, timeout=None):
+        """
+        Build a fresh environment next to the current one and swap it in, keeping
+        the current one at "<envPath>.previous" for rollback(). The environment stays
+        usable during the build.
+
+        Parameters:
+            timeout (float): Per-step timeout in seconds.
+        """
+        from . import aio
+        with self.build_lock():
+            aio.run_sync(self._build_staged_async(timeout, keep_previous=True))
+            self.register(synced=True)
+            try:
+                self.write_activation_cache()
+            except OSError as e:
+                logging.warning("Failed to write the activation cache: %s", str(e))
+
+    def rollback(self):
+        """
+        Swap the environment with the one replaced by the latest build; calling it
+        again rolls forward.
+
+        Returns:
+            bool: False if there is no previous environment.
+        """
+        from . import staging
+        build = self.build_lock()
+        build.acquire()
+        try:
+            rolled_back = staging.rollback(self.envPath)
+        except BaseException:
+            build.release("failed")
+            raise
+        # Waiters must not reuse the environment as a build of the current requirements.
+        build.release("rolled back")
+        if not rolled_back:
+            print(f"❌ No previous environment to roll back to at {self.envPath}.")
+            return False
+        logging.info("Rolled back %s.", self.envPath)
+        print(f"⏪ Rolled back {self.envPath} (the replaced one is kept for rolling forward).")
+        self.register()
+        return True
+
+    def build_lock(self):
+        """
+        Return the cross-process build lock of this environment (an ezvenv.envlock.BuildLock,
+        usable as a context manager). Its fingerprint covers the interpreter, the
+        package manager and requirements.txt.
+        """
+        from . import envlock
+        from .lock import requirements_hash
+        reqPath = os.path.join(self.envDir, "requirements.txt")
+        fingerprint = "|".join([self.pythonVer, self.pkgManager,
+                                requirements_hash(reqPath) if os.path.exists(reqPath) else ""])
+        return envlock.BuildLock(BUILD_LOCK_DIR, self.envPath, fingerprint, on_wait=self._report_build_wait)
+
+    def _report_build_wait(self, state):
+        if state and state.get("status") == "building":
+            owner = f"process {state.get('pid')} on {state.get('host')}"
+        else:
+            owner = "another process"
+        logging.info("Waiting for the build of %s by %s.", self.envPath, owner)
+        print(f"⏳ Waiting for {owner} to finish building {self.envPath}...")
+
+    async def _prefetch_wheels(self, reqPath, timeout=None):
+        """
+        Fill the wheelhouse for requirements.txt with the base interpreter's pip,
+        holding the wheelhouse lock like the backends' installs do, so a concurrent
+        eviction cannot delete wheels while they are being added. Failures are only
+        logged: the sync step falls back to the index.
+        """
+        from . import aio, wheelhouse
+        print("📥 Prefetching wheels into the wheelhouse...")
+        try:
+            with wheelhouse.lock(WHEEL_DIR):
+                await aio.run([self.pythonVer, "-m", "pip", "wheel", "--quiet", "--wheel-dir", WHEEL_DIR,
+                               "-r", reqPath], timeout=timeout, output="capture")
+        except (subprocess.SubprocessError, OSError) as e:
+            logging.info("Wheel prefetch failed: %s", str(e))
+
+    async def create_env_async(self, timeout=None, output="inherit", prefix=None):
+        """
+        Awaitable create_env(): the blocking method runs in a worker thread (see
+        ezvenv.aio.call for timeout, output and prefix).
+        """
+        from . import aio
+        return await aio.call(self.create_env, timeout=timeout, output=output, prefix=prefix)
+
+    async def update_core_components_async(self, timeout=None, output="inherit", prefix=None):
+        """
+        Awaitable update_core_components(), run in a worker thread (see ezvenv.aio.call).
+        """
+        from . import aio
+        return await aio.call(self.update_core_components, timeout=timeout, output=output, prefix=prefix)
+
+    async def install_async(self, args, upgrade=False, timeout=None, output="inherit", prefix=None):
+        """
+        Awaitable _install_packages(), run in a worker thread (see ezvenv.aio.call):
+        install requirement arguments with the selected backend.
+
+        Raises:
+            subprocess.CalledProcessError: If the install fails.
+        """
+        from . import aio
+        return await aio.call(self._install_packages, args, upgrade=upgrade,
+                              timeout=timeout, output=output, prefix=prefix)
+
+    async def sync_async(self, upgrade=False, force=False, timeout=None, output="inherit", prefix=None):
+        """
+        Awaitable sync(), run in a worker thread (see ezvenv.aio.call).
+        """
+        from . import aio
+        return await aio.call(self.sync, upgrade=upgrade, force=force, timeout=timeout, output=output, prefix=prefix)
+
+
+def garbage_collect(max_age=None, max_total=None, dry_run=False, jobs=None, config_file=None, duplicates=False):
+    """
+    Delete stale environments and cap everything else EZVenv keeps under CONFIG_DIR.
+
+    Environments come from the registry: missing ones are dropped from it; orphaned
+    (project directory gone) and unused ones (no sign of use for max_age days, see
+    cleanup.last_use) are deleted, then the least recently used until the rest fit
+    in max_total MB. With duplicates, every environment of a project other than the
+    one its config selects is deleted too. Sizes are measured with a parallel
+    directory walk. The active environment is never deleted.
+    Afterwards the log is trimmed to "logMaxSize" MB, the wheelhouse, resolver and
+    index caches are evicted to their caps, stale templates, config and activation
+    cache entries are removed and unreferenced store objects are pruned.
+
+    Parameters:
+        max_age (float): Days; defaults to "gcMaxAge" (30).
+        max_total (float): MB; defaults to "gcMaxTotalSize" (no cap).
+        dry_run (bool): Only report what would be deleted.
+        jobs (int): Threads for size accounting.
+        config_file (str): Config with the policy (default: CONFIG_DIR/ezvenv.yaml).
+        duplicates (bool): Delete the extra environments of projects.
+
+    Returns:
+        list: (registry row, reason) of the selected environments.
+    """
+    from . import activation, cleanup, indexcache, registry, resolvecache, wheelhouse
+
+    settings = EZVenv(config_file=config_file, auto_activate=False)
+    max_age = settings.gcMaxAge if max_age is None else max_age
+    max_total = settings.gcMaxTotalSize if max_total is None else max_total
+    environments = registry.list_environments(REGISTRY_DB)
+    start = time.perf_counter()
+    sizes = cleanup.dir_sizes([env["path"] for env in environments if os.path.isdir(env["path"])], jobs=jobs)
+    for env in environments:
+        env["size"] = sizes.get(env["path"], 0)
+        # The shell hook records no use itself, but sources the project's activation cache.
+        env["last_seen"] = cleanup.last_use(env, [activation.cache_path(ACTIVATE_CACHE_DIR, env["project_dir"])])
+    logging.info("Measured %d environments in %.2fs.", len(sizes), time.perf_counter() - start)
+    protected = {os.environ.get("VIRTUAL_ENV"), sys.prefix}
+    configured = {}
+    if duplicates:
+        for project_dir in {env["project_dir"] for env in environments if os.path.isdir(env["project_dir"])}:
+            project_config = os.path.join(project_dir, "ezvenv.yaml")
+            configured[project_dir] = EZVenv(config_file=project_config if os.path.exists(project_config) else None,
+                                             env_dir=project_dir, auto_activate=False).envPath
+    selected = cleanup.select(environments, None if max_age is None else max_age * 86400,
+                              None if max_total is None else max_total * 1024 * 1024, protected,
+                              duplicates=duplicates, configured=configured)
+
+    freed = sum(env["size"] for env, reason in selected)
+    print(f"{'REASON':<14} {'LAST USED':<17} {'SIZE':>9} PATH")
+    for env, reason in selected:
+        last_seen = env.get("last_seen")
+        stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(last_seen)) if last_seen else "-"
+        print(f"{reason:<14} {stamp:<17} {env['size'] / (1024 * 1024):>8.1f}M {env['path']}")
+    if dry_run:
+        print(f"🔎 Dry run: {len(selected)} environments, {freed / (1024 * 1024):.1f} MB would be freed.")
+        return selected
+
+    removed = []
+    for env, reason in selected:
+        try:
+            if reason == "missing" or cleanup.remove_environment(env["path"]):
+                removed.append(env["path"])
+                logging.info("Garbage collected %s (%s).", env["path"], reason)
+        except OSError as e:
+            logging.error("Failed to delete %s: %s", env["path"], str(e))
+            print(f"❌ Failed to delete {env['path']}: {e}")
+    registry.remove(REGISTRY_DB, removed)
+
+    # Everything else under CONFIG_DIR gets its size cap.
+    freed_config = cleanup.trim_file(_LOG_FILE_, settings.logMaxSize * 1024 * 1024)
+    if os.path.isdir(WHEEL_DIR) and settings.wheelhouseMaxSize:
+        before = wheelhouse.size(WHEEL_DIR)
+        wheelhouse.evict(WHEEL_DIR, settings.wheelhouseMaxSize * 1024 * 1024)
+        freed_config += before - wheelhouse.size(WHEEL_DIR)
+    if os.path.isdir(RESOLVE_CACHE_DIR):
+        resolvecache.evict(RESOLVE_CACHE_DIR, settings.resolveCacheMaxEntries)
+    if os.path.isdir(INDEX_CACHE_DIR):
+        freed_config += indexcache.IndexCache(INDEX_CACHE_DIR).compact(settings.indexCacheMaxSize * 1024 * 1024)
+    freed_config += cleanup.prune_older_than(TEMPLATE_DIR, TEMPLATE_MAX_AGE)
+    freed_config += cleanup.prune_older_than(CONFIG_CACHE_DIR, max_age * 86400 if max_age else TEMPLATE_MAX_AGE)
+    if os.path.isdir(ACTIVATE_CACHE_DIR):
+        for entry in os.scandir(ACTIVATE_CACHE_DIR):
+            if not os.path.isdir(entry.name[:-len(".sh")].replace("%", "/")):
+                freed_config += entry.stat().st_size
+                os.remove(entry.path)
+    if os.name != "nt":
+        freed_config += cleanup.prune_store(STORE_DIR)
+    print(f"🧹 Deleted {len(removed)} environments ({freed / (1024 * 1024):.1f} MB) "
+          f"and freed {freed_config / (1024 * 1024):.1f} MB under {CONFIG_DIR}.")
+    return selected
+
+
+def activate(env_dir=None, env_name=None, config_file=None):
+    """
+    Activate a project's virtual environment in the running interpreter
+    (see EZVenv.activate_in_process). The project's ezvenv.yaml is used when present.
+
+    Returns:
+        bool: True if the environment is now active.
+    """
+    env_dir = os.path.abspath(env_dir or os.getcwd())
+    project_config = os.path.join(env_dir, "ezvenv.yaml")
+    if config_file is None and os.path.exists(project_config):
+        config_file = project_config
+    return EZVenv(config_file=config_file, env_name=env_name, env_dir=env_dir).activate_in_process()
+
 
 def init_env(env_name=None, env_dir=None, python_ver=None, config_file=None, save_defaults=False, auto_activate=True):
     """
@@ -406,3 +1691,124 @@ def init_env(env_name=None, env_dir=None, python_ver=None, config_file=None, sav
     )
     env.setup_env()
     return env.envPath
+
+
+# Directory names never searched for projects by init_tree.
+_SKIP_DIRS = {"node_modules", "__pycache__", "site-packages"}
+
+
+def find_projects(root):
+    """
+    Find every project directory below root that contains a requirements.txt or
+    an ezvenv.yaml. Hidden directories and virtual environments are not searched.
+
+    Parameters:
+      root (str): Directory to search.
+
+    Returns:
+      list: Absolute paths of the project directories, sorted.
+    """
+    projects = []
+    for current, dirs, files in os.walk(os.path.abspath(root)):
+        if "pyvenv.cfg" in files:
+            dirs[:] = []
+            continue
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d not in _SKIP_DIRS]
+        if "requirements.txt" in files or "ezvenv.yaml" in files:
+            projects.append(current)
+    return sorted(projects)
+
+
+def _init_project(project_dir):
+    """
+    Set up the environment of a single project inside an init_tree worker.
+
+    Runs non-interactively (no prompts, no activation) and captures everything
+    written to stdout/stderr, including pip's output, so it can be reported per project.
+
+    Returns:
+      tuple: (project_dir, success, captured output, elapsed seconds)
+    """
+    import tempfile
+
+    _setup()
+    start = time.perf_counter()
+    success = True
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = (os.dup(1), os.dup(2))
+    with tempfile.TemporaryFile(mode="w+b") as capture:
+        os.dup2(capture.fileno(), 1)
+        os.dup2(capture.fileno(), 2)
+        try:
+            env = EZVenv(
+                config_file=os.path.join(project_dir, "ezvenv.yaml"),
+                env_dir=project_dir,
+                auto_activate=False
+            )
+            env.setup_env()
+        except SystemExit as e:
+            success = not e.code
+        except Exception as e:
+            logging.error("Failed to initialize %s: %s", project_dir, str(e))
+            print(f"❌ {e}")
+            success = False
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+        capture.seek(0)
+        output = capture.read().decode(errors="replace")
+    # Pool workers exit without running atexit handlers.
+    from . import logs
+    logs.flush()
+    return project_dir, success, output, time.perf_counter() - start
+
+
+def init_tree(root, jobs=None):
+    """
+    Initialize the virtual environments of every project below root concurrently.
+
+    Projects are discovered with find_projects() and built by a bounded process
+    pool. Each project is set up without prompts or activation, and its output is
+    printed as one block when it finishes.
+
+    Parameters:
+      root (str): Directory tree to initialize.
+      jobs (int): Number of worker processes (defaults to the number of CPU cores).
+
+    Returns:
+      dict: Project directory -> True if its environment was set up successfully.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    _setup()
+    projects = find_projects(root)
+    if not projects:
+        print(f"⚠️ No projects (requirements.txt or ezvenv.yaml) found under {root}.")
+        return {}
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(projects)))
+    print(f"🔧 Initializing {len(projects)} projects under {root} with {jobs} workers...")
+    logging.info("Recursive init of %d projects under %s with %d workers.", len(projects), root, jobs)
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(_init_project, project) for project in projects]
+        for future in as_completed(futures):
+            project_dir, success, output, elapsed = future.result()
+            results[project_dir] = success
+            trace.record(f"init {project_dir}", time.time() - elapsed, elapsed, "ok" if success else "error",
+                         category="project")
+            status = "✅" if success else "❌"
+            print(f"\n{status} {project_dir} ({elapsed:.1f}s)")
+            for line in output.rstrip().splitlines():
+                print(f"    {line}")
+
+    failed = [project for project, success in results.items() if not success]
+    print(f"\n🟢 {len(projects) - len(failed)}/{len(projects)} environments ready.")
+    for project in sorted(failed):
+        print(f"❌ Failed: {project}")
+    return results
@@ -0,0 +1,321 @@
+import json
+import os
+import socket
+import struct
+import sys
+
+SOCKET_NAME = "ezvenvd.sock"
+
+# Requests are an 8-byte big-endian length followed by JSON: {"argv", "cwd", "env"}
+# sent with the client's fds 0, 1, 2, or {"op": "ping" | "stop"} without fds. The
+# daemon answers with one line: the exit status, or "restart" when its code changed
+# on disk since it started (the client then runs the command itself).
+_HEADER = struct.Struct(">Q")
+
+
+def socket_path():
+    """
+    Return the daemon socket path: EZVENVD_SOCKET, else ~/.EZVenv/ezvenvd.sock.
+    """
+    return os.environ.get("EZVENVD_SOCKET") or os.path.join(os.path.expanduser("~"), ".EZVenv", SOCKET_NAME)
+
+
+def _connect(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _read_line(sock):
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = sock.recv(64)
+        if not chunk:
+            break
+        data += chunk
+    return data.decode().strip()
+
+
+def client_run(argv):
+    """
+    Run an ezvenv command through the daemon.
+
+    Returns:
+        int or None: The command's exit status, or None if no daemon answered (or it
+          asked to be bypassed), in which case the caller runs the command itself.
+    """
+    path = socket_path()
+    if os.environ.get("EZVENV_NO_DAEMON") or not hasattr(socket, "send_fds") or not os.path.exists(path):
+        return None
+    try:
+        sock = _connect(path)
+    except OSError:
+        return None
+    with sock:
+        payload = json.dumps({"argv": list(argv), "cwd": os.getcwd(), "env": dict(os.environ)}).encode()
+        try:
+            socket.send_fds(sock, [_HEADER.pack(len(payload)) + payload], [0, 1, 2])
+            try:
+                reply = _read_line(sock)
+            except KeyboardInterrupt:
+                # Closing the connection interrupts the command in the daemon.
+                return 130
+        except OSError:
+            return None
+    if not reply.lstrip("-").isdigit():
+        return None
+    return int(reply)
+
+
+def _request(op):
+    path = socket_path()
+    with _connect(path) as sock:
+        payload = json.dumps({"op": op}).encode()
+        sock.sendall(_HEADER.pack(len(payload)) + payload)
+        return _read_line(sock)
+
+
+class Daemon:
+    """
+    The ezvenvd server: an optional background process that keeps EZVenv state warm.
+
+    The daemon imports ezvenv once, loads the configs it is asked about, probes the
+    package managers and interpreters, preloads the resolver cache and (with
+    useIndexCache) hosts the index cache proxy. Requests are accepted one at a time
+    and each is served by a forked child, which inherits that state and runs the
+    command with the client's own stdin/stdout/stderr, working directory and
+    environment. The ezvenv CLI falls back to running in-process whenever the
+    socket does not answer, so the daemon is never required.
+    """
+
+    def __init__(self, path, idle_timeout=None):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.children = set()
+        self.code_stamp = self._code_stamp()
+
+    @staticmethod
+    def _code_stamp():
+        """
+        The newest mtime of the ezvenv sources, to notice an upgrade of the package.
+        """
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+        return max(entry.stat().st_mtime_ns for entry in os.scandir(package_dir) if entry.name.endswith(".py"))
+
+    def warm(self, cwd=None):
+        """
+        Load the state every command needs: modules, configs, tool and interpreter
+        probes, the resolver cache and the index cache proxy.
+        """
+        # backends and lock are imported only so forked children find them loaded.
+        from . import backends, core, lock, resolvecache, template  # noqa: F401
+        core._setup()
+        config_files = [os.path.join(core.CONFIG_DIR, "ezvenv.yaml")]
+        if cwd:
+            config_files.append(os.path.join(cwd, "ezvenv.yaml"))
+        for config_file in config_files:
+            if os.path.exists(config_file):
+                env = core.EZVenv(config_file=config_file, env_dir=cwd)
+                for tool in ("poetry", "pipenv"):
+                    core._which(tool)
+                # Memoizes the interpreter's PATH lookup (core._which) for every command
+                # that clones a template; the key itself is recomputed per command.
+                template.template_key(env.pythonVer)
+                env._start_index_cache()
+        resolvecache.preload(core.RESOLVE_CACHE_DIR)
+
+    def serve(self):
+        """
+        Listen on the socket until stopped, idle for idle_timeout seconds, or the
+        ezvenv sources change.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            try:
+                _connect(self.path).close()
+                raise RuntimeError(f"ezvenvd is already running on {self.path}")
+            except OSError:
+                os.remove(self.path)
+        self.warm()
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            server.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        server.listen(16)
+        server.settimeout(self.idle_timeout)
+        print(f"ezvenvd listening on {self.path} (pid {os.getpid()})", flush=True)
+        try:
+            while True:
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    self._reap()
+                    if not self.children:
+                        print("ezvenvd idle, exiting.", flush=True)
+                        break
+                    continue
+                conn.settimeout(None)
+                self._reap()
+                if not self._handle(conn, server):
+                    break
+        finally:
+            server.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _reap(self):
+        for pid in list(self.children):
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done = pid
+            if done:
+                self.children.discard(pid)
+
+    def _handle(self, conn, server):
+        """
+        Handle one connection. Returns False when the daemon should stop.
+        """
+        with conn:
+            try:
+                data, fds, _, _ = socket.recv_fds(conn, 1 << 20, 3)
+                if len(data) < _HEADER.size:
+                    return True
+                length = _HEADER.unpack(data[:_HEADER.size])[0]
+                data = data[_HEADER.size:]
+                while len(data) < length:
+                    chunk = conn.recv(length - len(data))
+                    if not chunk:
+                        break
+                    data += chunk
+                request = json.loads(data)
+            except (OSError, ValueError) as e:
+                print(f"ezvenvd: bad request: {e}", file=sys.stderr, flush=True)
+                return True
+            op = request.get("op", "run")
+            if op == "ping":
+                conn.sendall(f"{os.getpid()}\n".encode())
+                return True
+            if op == "stop":
+                conn.sendall(b"0\n")
+                return False
+            if len(fds) != 3:
+                for fd in fds:
+                    os.close(fd)
+                return True
+            if self._code_stamp() != self.code_stamp:
+                for fd in fds:
+                    os.close(fd)
+                conn.sendall(b"restart\n")
+                print("ezvenvd: ezvenv changed on disk, exiting.", flush=True)
+                return False
+            try:
+                self.warm(request["cwd"])
+            except Exception as e:
+                print(f"ezvenvd: warming failed: {e}", file=sys.stderr, flush=True)
+            pid = os.fork()
+            if pid == 0:
+                server.close()
+                self._run_child(conn, fds, request)
+            for fd in fds:
+                os.close(fd)
+            self.children.add(pid)
+        return True
+
+    def _run_child(self, conn, fds, request):
+        """
+        Run a command in a forked child with the client's fds, cwd and environment,
+        send its exit status and exit. Never returns.
+        """
+        import signal
+        import threading
+        status = 1
+        finished = threading.Event()
+        try:
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            for target, fd in enumerate(fds):
+                os.dup2(fd, target)
+                os.close(fd)
+            os.chdir(request["cwd"])
+            from . import cli, core
+            from . import process
+            env = request["env"]
+            if core._INDEX_PROXY is not None and env.get("PIP_INDEX_URL") not in (None, core._INDEX_PROXY.upstream):
+                # The client uses another index than the one the proxy serves.
+                process.set_env("PIP_INDEX_URL", None)
+            os.environ.clear()
+            os.environ.update(env)
+
+            def watch_client():
+                # The client closes the connection when it is interrupted or killed.
+                try:
+                    conn.recv(1)
+                except OSError:
+                    pass
+                if not finished.is_set():
+                    os.kill(os.getpid(), signal.SIGINT)
+
+            threading.Thread(target=watch_client, daemon=True).start()
+            args = cli.build_parser().parse_intermixed_args(request["argv"])
+            status = cli.run(args)
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except KeyboardInterrupt:
+            status = 130
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+        finally:
+            finished.set()
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                conn.sendall(f"{status}\n".encode())
+            except BaseException:
+                pass
+            from . import logs
+            logs.flush()
+            os._exit(status)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="ezvenvd - keeps EZVenv state warm for the ezvenv CLI")
+    parser.add_argument("--socket", default=None, help=f"Socket path (default: $EZVENVD_SOCKET or ~/.EZVenv/{SOCKET_NAME})")
+    parser.add_argument("--idle-timeout", type=float, default=None,
+                        help="Exit after this many seconds without requests")
+    parser.add_argument("--status", action="store_true", help="Report whether a daemon is running")
+    parser.add_argument("--stop", action="store_true", help="Stop the running daemon")
+    args = parser.parse_args()
+    if args.socket:
+        os.environ["EZVENVD_SOCKET"] = os.path.abspath(args.socket)
+    path = socket_path()
+    if args.status or args.stop:
+        try:
+            reply = _request("stop" if args.stop else "ping")
+        except OSError:
+            print(f"ezvenvd is not running ({path}).")
+            sys.exit(1)
+        print("ezvenvd stopped." if args.stop else f"ezvenvd is running on {path} (pid {reply}).")
+        return
+    if not hasattr(socket, "send_fds"):
+        print("ezvenvd requires Unix domain sockets with fd passing.")
+        sys.exit(1)
+    try:
+        Daemon(path, idle_timeout=args.idle_timeout).serve()
+    except RuntimeError as e:
+        print(str(e))
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
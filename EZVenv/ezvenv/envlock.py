@@ -0,0 +1,138 @@
+import contextlib
+import hashlib
+import json
+import os
+import socket
+import time
+
+
+@contextlib.contextmanager
+def file_lock(path, exclusive=False, blocking=True):
+    """
+    A shared or exclusive flock() on path (created if needed) for the duration of
+    the block, released by the kernel if the holder dies. Does nothing on Windows.
+
+    Yields:
+        bool: True if the lock is held, False if blocking is off and it is busy.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as file:
+        try:
+            import fcntl
+        except ImportError:
+            yield True
+            return
+        mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.flock(file, mode if blocking else mode | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        # Closing the file releases the flock.
+        yield True
+
+
+class BuildLock:
+    """
+    An exclusive, cross-process lock on the build of one environment, with the
+    state of the latest build next to it (building, done or failed, by which
+    process, for which fingerprint).
+
+    The lock is an flock() on a file under lock_dir, so it is released by the
+    kernel when its holder dies; a waiter then finds the state still "building"
+    and builds again. A caller that had to wait for a build that finished
+    successfully for the same fingerprint can reuse it (see reusable()). on_wait
+    is called with the state of the running build before blocking on it, e.g. to
+    tell the user whom they are waiting for.
+    flock() is not available on Windows, where the lock does nothing.
+    """
+
+    def __init__(self, lock_dir, env_path, fingerprint=None, on_wait=None):
+        key = hashlib.sha256(os.path.abspath(env_path).encode()).hexdigest()[:32]
+        self.path = os.path.join(lock_dir, key + ".lock")
+        self.state_path = os.path.join(lock_dir, key + ".json")
+        self.env_path = env_path
+        self.fingerprint = fingerprint
+        self.on_wait = on_wait
+        self.previous = None
+        # The process that built the environment; a caller that reuses a build keeps its builder.
+        self.builder = os.getpid()
+        self._file = None
+
+    def read_state(self):
+        """
+        Returns:
+            dict: The state of the latest build, or None.
+        """
+        try:
+            with open(self.state_path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_state(self, status):
+        state = {
+            "env": self.env_path,
+            "status": status,
+            "pid": os.getpid(),
+            "builder": self.builder,
+            "host": socket.gethostname(),
+            "fingerprint": self.fingerprint,
+            "time": time.time(),
+        }
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(state, file)
+        os.replace(tmp_path, self.state_path)
+
+    def acquire(self):
+        """
+        Take the lock, waiting for the build in flight if there is one.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, "a")
+        try:
+            import fcntl
+        except ImportError:
+            return self
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            started = time.time()
+            if self.on_wait is not None:
+                self.on_wait(self.read_state())
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+            state = self.read_state()
+            if state and state.get("time", 0) >= started:
+                self.previous = state
+                if self.reusable():
+                    self.builder = state.get("builder", state.get("pid"))
+        self._write_state("building")
+        return self
+
+    def reusable(self):
+        """
+        True if we waited for a build of the same fingerprint that succeeded.
+        """
+        return (self.previous is not None and self.previous.get("status") == "done"
+                and self.previous.get("fingerprint") == self.fingerprint and os.path.isdir(self.env_path))
+
+    def release(self, status="done"):
+        """
+        Record the outcome of the build ("done" or "failed") and release the lock.
+        """
+        if self._file is None:
+            return
+        try:
+            self._write_state(status)
+        finally:
+            # Closing the file releases the flock.
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release("done" if exc_type is None else "failed")
+        return False
@@ -0,0 +1,247 @@
+import hashlib
+import http.server
+import json
+import logging
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import quote, unquote, urljoin, urlparse
+
+DEFAULT_INDEX_URL = "https://pypi.org/simple/"
+
+_HREF_RE = re.compile(r'href="([^"]+)"')
+
+
+def original_url(url, files_url=None):
+    """
+    Return the upstream URL of an artifact link served by the IndexProxy whose
+    artifact prefix is files_url (IndexProxy.files_url), so nothing proxy-specific
+    ends up in lockfiles. Any other URL, e.g. one of a local index server using the
+    same layout, is returned unchanged.
+    """
+    if not files_url or not url.startswith(files_url):
+        return url
+    quoted, _, fragment = url[len(files_url):].partition("#")
+    return unquote(quoted) + (f"#{fragment}" if fragment else "")
+
+
+class IndexCache:
+    """
+    On-disk cache of package index responses.
+
+    Project pages (simple API) are revalidated with ETag/Last-Modified once they are
+    older than max_age seconds; a 304 answer only refreshes the stored entry.
+    Wheel metadata files (PEP 658) are immutable and never revalidated. Each entry is
+    a JSON header file plus a body file named after the SHA-256 of the URL.
+    """
+
+    def __init__(self, cache_dir, max_age=600, timeout=30):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.timeout = timeout
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url, accept):
+        key = hashlib.sha256(f"{accept}|{url}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, key + ".json"), os.path.join(self.cache_dir, key + ".body")
+
+    def fetch(self, url, accept="text/html", immutable=False):
+        """
+        Return (status, content type, body) for url, from the cache when possible.
+
+        Parameters:
+            url (str): The upstream URL.
+            accept (str): The Accept header sent upstream (part of the cache key).
+            immutable (bool): The resource never changes (e.g. wheel metadata).
+
+        Raises:
+            urllib.error.URLError: If the upstream cannot be reached and nothing is cached.
+        """
+        meta_path, body_path = self._paths(url, accept)
+        meta = None
+        try:
+            with open(meta_path, "r") as file:
+                meta = json.load(file)
+            with open(body_path, "rb") as file:
+                body = file.read()
+        except (OSError, ValueError):
+            meta = None
+        if meta and (immutable or time.time() - meta["fetched"] < self.max_age):
+            self.hits += 1
+            os.utime(meta_path)
+            return 200, meta["contentType"], body
+
+        request = urllib.request.Request(url, headers={"Accept": accept, "User-Agent": "ezvenv-index-cache"})
+        if meta:
+            if meta.get("etag"):
+                request.add_header("If-None-Match", meta["etag"])
+            if meta.get("lastModified"):
+                request.add_header("If-Modified-Since", meta["lastModified"])
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                new_body = response.read()
+                headers = response.headers
+                status = response.status
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and meta:
+                self.revalidated += 1
+                meta["fetched"] = time.time()
+                self._store(meta_path, body_path, meta, None)
+                return 200, meta["contentType"], body
+            if e.code == 404:
+                return 404, "text/plain", b""
+            raise
+        except urllib.error.URLError:
+            if meta:
+                logging.warning("Index unreachable, serving stale %s", url)
+                return 200, meta["contentType"], body
+            raise
+        self.misses += 1
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "lastModified": headers.get("Last-Modified"),
+            "contentType": headers.get("Content-Type", "application/octet-stream"),
+            "fetched": time.time(),
+        }
+        self._store(meta_path, body_path, meta, new_body)
+        return status, meta["contentType"], new_body
+
+    def _store(self, meta_path, body_path, meta, body):
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        if body is not None:
+            with open(body_path + suffix, "wb") as file:
+                file.write(body)
+            os.replace(body_path + suffix, body_path)
+        with open(meta_path + suffix, "w") as file:
+            json.dump(meta, file)
+        os.replace(meta_path + suffix, meta_path)
+
+    def compact(self, max_size):
+        """
+        Compact the cache on disk: remove leftover temporary files and bodies without
+        a header, then evict the least recently used entries until the cache fits in
+        max_size bytes.
+
+        Returns:
+            int: The number of bytes freed.
+        """
+        freed = 0
+        entries = {}
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".tmp"):
+                freed += entry.stat().st_size
+                os.remove(entry.path)
+                continue
+            key, _, kind = entry.name.partition(".")
+            entries.setdefault(key, {})[kind] = entry
+        sized = []
+        for key, files in entries.items():
+            if "json" not in files or "body" not in files:
+                for entry in files.values():
+                    freed += entry.stat().st_size
+                    os.remove(entry.path)
+                continue
+            size = files["json"].stat().st_size + files["body"].stat().st_size
+            sized.append((files["json"].stat().st_mtime, size, files))
+        total = sum(size for mtime, size, files in sized)
+        for mtime, size, files in sorted(sized, key=lambda item: item[0]):
+            if total <= max_size:
+                break
+            for entry in files.values():
+                os.remove(entry.path)
+            total -= size
+            freed += size
+        if freed:
+            logging.info("Compacted index cache %s, freed %d bytes.", self.cache_dir, freed)
+        return freed
+
+
+class IndexProxy:
+    """
+    Local HTTP front for a package index that answers from an IndexCache.
+
+    pip (or any other tool) is pointed at proxy.url. Project pages are served from
+    the cache with their file links rewritten to go through the proxy, so PEP 658
+    metadata files are cached too; the artifacts themselves are answered with a
+    redirect to the upstream URL.
+    """
+
+    def __init__(self, cache, upstream=DEFAULT_INDEX_URL):
+        self.cache = cache
+        self.upstream = upstream if upstream.endswith("/") else upstream + "/"
+        proxy = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                proxy._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/simple/"
+        # Prefix of the artifact links the proxy rewrites (see original_url).
+        self.files_url = f"http://127.0.0.1:{self.server.server_address[1]}/files/"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _rewrite(self, page_url, body):
+        """
+        Point every file link of a simple-API HTML page at the proxy.
+        """
+        def replace(match):
+            href = match.group(1).replace("&amp;", "&")
+            absolute = urljoin(page_url, href)
+            target, _, fragment = absolute.partition("#")
+            proxied = "/files/" + quote(target, safe="")
+            return f'href="{proxied}{"#" + fragment if fragment else ""}"'
+        return _HREF_RE.sub(replace, body.decode("utf-8")).encode("utf-8")
+
+    def _handle(self, request):
+        path = request.path
+        try:
+            if path.startswith("/simple/"):
+                page_url = urljoin(self.upstream, path[len("/simple/"):])
+                status, content_type, body = self.cache.fetch(page_url, accept="text/html")
+                if status == 200:
+                    body = self._rewrite(page_url, body)
+                    content_type = "text/html"
+                self._respond(request, status, content_type, body)
+            elif path.startswith("/files/"):
+                target = unquote(path[len("/files/"):])
+                if urlparse(target).scheme not in ("http", "https"):
+                    self._respond(request, 400, "text/plain", b"bad target")
+                elif target.endswith(".metadata"):
+                    status, content_type, body = self.cache.fetch(target, accept="*/*", immutable=True)
+                    self._respond(request, status, content_type, body)
+                else:
+                    request.send_response(307)
+                    request.send_header("Location", target)
+                    request.send_header("Content-Length", "0")
+                    request.end_headers()
+            else:
+                self._respond(request, 404, "text/plain", b"not found")
+        except Exception as e:
+            logging.warning("Index proxy failed for %s: %s", path, str(e))
+            self._respond(request, 502, "text/plain", str(e).encode())
+
+    def _respond(self, request, status, content_type, body):
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
@@ -0,0 +1,469 @@
+import base64
+import csv
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import zipfile
+
+from . import store
+
+# Value written to the INSTALLER file of every distribution installed by EZVenv.
+INSTALLER_NAME = "ezvenv"
+
+SCRIPT_TEMPLATE = """#!{python}
+# -*- coding: utf-8 -*-
+import re
+import sys
+from {module} import {import_name}
+if __name__ == "__main__":
+    sys.argv[0] = re.sub(r"(-script\\.pyw|\\.exe)?$", "", sys.argv[0])
+    sys.exit({func}())
+"""
+
+
+class InstallError(Exception):
+    """Raised when a wheel cannot be installed."""
+
+
+def _normalize(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _record_hash(data):
+    digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=")
+    return "sha256=" + digest.decode()
+
+
+def env_scheme(envPath, site_packages):
+    """
+    Return the install scheme (target directories) of a virtual environment.
+
+    Parameters:
+        envPath (str): The virtual environment.
+        site_packages (str): Its site-packages directory.
+
+    Returns:
+        dict: Scheme key ("purelib", "platlib", "scripts", "data", "headers") -> directory,
+          plus "python", the environment's interpreter used in script shebangs.
+    """
+    version = os.path.basename(os.path.dirname(site_packages))
+    if not version.startswith("python"):
+        version = "python"
+    bin_dir = os.path.join(envPath, "Scripts" if os.name == "nt" else "bin")
+    return {
+        "purelib": site_packages,
+        "platlib": site_packages,
+        "scripts": bin_dir,
+        "data": envPath,
+        "headers": os.path.join(envPath, "include", "site", version),
+        "python": os.path.join(bin_dir, "python"),
+    }
+
+
+def wheel_name(wheel_path):
+    """
+    Return the normalized distribution name of a wheel file.
+    """
+    return _normalize(os.path.basename(wheel_path).split("-")[0])
+
+
+def _safe_target(base, relative):
+    """
+    Join base and a path from an archive, refusing paths that escape base.
+    """
+    target = os.path.normpath(os.path.join(base, relative))
+    if os.path.commonpath([os.path.abspath(base), os.path.abspath(target)]) != os.path.abspath(base):
+        raise InstallError(f"Refusing to install {relative!r} outside of {base}")
+    return target
+
+
+def plan_wheel(wheel_path, scheme):
+    """
+    Map every file of a wheel to its target path, without writing anything.
+
+    Parameters:
+        wheel_path (str): The wheel file.
+        scheme (dict): The install scheme returned by env_scheme().
+
+    Returns:
+        tuple: (dist-info directory name, list of (archive member, target path, is_script),
+          list of (entry point script path, script content bytes))
+    """
+    with zipfile.ZipFile(wheel_path) as archive:
+        names = [name for name in archive.namelist() if not name.endswith("/")]
+        dist_info = {name.split("/")[0] for name in names if name.split("/")[0].endswith(".dist-info")}
+        if len(dist_info) != 1:
+            raise InstallError(f"{wheel_path} does not contain exactly one .dist-info directory")
+        dist_info = dist_info.pop()
+        scripts = _entry_point_scripts(archive, dist_info, scheme)
+    data_dir = dist_info[:-len(".dist-info")] + ".data"
+
+    plan = []
+    for name in names:
+        parts = name.split("/")
+        if parts[0] == data_dir:
+            if len(parts) < 3 or parts[1] not in ("purelib", "platlib", "scripts", "data", "headers"):
+                raise InstallError(f"Unsupported data path {name} in {wheel_path}")
+            base = scheme[parts[1]]
+            target = _safe_target(base, "/".join(parts[2:]))
+            plan.append((name, target, parts[1] == "scripts"))
+        else:
+            if name == f"{dist_info}/RECORD":
+                continue
+            plan.append((name, _safe_target(scheme["purelib"], name), False))
+    return dist_info, plan, scripts
+
+
+def _entry_point_scripts(archive, dist_info, scheme):
+    """
+    Generate console/gui scripts for the entry points declared by a wheel.
+
+    Returns:
+        list: (target path, script content bytes)
+    """
+    try:
+        content = archive.read(f"{dist_info}/entry_points.txt").decode()
+    except KeyError:
+        return []
+    scripts = []
+    section = None
+    for line in content.splitlines():
+        line = line.strip()
+        if not line or line.startswith(("#", ";")):
+            continue
+        if line.startswith("["):
+            section = line.strip("[]").strip()
+            continue
+        if section not in ("console_scripts", "gui_scripts") or "=" not in line:
+            continue
+        name, _, target = (part.strip() for part in line.partition("="))
+        target = target.split("[")[0].strip()
+        module, _, attr = target.partition(":")
+        attr = attr.strip()
+        if not attr:
+            # "name = module" without an attribute is not a callable entry point.
+            continue
+        script = SCRIPT_TEMPLATE.format(python=scheme["python"], module=module.strip(),
+                                        import_name=attr.split(".")[0], func=attr)
+        scripts.append((os.path.join(scheme["scripts"], name), script.encode()))
+    return scripts
+
+
+def install_wheel(wheel_path, scheme, installer=INSTALLER_NAME, store_root=None):
+    """
+    Install a wheel into a virtual environment without starting pip.
+
+    Unpacks the wheel according to the install scheme, rewrites "#!python" script
+    shebangs, generates entry point scripts, and writes INSTALLER and RECORD.
+    The .dist-info directory is assembled in a staging directory and renamed into
+    place last, so a distribution only looks installed once all of its files are
+    in place. If the install fails, the files written so far are removed.
+
+    Parameters:
+        wheel_path (str): The wheel file.
+        scheme (dict): The install scheme returned by env_scheme().
+        installer (str): Value written to the INSTALLER file.
+        store_root (str): Content-addressed store (see ezvenv.store). When given,
+          the wheel's files are hardlinked from the store instead of written.
+
+    Returns:
+        str: The path of the installed .dist-info directory.
+    """
+    dist_info, plan, scripts = plan_wheel(wheel_path, scheme)
+    site_packages = scheme["purelib"]
+    dist_info_path = os.path.join(site_packages, dist_info)
+    staging_path = os.path.join(site_packages, f".{dist_info}.{os.getpid()}.{threading.get_ident()}.tmp")
+    records = []
+    written = []
+
+    def staged(target):
+        # Files of the .dist-info directory are written to the staging directory.
+        if target == dist_info_path or target.startswith(dist_info_path + os.sep):
+            return staging_path + target[len(dist_info_path):]
+        return target
+
+    try:
+        with zipfile.ZipFile(wheel_path) as archive:
+            for member, target, is_script in plan:
+                data = archive.read(member)
+                if is_script and data.startswith(b"#!python"):
+                    data = b"#!" + scheme["python"].encode() + data[len(b"#!python"):]
+                executable = is_script or _is_executable(archive.getinfo(member))
+                if store_root and not is_script:
+                    store.link_bytes(store_root, data, staged(target), executable=executable)
+                else:
+                    _write_file(staged(target), data, executable=executable)
+                written.append(staged(target))
+                records.append((target, data))
+        for target, data in scripts:
+            _write_file(target, data, executable=True)
+            written.append(target)
+            records.append((target, data))
+
+        installer_data = (installer + "\n").encode()
+        _write_file(os.path.join(staging_path, "INSTALLER"), installer_data)
+        records.append((os.path.join(dist_info_path, "INSTALLER"), installer_data))
+        _write_record(staging_path, dist_info_path, site_packages, records)
+        if os.path.exists(dist_info_path):
+            shutil.rmtree(dist_info_path)
+        os.rename(staging_path, dist_info_path)
+    except BaseException:
+        for path in written:
+            if not path.startswith(staging_path) and os.path.lexists(path):
+                os.remove(path)
+        shutil.rmtree(staging_path, ignore_errors=True)
+        raise
+    return dist_info_path
+
+
+def find_conflicts(plans, replaced=()):
+    """
+    Find files that more than one wheel would install, or that already exist on disk
+    and do not belong to a distribution being replaced.
+
+    Parameters:
+        plans (dict): Wheel path -> result of plan_wheel().
+        replaced (set): Files of the installed distributions that will be removed first.
+
+    Returns:
+        list: Human-readable conflict descriptions (empty if there are none).
+    """
+    owners = {}
+    conflicts = []
+    for wheel, (dist_info, plan, scripts) in plans.items():
+        targets = [target for member, target, is_script in plan] + [target for target, data in scripts]
+        for target in targets:
+            if target in owners:
+                conflicts.append(f"{target} is provided by both {os.path.basename(owners[target])} "
+                                 f"and {os.path.basename(wheel)}")
+            elif os.path.lexists(target) and target not in replaced:
+                conflicts.append(f"{target} from {os.path.basename(wheel)} already exists")
+            owners[target] = wheel
+    return conflicts
+
+
+def install_wheels(wheels, scheme, jobs=None, installer=INSTALLER_NAME, store_root=None):
+    """
+    Install several independent wheels concurrently with a bounded thread pool.
+
+    Installed versions of the same distributions are moved aside first (see stash())
+    and only deleted once their replacement is installed; a wheel that fails to
+    install gets its previous version back. All wheels are planned before anything
+    is written, and the install is refused if two wheels (or a wheel and a file
+    already on disk) would write the same file. Unpacking is
+    dominated by zlib decompression and file I/O, which release the GIL.
+
+    Parameters:
+        wheels (list): Wheel files of distinct distributions.
+        scheme (dict): The install scheme returned by env_scheme().
+        jobs (int): Maximum number of concurrent installs (defaults to the CPU count).
+        installer (str): Value written to the INSTALLER files.
+        store_root (str): Content-addressed store to link files from (see install_wheel()).
+
+    Returns:
+        list: The installed .dist-info paths.
+
+    Raises:
+        InstallError: On file conflicts, or if any wheel fails to install.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    site_packages = scheme["purelib"]
+    plans = {wheel: plan_wheel(wheel, scheme) for wheel in wheels}
+    replaced = set()
+    for wheel in wheels:
+        replaced.update(recorded_files(site_packages, wheel_name(wheel)))
+    conflicts = find_conflicts(plans, replaced)
+    if conflicts:
+        raise InstallError("File conflicts:\n  " + "\n  ".join(conflicts))
+    stashes = {}
+    try:
+        for wheel in wheels:
+            stashes[wheel] = stash(site_packages, wheel_name(wheel))
+    except BaseException:
+        for stashed in stashes.values():
+            restore(stashed)
+        raise
+
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(wheels) or 1))
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {wheel: pool.submit(install_wheel, wheel, scheme, installer, store_root) for wheel in wheels}
+    installed = []
+    failures = []
+    for wheel, future in futures.items():
+        try:
+            installed.append(future.result())
+        except Exception as e:
+            restore(stashes[wheel])
+            failures.append(f"{os.path.basename(wheel)}: {e}")
+        else:
+            drop(stashes[wheel], site_packages)
+    if failures:
+        raise InstallError("Failed to install:\n  " + "\n  ".join(failures))
+    return installed
+
+
+def _is_executable(info):
+    return bool((info.external_attr >> 16) & 0o111)
+
+
+def _write_file(target, data, executable=False):
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if os.path.lexists(target):
+        os.remove(target)
+    with open(target, "wb") as file:
+        file.write(data)
+    if executable:
+        os.chmod(target, 0o755)
+
+
+def _write_record(staging_path, dist_info_path, site_packages, records):
+    """
+    Write the RECORD file of a distribution into its staging .dist-info directory.
+    Paths are recorded relative to site-packages, as they will be once installed.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    record_path = os.path.join(dist_info_path, "RECORD")
+    for target, data in records:
+        relative = os.path.relpath(target, site_packages).replace(os.sep, "/")
+        writer.writerow([relative, _record_hash(data), len(data)])
+    writer.writerow([os.path.relpath(record_path, site_packages).replace(os.sep, "/"), "", ""])
+    with open(os.path.join(staging_path, "RECORD"), "w") as file:
+        file.write(buffer.getvalue())
+
+
+def find_dist_info(site_packages, name):
+    """
+    Return the .dist-info directory of an installed distribution, or None.
+    """
+    normalized = _normalize(name)
+    for entry in os.listdir(site_packages):
+        if entry.endswith(".dist-info") and _normalize(entry.split("-")[0]) == normalized:
+            return os.path.join(site_packages, entry)
+    return None
+
+
+def recorded_files(site_packages, name):
+    """
+    Return the paths listed in the RECORD file of an installed distribution.
+
+    Returns:
+        list: Normalized absolute paths (empty if the distribution is not installed).
+    """
+    dist_info_path = find_dist_info(site_packages, name)
+    record_path = os.path.join(dist_info_path, "RECORD") if dist_info_path else None
+    if not record_path or not os.path.exists(record_path):
+        return []
+    with open(record_path, "r", newline="") as file:
+        return [os.path.normpath(os.path.join(site_packages, row[0])) for row in csv.reader(file) if row]
+
+
+def uninstall(site_packages, name):
+    """
+    Remove an installed distribution using its RECORD file.
+
+    Parameters:
+        site_packages (str): The site-packages directory.
+        name (str): The distribution name.
+
+    Returns:
+        bool: True if the distribution was installed and has been removed.
+    """
+    stashed = stash(site_packages, name)
+    if stashed is None:
+        return False
+    drop(stashed, site_packages)
+    return True
+
+
+def stash(site_packages, name):
+    """
+    Move the files of an installed distribution (per its RECORD) and its .dist-info
+    directory into a temporary directory in site-packages, so they can be put back
+    with restore() or deleted with drop().
+
+    Returns:
+        tuple or None: (stash directory, list of (original path, stashed path)), or
+          None if the distribution is not installed.
+    """
+    dist_info_path = find_dist_info(site_packages, name)
+    if not dist_info_path:
+        return None
+    stash_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(dist_info_path)}.", suffix=".stash", dir=site_packages)
+    moved = []
+    try:
+        for path in recorded_files(site_packages, name):
+            if path.startswith(dist_info_path + os.sep) or not os.path.lexists(path) or os.path.isdir(path):
+                continue
+            stashed = os.path.join(stash_dir, str(len(moved)))
+            os.rename(path, stashed)
+            moved.append((path, stashed))
+        stashed = os.path.join(stash_dir, "dist-info")
+        os.rename(dist_info_path, stashed)
+        moved.append((dist_info_path, stashed))
+    except BaseException:
+        restore((stash_dir, moved))
+        raise
+    return stash_dir, moved
+
+
+def restore(stashed):
+    """
+    Put the files moved aside by stash() back. Paths that exist again (written by
+    another distribution meanwhile) are left alone.
+    """
+    if stashed is None:
+        return
+    stash_dir, moved = stashed
+    for original, path in reversed(moved):
+        if not os.path.lexists(original):
+            os.makedirs(os.path.dirname(original), exist_ok=True)
+            os.rename(path, original)
+    shutil.rmtree(stash_dir, ignore_errors=True)
+
+
+def drop(stashed, site_packages):
+    """
+    Delete the files moved aside by stash(), with the bytecode of removed modules
+    and the directories they leave empty.
+    """
+    if stashed is None:
+        return
+    stash_dir, moved = stashed
+    shutil.rmtree(stash_dir, ignore_errors=True)
+    directories = set()
+    for original, path in moved:
+        if original.endswith(".py") and not os.path.lexists(original):
+            _remove_bytecode(original)
+        directories.add(os.path.dirname(original))
+    # Prune directories left empty, deepest first.
+    for directory in sorted(directories, key=len, reverse=True):
+        _prune_empty(directory, site_packages)
+
+
+def _remove_bytecode(source_path):
+    cache_dir = os.path.join(os.path.dirname(source_path), "__pycache__")
+    if not os.path.isdir(cache_dir):
+        return
+    stem = os.path.splitext(os.path.basename(source_path))[0] + "."
+    for entry in os.listdir(cache_dir):
+        if entry.startswith(stem) and entry.endswith(".pyc"):
+            os.remove(os.path.join(cache_dir, entry))
+
+
+def _prune_empty(directory, stop):
+    stop = os.path.abspath(stop)
+    directory = os.path.abspath(directory)
+    while directory.startswith(stop + os.sep) and os.path.isdir(directory):
+        cache_dir = os.path.join(directory, "__pycache__")
+        if os.path.isdir(cache_dir) and not os.listdir(cache_dir):
+            os.rmdir(cache_dir)
+        if os.listdir(directory):
+            break
+        os.rmdir(directory)
+        directory = os.path.dirname(directory)
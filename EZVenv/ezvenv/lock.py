@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from urllib.parse import unquote, urlparse
+
+from . import process
+from .indexcache import original_url
+
+# Lockfile written next to the project's ezvenv.yaml.
+LOCK_FILE = "ezvenv.lock"
+LOCK_VERSION = 1
+
+_NAME_RE = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+
+def normalize(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def requirements_hash(reqPath):
+    """
+    Hash the content of a requirements file.
+    """
+    with open(reqPath, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def resolve(pip_executable, args, constraints=None):
+    """
+    Resolve requirements to a complete, pinned set with pip's installation report,
+    without installing anything.
+
+    Parameters:
+        pip_executable (str): The pip executable inside the virtual environment.
+        args (list): Requirement arguments (e.g. ["-r", "requirements.txt"]).
+        constraints (dict): Optional normalized name -> version pins passed as constraints.
+
+    Returns:
+        dict: The pip installation report.
+
+    Raises:
+        subprocess.CalledProcessError: If resolution fails.
+    """
+    fd, report_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    constraints_path = None
+    command = [pip_executable, "install", "--dry-run", "--quiet", "--ignore-installed",
+               "--report", report_path] + args
+    try:
+        if constraints:
+            fd, constraints_path = tempfile.mkstemp(suffix=".txt")
+            with os.fdopen(fd, "w") as file:
+                file.write("".join(f"{name}=={version}\n" for name, version in sorted(constraints.items())))
+            command += ["-c", constraints_path]
+        process.run(command, check=True)
+        with open(report_path, "r") as file:
+            return json.load(file)
+    finally:
+        os.remove(report_path)
+        if constraints_path:
+            os.remove(constraints_path)
+
+
+def _dependency_names(requires_dist):
+    names = []
+    for requirement in requires_dist or []:
+        match = _NAME_RE.match(requirement)
+        if match:
+            names.append(normalize(match.group(1)))
+    return names
+
+
+def _archive_hash(item):
+    """
+    Return "sha256:<hex>" for a report item, hashing local files pip did not hash.
+    """
+    info = item.get("download_info", {})
+    archive = info.get("archive_info", {})
+    hashes = archive.get("hashes") or {}
+    if "sha256" in hashes:
+        return "sha256:" + hashes["sha256"]
+    if archive.get("hash", "").startswith("sha256="):
+        return "sha256:" + archive["hash"].split("=", 1)[1]
+    url = info.get("url", "")
+    if url.startswith("file:"):
+        with open(unquote(urlparse(url).path), "rb") as file:
+            return "sha256:" + hashlib.sha256(file.read()).hexdigest()
+    return None
+
+
+def build_lock(report, requirements, reqPath, files_url=None):
+    """
+    Build the lock data from a pip installation report.
+
+    Parameters:
+        report (dict): The report returned by resolve().
+        requirements (list): (normalized name, specifier, line) of the top-level requirements.
+        reqPath (str): The requirements file that was resolved.
+        files_url (str): Artifact prefix of the index cache proxy the report was
+          resolved through, if any (see indexcache.original_url).
+
+    Returns:
+        dict: The lock data. "packages" maps each normalized name to its pinned version,
+          artifact file name, URL, sha256 hash and dependency names; "requirements" maps
+          each top-level requirement to its line, so later updates can tell which ones changed.
+    """
+    packages = {}
+    for item in report.get("install", []):
+        metadata = item.get("metadata", {})
+        name = normalize(metadata["name"])
+        url = original_url(item.get("download_info", {}).get("url", ""), files_url)
+        packages[name] = {
+            "version": metadata["version"],
+            "file": os.path.basename(unquote(urlparse(url).path)),
+            "url": url,
+            "hash": _archive_hash(item),
+            "requested": bool(item.get("requested")),
+            "dependencies": sorted(set(_dependency_names(metadata.get("requires_dist"))) & set(
+                normalize(i["metadata"]["name"]) for i in report.get("install", []))),
+        }
+    return {
+        "version": LOCK_VERSION,
+        "created": time.time(),
+        "requirementsHash": requirements_hash(reqPath),
+        "requirements": {name: line for name, spec, line in requirements},
+        "environment": report.get("environment", {}),
+        "packages": packages,
+    }
+
+
+def closure(lock, roots):
+    """
+    Return every package reachable from the given top-level names in the lock.
+    """
+    packages = lock.get("packages", {})
+    seen = set()
+    stack = [name for name in roots if name in packages]
+    while stack:
+        name = stack.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        stack.extend(dep for dep in packages[name]["dependencies"] if dep not in seen)
+    return seen
+
+
+def incremental_constraints(lock, requirements):
+    """
+    Compute the pins to keep when refreshing a lock: every package reachable from a
+    top-level requirement whose line did not change stays pinned, so only the
+    subtrees of added or modified requirements are re-resolved.
+
+    Returns:
+        tuple: (constraints dict, list of changed top-level names)
+    """
+    previous = lock.get("requirements", {})
+    current = {name: line for name, spec, line in requirements}
+    unchanged = [name for name, line in current.items() if previous.get(name) == line]
+    changed = sorted(name for name in current if name not in unchanged)
+    pinned = closure(lock, unchanged)
+    constraints = {name: lock["packages"][name]["version"] for name in pinned}
+    return constraints, changed
+
+
+def environment_matches(lock, python_version, sys_platform, platform_machine):
+    """
+    Check whether a lock was resolved for the given interpreter version and platform.
+    """
+    environment = lock.get("environment", {})
+    return (environment.get("python_full_version") == python_version
+            and environment.get("sys_platform") == sys_platform
+            and environment.get("platform_machine") == platform_machine)
+
+
+def read(path):
+    """
+    Read a lockfile.
+
+    Returns:
+        dict or None: The lock data, or None if it is missing, unreadable or of another version.
+    """
+    try:
+        with open(path, "r") as file:
+            lock = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return lock if lock.get("version") == LOCK_VERSION else None
+
+
+def write(path, lock):
+    """
+    Write a lockfile atomically.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(lock, file, indent=2, sort_keys=True)
+        file.write("\n")
+    os.replace(tmp_path, path)
@@ -0,0 +1,188 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+# The environment the current thread (or asyncio task) works on; added to every record.
+_env = contextvars.ContextVar("ezvenv_log_env", default=None)
+
+_queue_handler = None
+_file_handler = None
+_listener = None
+
+
+class SharedRotatingFileHandler(logging.Handler):
+    """
+    A size-rotated log file that several processes append to at once (parallel
+    inits, the daemon's children). Records are appended with O_APPEND, the rollover
+    happens under a lock file, and a process whose file was rotated by another one
+    reopens the new file instead of writing into the backup.
+    """
+
+    def __init__(self, path, max_bytes=0, backup_count=3):
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.stream = None
+
+    def _open(self):
+        if self.stream is not None:
+            self.stream.close()
+        self.stream = open(self.path, "a", encoding="utf-8")
+
+    def _rotated_elsewhere(self):
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self.stream.fileno()).st_ino
+        except OSError:
+            return True
+
+    def _rollover(self, pending):
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None
+        with open(self.path + ".lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Another process may have rotated while we waited for the lock; an
+                # empty file is kept even if the pending line alone exceeds the limit.
+                size = os.path.getsize(self.path)
+                if size and size + pending > self.max_bytes:
+                    for index in range(self.backup_count - 1, 0, -1):
+                        source = f"{self.path}.{index}"
+                        if os.path.exists(source):
+                            os.replace(source, f"{self.path}.{index + 1}")
+                    if self.backup_count:
+                        os.replace(self.path, f"{self.path}.1")
+                    else:
+                        os.truncate(self.path, 0)
+            except FileNotFoundError:
+                pass
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        self._open()
+
+    def emit(self, record):
+        try:
+            line = self.format(record) + "\n"
+            if self.stream is None or self._rotated_elsewhere():
+                self._open()
+            if self.max_bytes and os.fstat(self.stream.fileno()).st_size + len(line) > self.max_bytes:
+                self._rollover(len(line))
+            self.stream.write(line)
+            self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        with self.lock:
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+        super().close()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, pid, env and message, plus phase,
+    duration and status for phase records (see ezvenv.trace.span).
+    """
+
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 6),
+            "level": record.levelname,
+            "pid": record.process,
+            "env": getattr(record, "env", None),
+            "message": record.getMessage(),
+        }
+        for key in ("phase", "duration", "status"):
+            if hasattr(record, key):
+                entry[key] = getattr(record, key)
+        return json.dumps(entry)
+
+
+def _add_context(record):
+    # Runs in the logging thread, before the record is queued.
+    if not hasattr(record, "env"):
+        record.env = _env.get()
+    return True
+
+
+def bind(env_path):
+    """
+    Attach env_path to the records logged from the current context.
+    """
+    _env.set(env_path)
+
+
+def configure(path, max_bytes=0, backup_count=3, fmt="text", level=logging.INFO):
+    """
+    Log to path through a queue: callers only enqueue the record, and a background
+    thread formats and writes it. Calling it again only changes the size limit and
+    the format ("text" or "json"). Nothing is installed if the application already
+    configured the root logger (as logging.basicConfig would).
+
+    Returns:
+        bool: True if ezvenv's handler is installed.
+    """
+    global _queue_handler, _file_handler
+    root = logging.getLogger()
+    if _queue_handler is None:
+        if root.handlers:
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _file_handler = SharedRotatingFileHandler(path, max_bytes, backup_count)
+        _queue_handler = logging.handlers.QueueHandler(queue.Queue())
+        _queue_handler.addFilter(_add_context)
+        root.addHandler(_queue_handler)
+        root.setLevel(level)
+        _start()
+        atexit.register(stop)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_restart)
+    _file_handler.max_bytes = max_bytes
+    _file_handler.backup_count = backup_count
+    _file_handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+    return True
+
+
+def _start():
+    global _listener
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, _file_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart():
+    # The listener thread does not survive fork(); records the parent had not
+    # written yet stay the parent's.
+    if _queue_handler is not None:
+        _queue_handler.queue = queue.Queue()
+        _start()
+
+
+def flush():
+    """
+    Wait until every queued record is written (before os.execv or os._exit).
+    """
+    if _listener is not None and _listener._thread is not None:
+        _queue_handler.queue.join()
+
+
+def stop():
+    """
+    Write the queued records and stop the background thread.
+    """
+    global _listener
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+        _file_handler.close()
+    _listener = None
@@ -0,0 +1,196 @@
+import contextvars
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from . import trace
+
+# Limits for the subprocesses started by the current step (see Scope and ezvenv.aio.call).
+_scope = contextvars.ContextVar("ezvenv_process_scope", default=None)
+
+# Seconds between SIGTERM and SIGKILL when a child is cancelled or times out.
+KILL_GRACE = 5
+
+# Environment variables set for ezvenv's own subprocesses only (see set_env).
+_env_overrides = {}
+
+
+class Cancelled(subprocess.SubprocessError):
+    """
+    A subprocess was killed because its step was cancelled.
+    """
+
+
+class Scope:
+    """
+    Limits applied to every subprocess started while the scope is active:
+    a deadline (time.monotonic()) and a cancellation event, both of which kill the
+    running child, and the output mode: "inherit" (the child writes to our
+    stdout/stderr), "stream" (lines are copied to stdout, with an optional prefix,
+    so concurrent steps stay readable) or "capture" (lines are only collected in
+    self.lines).
+    """
+
+    def __init__(self, deadline=None, output="inherit", prefix=None):
+        self.deadline = deadline
+        self.output = output
+        self.prefix = prefix or ""
+        self.cancelled = threading.Event()
+        self.lines = []
+        self._lock = threading.Lock()
+
+    @property
+    def output_text(self):
+        with self._lock:
+            return "".join(self.lines)
+
+    def emit(self, line):
+        with self._lock:
+            self.lines.append(line)
+        if self.output == "stream":
+            sys.stdout.write(self.prefix + line)
+            sys.stdout.flush()
+
+
+def current_scope():
+    return _scope.get()
+
+
+def set_env(name, value):
+    """
+    Set an environment variable for every subprocess started through run() and
+    ezvenv.aio.run(), without exporting it from this process: a shell or script it
+    later execs into does not inherit it. A value of None removes the override.
+    """
+    if value is None:
+        _env_overrides.pop(name, None)
+    else:
+        _env_overrides[name] = value
+
+
+def child_env(env=None):
+    """
+    Return the environment for a subprocess: env (else ours) plus the overrides,
+    or env unchanged if there are none.
+    """
+    if not _env_overrides:
+        return env
+    return dict(os.environ if env is None else env, **_env_overrides)
+
+
+def _command_name(command):
+    name = os.path.basename(str(command[0]))
+    if len(command) > 2 and command[1] == "-m":
+        name += f" -m {command[2]}"
+    elif len(command) > 1:
+        name += f" {command[1]}"
+    return name
+
+
+def run(command, check=False, input=None, **kwargs):
+    """
+    Run a subprocess like subprocess.run(); every external command in ezvenv goes
+    through here.
+
+    When tracing is enabled it records a "subprocess" span with the child's own CPU
+    time, peak RSS (from os.wait4) and exit status. When a Scope is active (the call
+    comes from an ezvenv.aio step) the child is killed on cancellation (Cancelled)
+    or at the scope's deadline (subprocess.TimeoutExpired), and its output is
+    streamed or captured as the scope says. Supports the subprocess.run() arguments
+    used in ezvenv (check, input, stdout/stderr, text, cwd, env).
+    """
+    scope = _scope.get()
+    if _env_overrides:
+        kwargs["env"] = child_env(kwargs.get("env"))
+    if scope is None and not trace.enabled():
+        return subprocess.run(command, check=check, input=input, **kwargs)
+    with trace.span(_command_name(command), "subprocess", command=[str(part) for part in command]) as current:
+        if input is not None:
+            kwargs["stdin"] = subprocess.PIPE
+        pump_output = scope is not None and scope.output != "inherit" and kwargs.get("stdout") is None
+        if pump_output:
+            kwargs["stdout"] = subprocess.PIPE
+            if kwargs.get("stderr") is None:
+                kwargs["stderr"] = subprocess.STDOUT
+        proc = subprocess.Popen(command, **kwargs)
+        outputs = {}
+        readers = []
+        for key, stream in (("stdout", proc.stdout), ("stderr", proc.stderr)):
+            if stream is None:
+                continue
+            if key == "stdout" and pump_output:
+                target = lambda s=stream: _pump(s, scope)
+            else:
+                target = lambda k=key, s=stream: outputs.__setitem__(k, s.read())
+            reader = threading.Thread(target=target, daemon=True)
+            reader.start()
+            readers.append(reader)
+        try:
+            if input is not None:
+                proc.stdin.write(input)
+                proc.stdin.close()
+            status, usage = _wait(proc, scope)
+            for reader in readers:
+                reader.join()
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+        for stream in (proc.stdout, proc.stderr):
+            if stream is not None:
+                stream.close()
+        if usage is not None:
+            # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+            current.child_max_rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+            current.args["cpu"] = round(usage.ru_utime + usage.ru_stime, 6)
+        current.args["exitCode"] = proc.returncode
+        current.status = "ok" if proc.returncode == 0 else f"exit {proc.returncode}"
+    if status is not None:
+        raise status
+    result = subprocess.CompletedProcess(command, proc.returncode, outputs.get("stdout"), outputs.get("stderr"))
+    if check:
+        result.check_returncode()
+    return result
+
+
+def _pump(stream, scope):
+    for line in stream:
+        scope.emit(line if isinstance(line, str) else line.decode(errors="replace"))
+
+
+def _wait(proc, scope):
+    """
+    Wait for proc, killing it when the scope is cancelled or past its deadline.
+
+    Returns:
+        tuple: (exception to raise or None, resource usage of the child or None)
+    """
+    delay = 0.001
+    while True:
+        if hasattr(os, "wait4"):
+            pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+            if pid:
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                return None, usage
+        elif proc.poll() is not None:
+            return None, None
+        if scope is not None:
+            if scope.cancelled.is_set():
+                _terminate(proc)
+                return Cancelled(f"{proc.args[0]} was cancelled"), None
+            if scope.deadline is not None and time.monotonic() > scope.deadline:
+                _terminate(proc)
+                return subprocess.TimeoutExpired(proc.args, 0), None
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+
+def _terminate(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=KILL_GRACE)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import stat
+import time
+
+REGISTRY_FILE = "registry.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS environments (
+    path TEXT PRIMARY KEY,
+    project_dir TEXT NOT NULL,
+    interpreter TEXT,
+    python_version TEXT,
+    requirements_hash TEXT,
+    size INTEGER,
+    created REAL NOT NULL,
+    last_used REAL,
+    last_sync REAL
+);
+CREATE INDEX IF NOT EXISTS environments_project_dir ON environments (project_dir);
+CREATE INDEX IF NOT EXISTS environments_last_used ON environments (last_used);
+"""
+
+COLUMNS = ("path", "project_dir", "interpreter", "python_version", "requirements_hash",
+           "size", "created", "last_used", "last_sync")
+
+
+def connect(db_path):
+    """
+    Open the registry, creating it if needed. WAL mode lets parallel inits write
+    while "ezvenv list" reads; writers wait up to 10 seconds for each other.
+    """
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def record(db_path, path, project_dir, **fields):
+    """
+    Insert or update an environment in one transaction. Only the given fields are
+    changed on an existing row; "created" is set on insert.
+
+    Parameters:
+        db_path (str): The registry database.
+        path (str): The virtual environment path (primary key).
+        project_dir (str): The project directory it belongs to.
+        **fields: Any other column of COLUMNS.
+    """
+    unknown = set(fields) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown registry fields: {', '.join(sorted(unknown))}")
+    fields = dict(fields, project_dir=project_dir)
+    names = sorted(fields)
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute(
+                f"INSERT INTO environments (path, created, {', '.join(names)}) "
+                f"VALUES (?, ?, {', '.join('?' for _ in names)}) "
+                f"ON CONFLICT(path) DO UPDATE SET {', '.join(f'{name}=excluded.{name}' for name in names)}",
+                [path, time.time()] + [fields[name] for name in names])
+    finally:
+        conn.close()
+
+
+def touch(db_path, path):
+    """
+    Set the last-use time of a registered environment (no-op if it is not registered).
+    """
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.execute("UPDATE environments SET last_used=? WHERE path=?", (time.time(), path))
+    finally:
+        conn.close()
+
+
+def remove(db_path, paths):
+    """
+    Drop environments from the registry.
+    """
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.executemany("DELETE FROM environments WHERE path=?", [(path,) for path in paths])
+    finally:
+        conn.close()
+
+
+def list_environments(db_path, order="last_used"):
+    """
+    Return every registered environment as a dict, most recent first by order.
+    """
+    if order not in COLUMNS:
+        raise ValueError(f"Unknown order column {order!r}")
+    if not os.path.exists(db_path):
+        return []
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(f"SELECT * FROM environments ORDER BY {order} IS NULL, {order} DESC, path").fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+def find(db_path, path):
+    """
+    Return the environments registered at path or for the project directory path.
+    """
+    if not os.path.exists(db_path):
+        return []
+    conn = connect(db_path)
+    try:
+        rows = conn.execute("SELECT * FROM environments WHERE path=? OR project_dir=? ORDER BY path",
+                            (path, path)).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+def dir_size(path):
+    """
+    Return the disk usage of a directory tree in bytes (allocated blocks, each
+    hardlinked inode counted once, symlinks not followed).
+    """
+    seen = set()
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                stack.append(entry.path)
+                continue
+            if st.st_nlink > 1:
+                if (st.st_dev, st.st_ino) in seen:
+                    continue
+                seen.add((st.st_dev, st.st_ino))
+            total += st.st_blocks * 512 if hasattr(st, "st_blocks") else st.st_size
+    return total
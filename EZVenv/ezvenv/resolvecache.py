@@ -0,0 +1,108 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+# Entries loaded by preload(), by path: (stamp, entry). Used by the ezvenvd daemon.
+_PRELOADED = {}
+
+
+def _stamp(stat):
+    # Not the mtime, which every hit refreshes. put() replaces an entry with a new
+    # file, so its inode changes whenever its content does.
+    return stat.st_ino, stat.st_size
+
+
+def cache_key(requirements, constraints, interpreter, index_id):
+    """
+    Compute the cache key of a resolution.
+
+    Parameters:
+        requirements (list): Normalized requirement lines.
+        constraints (dict): Normalized name -> pinned version (may be empty).
+        interpreter (dict): Interpreter identity (version, executable, platform, machine).
+        index_id (str): Identifies the package index and its snapshot.
+
+    Returns:
+        str: A hex key.
+    """
+    raw = json.dumps({
+        "requirements": sorted(requirements),
+        "constraints": sorted((constraints or {}).items()),
+        "interpreter": interpreter,
+        "index": index_id,
+    }, sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def get(cache_dir, key, ttl):
+    """
+    Return the cached resolved package set for key, or None if missing or older
+    than ttl seconds. A hit refreshes the entry's mtime (the LRU stamp used by evict()).
+    """
+    path = os.path.join(cache_dir, key + ".json")
+    try:
+        stamp = _stamp(os.stat(path))
+        preloaded = _PRELOADED.get(path)
+        if preloaded and preloaded[0] == stamp:
+            entry = preloaded[1]
+        else:
+            with open(path, "r") as file:
+                entry = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry.get("created", 0) > ttl:
+        return None
+    os.utime(path)
+    return entry.get("packages")
+
+
+def put(cache_dir, key, packages, max_entries):
+    """
+    Store a resolved package set and evict the least recently used entries beyond max_entries.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, key + ".json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump({"created": time.time(), "packages": packages}, file)
+    os.replace(tmp_path, path)
+    evict(cache_dir, max_entries)
+
+
+def preload(cache_dir):
+    """
+    Load every entry of the cache into memory (see get()); entries that changed on
+    disk since are read again.
+    """
+    if not os.path.isdir(cache_dir):
+        return
+    for entry in os.scandir(cache_dir):
+        if not entry.name.endswith(".json"):
+            continue
+        stamp = _stamp(entry.stat())
+        if _PRELOADED.get(entry.path, (None,))[0] == stamp:
+            continue
+        try:
+            with open(entry.path, "r") as file:
+                _PRELOADED[entry.path] = (stamp, json.load(file))
+        except (OSError, ValueError):
+            pass
+
+
+def evict(cache_dir, max_entries):
+    """
+    Delete the least recently used entries until at most max_entries remain.
+
+    Returns:
+        int: The number of evicted entries.
+    """
+    entries = [entry for entry in os.scandir(cache_dir) if entry.name.endswith(".json")]
+    excess = len(entries) - max_entries
+    if excess <= 0:
+        return 0
+    for entry in sorted(entries, key=lambda e: e.stat().st_mtime)[:excess]:
+        os.remove(entry.path)
+    logging.info("Evicted %d resolver cache entries from %s.", excess, cache_dir)
+    return excess
@@ -0,0 +1,157 @@
+import ctypes
+import errno
+import glob
+import logging
+import os
+import shutil
+import subprocess
+import sys
+
+from . import process
+
+# renameat2() flag exchanging two paths atomically (Linux >= 3.15).
+_RENAME_EXCHANGE = 2
+_AT_FDCWD = -100
+
+
+def staging_path(env_path):
+    """
+    The directory a new build of env_path is staged in: next to it, so the final
+    rename stays on one filesystem.
+    """
+    return f"{env_path}.staging-{os.getpid()}"
+
+
+def previous_path(env_path):
+    """
+    Where the environment replaced by the latest swap is kept for rollback().
+    """
+    return f"{env_path}.previous"
+
+
+def remove_stale(env_path):
+    """
+    Delete staging directories left behind by interrupted builds. Only call it
+    while holding the environment's build lock.
+    """
+    for path in glob.glob(glob.escape(env_path) + ".staging-*"):
+        logging.info("Removing the interrupted build %s", path)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def is_valid(env_path, python):
+    """
+    True if env_path looks like a complete virtual environment: it has a
+    pyvenv.cfg and an interpreter.
+    """
+    return os.path.isfile(os.path.join(env_path, "pyvenv.cfg")) and os.path.exists(python)
+
+
+def validate(env_path, python):
+    """
+    Check that a staged environment is complete and that its interpreter starts
+    with the environment as sys.prefix.
+
+    Raises:
+        RuntimeError: If the environment is incomplete or its interpreter is broken.
+    """
+    if not is_valid(env_path, python):
+        raise RuntimeError(f"The build at {env_path} is incomplete.")
+    result = process.run([python, "-c", "import sys; print(sys.prefix)"],
+                         stdout=subprocess.PIPE, text=True)
+    if result.returncode != 0 or os.path.realpath(result.stdout.strip()) != os.path.realpath(env_path):
+        raise RuntimeError(f"The interpreter of the build at {env_path} does not start.")
+
+
+def relocate(env_path, old_prefix, new_prefix):
+    """
+    Rewrite the files of an environment that embed its absolute path (script
+    shebangs, activate scripts, pyvenv.cfg and symlinks in bin) from old_prefix to
+    new_prefix. Files are replaced rather than edited, since they may be hardlinks
+    into the package store or a template.
+    """
+    old = old_prefix.encode()
+    new = new_prefix.encode()
+    bin_dir = os.path.join(env_path, "bin")
+    paths = [os.path.join(env_path, "pyvenv.cfg")]
+    if os.path.isdir(bin_dir):
+        paths += [entry.path for entry in os.scandir(bin_dir)]
+    for path in paths:
+        if os.path.islink(path):
+            link = os.readlink(path)
+            if link.startswith(old_prefix):
+                os.remove(path)
+                os.symlink(new_prefix + link[len(old_prefix):], path)
+            continue
+        if not os.path.isfile(path):
+            continue
+        with open(path, "rb") as file:
+            content = file.read()
+        if old not in content:
+            continue
+        tmp_path = path + ".relocate"
+        with open(tmp_path, "wb") as file:
+            file.write(content.replace(old, new))
+        shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+
+
+def _exchange(a, b):
+    """
+    Atomically exchange two directories with renameat2(RENAME_EXCHANGE).
+
+    Returns:
+        bool: False if the platform or filesystem does not support it.
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+    except (OSError, AttributeError):
+        return False
+    if renameat2(_AT_FDCWD, os.fsencode(a), _AT_FDCWD, os.fsencode(b), _RENAME_EXCHANGE) == 0:
+        return True
+    err = ctypes.get_errno()
+    if err in (errno.ENOSYS, errno.EINVAL, errno.ENOTSUP):
+        return False
+    raise OSError(err, os.strerror(err), a)
+
+
+def swap(staged, env_path, keep_previous=True):
+    """
+    Move a staged build to env_path. An existing environment is exchanged with it
+    atomically where the OS supports it (else with two renames) and is then kept
+    at previous_path(env_path), replacing the one kept before, or deleted.
+    """
+    previous = previous_path(env_path)
+    if not os.path.lexists(env_path):
+        os.rename(staged, env_path)
+        return
+    if os.path.lexists(previous):
+        shutil.rmtree(previous)
+    if _exchange(staged, env_path):
+        os.rename(staged, previous)
+    else:
+        os.rename(env_path, previous)
+        os.rename(staged, env_path)
+    if not keep_previous:
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def rollback(env_path):
+    """
+    Swap the environment with the one kept by the latest swap(); calling it again
+    rolls forward.
+
+    Returns:
+        bool: False if there is no previous environment.
+    """
+    previous = previous_path(env_path)
+    if not os.path.isdir(previous):
+        return False
+    if not _exchange(previous, env_path):
+        parked = staging_path(env_path)
+        os.rename(env_path, parked)
+        os.rename(previous, env_path)
+        os.rename(parked, previous)
+    return True
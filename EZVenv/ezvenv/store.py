@@ -0,0 +1,187 @@
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import stat
+import tempfile
+
+# Linux FICLONE ioctl (reflink a whole file on btrfs, XFS, ...).
+_FICLONE = 0x40049409
+
+
+def object_path(root, digest, executable=False):
+    """
+    Return the store path of an object. Executable and non-executable copies of
+    the same content are separate objects, since hardlinks share their mode.
+    """
+    suffix = "-x" if executable else ""
+    return os.path.join(root, "objects", digest[:2], digest[2:] + suffix)
+
+
+def _digest_file(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _publish(tmp_path, obj, executable):
+    """
+    Make a finished temporary file the object obj. The object is read-only, so a
+    write through any environment's hardlink cannot silently corrupt the others.
+    """
+    os.chmod(tmp_path, 0o555 if executable else 0o444)
+    os.makedirs(os.path.dirname(obj), exist_ok=True)
+    try:
+        os.link(tmp_path, obj)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(tmp_path)
+
+
+def put_bytes(root, data, executable=False):
+    """
+    Add content to the store (if it is not there yet) and return its object path.
+    An existing object is compared with the content before it is reused; one that
+    differs is corrupt and replaced.
+    """
+    obj = object_path(root, hashlib.sha256(data).hexdigest(), executable)
+    try:
+        if os.stat(obj).st_size == len(data):
+            with open(obj, "rb") as file:
+                if file.read() == data:
+                    return obj
+        logging.warning("Store object %s is corrupt. Replacing it.", obj)
+        os.remove(obj)
+    except FileNotFoundError:
+        pass
+    tmp_dir = os.path.join(root, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    with os.fdopen(fd, "wb") as file:
+        file.write(data)
+    _publish(tmp_path, obj, executable)
+    return obj
+
+
+def _reflink(source, target):
+    import fcntl
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+
+
+def link(obj, target):
+    """
+    Materialize a store object at target: hardlink, else reflink, else copy
+    (e.g. when the store and the environment are on different filesystems).
+
+    Returns:
+        str: "hardlink", "reflink" or "copy".
+    """
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if os.path.lexists(target):
+        os.remove(target)
+    try:
+        os.link(obj, target)
+        return "hardlink"
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EMLINK, errno.EPERM, errno.EACCES, errno.ENOTSUP):
+            raise
+    try:
+        _reflink(obj, target)
+        method = "reflink"
+    except (OSError, ImportError):
+        if os.path.lexists(target):
+            os.remove(target)
+        shutil.copyfile(obj, target)
+        method = "copy"
+    os.chmod(target, stat.S_IMODE(os.stat(obj).st_mode) | stat.S_IWUSR)
+    return method
+
+
+def link_bytes(root, data, target, executable=False):
+    """
+    Store content and materialize it at target (see link()). If target is on
+    another filesystem than the store, the content is written to target alone:
+    it could only be copied from the store, so storing it would save nothing.
+
+    Returns:
+        str: "hardlink", "reflink" or "copy".
+    """
+    os.makedirs(root, exist_ok=True)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if os.stat(root).st_dev != os.stat(os.path.dirname(target)).st_dev:
+        if os.path.lexists(target):
+            os.remove(target)
+        with open(target, "wb") as file:
+            file.write(data)
+        if executable:
+            os.chmod(target, 0o755)
+        return "copy"
+    return link(put_bytes(root, data, executable), target)
+
+
+def dedupe_file(root, path):
+    """
+    Replace a file with a hardlink to the store object holding the same content.
+    A file whose content is not in the store yet becomes the object itself.
+
+    Returns:
+        bool: True if the file now shares its storage with the store.
+    """
+    st = os.lstat(path)
+    if not stat.S_ISREG(st.st_mode):
+        return False
+    executable = bool(st.st_mode & 0o111)
+    obj = object_path(root, _digest_file(path), executable)
+    try:
+        obj_stat = os.stat(obj)
+    except FileNotFoundError:
+        obj_stat = None
+    if obj_stat is not None and obj_stat.st_ino == st.st_ino and obj_stat.st_dev == st.st_dev:
+        return True
+    tmp_dir = os.path.join(root, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    if os.stat(tmp_dir).st_dev != st.st_dev:
+        # Different filesystem: hardlinks are impossible and copies save nothing.
+        return False
+    if obj_stat is None:
+        tmp_path = os.path.join(tmp_dir, f"{os.getpid()}-{os.path.basename(path)}")
+        os.link(path, tmp_path)
+        _publish(tmp_path, obj, executable)
+        return True
+    tmp_target = f"{path}.{os.getpid()}.ezvenv-tmp"
+    os.link(obj, tmp_target)
+    os.replace(tmp_target, path)
+    return True
+
+
+def verify(root, remove=True):
+    """
+    Check every store object against the hash in its name.
+
+    Parameters:
+        root (str): The store directory.
+        remove (bool): Delete corrupt objects (they are re-added on the next install).
+
+    Returns:
+        list: Paths of the corrupt objects.
+    """
+    corrupt = []
+    objects_dir = os.path.join(root, "objects")
+    if not os.path.isdir(objects_dir):
+        return corrupt
+    for prefix in os.listdir(objects_dir):
+        for name in os.listdir(os.path.join(objects_dir, prefix)):
+            path = os.path.join(objects_dir, prefix, name)
+            expected = prefix + name.split("-")[0]
+            if _digest_file(path) != expected:
+                corrupt.append(path)
+                if remove:
+                    os.remove(path)
+    if corrupt:
+        logging.warning("Found %d corrupt objects in the store %s.", len(corrupt), root)
+    return corrupt
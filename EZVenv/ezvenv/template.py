@@ -0,0 +1,189 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from . import process
+
+# Marker written into a template once it is completely built.
+TEMPLATE_MARKER = "ezvenv-template.json"
+
+
+
+def template_key(python):
+    """
+    Compute the template key for a Python interpreter.
+
+    The key changes whenever the interpreter binary is replaced (e.g. upgraded),
+    so a stale template is never cloned for a different interpreter. The PATH
+    lookup is memoized by core._which (the ezvenvd daemon fills it when it starts);
+    symlinks are still resolved and the binary stat()ed on every call.
+
+    Parameters:
+        python (str): Interpreter name or path (e.g. "python3.11" or sys.executable).
+
+    Returns:
+        str: A short hex key, or None if the interpreter cannot be found.
+    """
+    from .core import _which
+    found = _which(python) or python
+    if not os.path.exists(found):
+        return None
+    # Symlinks (e.g. python3 -> python3.11) are followed every time, as they may be retargeted.
+    resolved = os.path.realpath(found)
+    stat = os.stat(resolved)
+    raw = f"{resolved}:{stat.st_size}:{int(stat.st_mtime)}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def read_marker(template_path):
+    """
+    Read the marker of a completed template.
+
+    Returns:
+        dict: The marker contents, or None if the template is missing or incomplete.
+    """
+    try:
+        with open(os.path.join(template_path, TEMPLATE_MARKER), "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_template(python, template_root, core_packages, max_age, lock_dir=None):
+    """
+    Return a base template virtual environment for the given interpreter, building
+    (or rebuilding, when older than max_age seconds) it if needed.
+
+    The template is built in a temporary directory next to its final location and
+    renamed into place, so an interrupted build never leaves a half populated
+    template behind. With lock_dir, builds of the same template are serialized by a
+    BuildLock (see ezvenv.envlock): processes that find it missing wait for the
+    first one to build it and then use its template instead of building their own.
+    A rebuilt template replaces the old one under the exclusive use lock (see
+    using()), so it never disappears under a clone in progress.
+
+    Parameters:
+        python (str): Interpreter used to create the template.
+        template_root (str): Directory holding all templates.
+        core_packages (list): Packages upgraded inside the template.
+        max_age (int): Maximum template age in seconds before it is rebuilt.
+        lock_dir (str): Directory of the build locks (None builds without locking).
+
+    Returns:
+        str: The path to the template.
+
+    Raises:
+        RuntimeError: If the interpreter cannot be found.
+        subprocess.CalledProcessError: If creating the template fails.
+    """
+    key = template_key(python)
+    if key is None:
+        raise RuntimeError(f"Python interpreter not found: {python}")
+    template_path = os.path.join(template_root, key)
+    if _is_fresh(template_path, max_age):
+        return template_path
+    if lock_dir is None:
+        return _build_template(python, key, template_root, template_path, core_packages)
+
+    from .envlock import BuildLock
+    with BuildLock(lock_dir, template_path):
+        # Another process may have built it while we waited for the lock.
+        if _is_fresh(template_path, max_age):
+            return template_path
+        return _build_template(python, key, template_root, template_path, core_packages, lock_dir)
+
+
+@contextlib.contextmanager
+def using(template_path, lock_dir=None, exclusive=False):
+    """
+    Hold the use lock of a template: shared while cloning it, exclusive while
+    replacing it. Without lock_dir nothing is locked.
+    """
+    if lock_dir is None:
+        yield True
+        return
+    from .envlock import file_lock
+    with file_lock(os.path.join(lock_dir, f"template-{os.path.basename(template_path)}.use"), exclusive) as locked:
+        yield locked
+
+
+def _is_fresh(template_path, max_age):
+    marker = read_marker(template_path)
+    return bool(marker) and time.time() - marker.get("created", 0) < max_age
+
+
+def _build_template(python, key, template_root, template_path, core_packages, lock_dir=None):
+    os.makedirs(template_root, exist_ok=True)
+    build_path = tempfile.mkdtemp(prefix=f".{key}-", dir=template_root)
+    try:
+        logging.info("Building base template for %s at %s", python, template_path)
+        print(f"🧱 Building base environment template for {python}...")
+        process.run([python, "-m", "venv", "--clear", build_path], check=True)
+        pip_executable = os.path.join(build_path, "bin", "pip")
+        process.run([pip_executable, "install", "--upgrade"] + core_packages, check=True)
+        with open(os.path.join(build_path, TEMPLATE_MARKER), "w") as file:
+            json.dump({"python": python, "buildPath": build_path, "created": time.time()}, file)
+        with using(template_path, lock_dir, exclusive=True):
+            if os.path.exists(template_path):
+                shutil.rmtree(template_path, ignore_errors=True)
+            try:
+                os.rename(build_path, template_path)
+            except OSError:
+                # Another process installed a template first; use theirs.
+                shutil.rmtree(build_path, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(build_path, ignore_errors=True)
+        raise
+    return template_path
+
+
+def clone_template(template_path, dest):
+    """
+    Create a virtual environment at dest by copying a template.
+
+    Regular files are hardlinked where possible (falling back to copies), symlinks
+    are recreated, and files that embed the template's build path (script shebangs,
+    activate scripts, pyvenv.cfg) are rewritten to point at dest.
+
+    Parameters:
+        template_path (str): The template created by ensure_template().
+        dest (str): The path of the new virtual environment (must not exist).
+    """
+    marker = read_marker(template_path)
+    old_prefix = marker["buildPath"].encode()
+    new_prefix = os.path.abspath(dest).encode()
+    rewrite_dirs = {os.path.join(template_path, "bin")}
+
+    for root, dirs, files in os.walk(template_path):
+        target_root = os.path.join(dest, os.path.relpath(root, template_path))
+        os.makedirs(target_root, exist_ok=True)
+        for name in dirs + files:
+            source = os.path.join(root, name)
+            target = os.path.join(target_root, name)
+            if os.path.islink(source):
+                link = os.readlink(source)
+                if link.startswith(marker["buildPath"]):
+                    link = os.path.abspath(dest) + link[len(marker["buildPath"]):]
+                os.symlink(link, target)
+                if name in dirs:
+                    dirs.remove(name)
+            elif name in files:
+                if name == TEMPLATE_MARKER:
+                    continue
+                if root in rewrite_dirs or (root == template_path and name == "pyvenv.cfg"):
+                    with open(source, "rb") as file:
+                        content = file.read()
+                    if old_prefix in content:
+                        with open(target, "wb") as file:
+                            file.write(content.replace(old_prefix, new_prefix))
+                        shutil.copymode(source, target)
+                        continue
+                try:
+                    os.link(source, target)
+                except OSError:
+                    shutil.copy2(source, target)
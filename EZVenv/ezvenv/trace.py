@@ -0,0 +1,188 @@
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# Set by enable() so a process that re-executes itself (activate_env) keeps
+# appending to the same trace: "<pid>:<path>" (os.execv keeps the pid).
+_PARENT_ENV = "EZVENV_TRACE_PARENT"
+
+_lock = threading.Lock()
+_path = None
+_pid = None
+_spans = []
+# The innermost open span. A context variable rather than a thread-local, so spans
+# opened in worker threads started with a copy of the context (aio.call,
+# asyncio.to_thread) nest under the span that started them.
+_current = contextvars.ContextVar("ezvenv_trace_span", default=None)
+
+
+def enabled():
+    return _path is not None and _pid == os.getpid()
+
+
+def enable(path):
+    """
+    Start recording spans and export them to path: JSON lines if it ends with
+    ".jsonl", the Chrome trace-event format (chrome://tracing, Perfetto) otherwise.
+    The file is rewritten when a root span (or a span recorded outside of any span)
+    ends, so it is complete even if the process re-executes itself.
+    """
+    global _path, _pid
+    path = os.path.abspath(path)
+    if os.environ.get(_PARENT_ENV) == f"{os.getpid()}:{path}":
+        _spans[:] = _load(path)
+    else:
+        _spans.clear()
+    _path = path
+    _pid = os.getpid()
+    os.environ[_PARENT_ENV] = f"{_pid}:{path}"
+
+
+def _load(path):
+    try:
+        with open(path, "r") as file:
+            if path.endswith(".jsonl"):
+                return [json.loads(line) for line in file if line.strip()]
+            return [_from_chrome(event) for event in json.load(file).get("traceEvents", [])]
+    except (OSError, ValueError):
+        return []
+
+
+def _children_rusage():
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _record(span):
+    with _lock:
+        _spans.append(span)
+    if _current.get() is None:
+        flush()
+
+
+def _log_phase(name, wall, status):
+    # Phase durations also go to the log, where the JSON format keeps them as fields.
+    import logging
+    logging.info("Phase %s finished in %.3fs (%s).", name, wall, status,
+                 extra={"phase": name, "duration": round(wall, 6), "status": status})
+
+
+class span:
+    """
+    Record a span around a block (or, as a decorator, a function): wall time, CPU
+    time of this process and of the subprocesses it waited for, the peak RSS of the
+    subprocess spans nested in it and the exit status. Only the wall time of
+    "phase" spans is measured (and logged) unless tracing is enabled.
+    """
+
+    def __init__(self, name, category="phase", **args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*a, **kw):
+            with span(self.name, self.category, **self.args):
+                return func(*a, **kw)
+        return wrapper
+
+    def __enter__(self):
+        self.active = enabled()
+        self.wall = time.perf_counter()
+        if not self.active:
+            return self
+        self.status = "ok"
+        self.child_max_rss = 0
+        self.start = time.time()
+        self.cpu = time.process_time()
+        self.child_cpu = _children_rusage()
+        self.parent = _current.get()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.wall
+        if not self.active:
+            if self.category == "phase":
+                _log_phase(self.name, wall, "ok" if exc_type is None else "error")
+            return False
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.status = "exit" if exc_type is SystemExit else "error"
+        if self.category == "phase":
+            _log_phase(self.name, wall, self.status)
+        record = {
+            "name": self.name,
+            "cat": self.category,
+            "start": self.start,
+            "wall": round(wall, 6),
+            "cpu": round(time.process_time() - self.cpu, 6),
+            "childCpu": round(_children_rusage() - self.child_cpu, 6),
+            "childMaxRss": self.child_max_rss,
+            "status": self.status,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": self.args,
+        }
+        if self.parent is not None:
+            with _lock:
+                self.parent.child_max_rss = max(self.parent.child_max_rss, self.child_max_rss)
+        _record(record)
+        return False
+
+
+def record(name, start, wall, status, category="phase", **args):
+    """
+    Record a span measured elsewhere (e.g. a project built by a worker process).
+    """
+    if enabled():
+        _record({"name": name, "cat": category, "start": start, "wall": round(wall, 6), "cpu": 0.0,
+                 "childCpu": 0.0, "childMaxRss": 0, "status": status, "pid": os.getpid(),
+                 "tid": threading.get_ident(), "args": args})
+
+
+def _to_chrome(record):
+    return {
+        "name": record["name"], "cat": record["cat"], "ph": "X",
+        "ts": int(record["start"] * 1e6), "dur": int(record["wall"] * 1e6),
+        "pid": record["pid"], "tid": record["tid"],
+        "args": dict(record["args"], cpu=record["cpu"], childCpu=record["childCpu"],
+                     childMaxRss=record["childMaxRss"], status=record["status"]),
+    }
+
+
+def _from_chrome(event):
+    args = dict(event.get("args", {}))
+    return {
+        "name": event["name"], "cat": event.get("cat", "phase"), "start": event["ts"] / 1e6,
+        "wall": event["dur"] / 1e6, "cpu": args.pop("cpu", 0.0), "childCpu": args.pop("childCpu", 0.0),
+        "childMaxRss": args.pop("childMaxRss", 0), "status": args.pop("status", "ok"),
+        "pid": event["pid"], "tid": event["tid"], "args": args,
+    }
+
+
+def flush():
+    """
+    Write every recorded span to the trace file.
+    """
+    if not enabled():
+        return
+    with _lock:
+        spans = list(_spans)
+    tmp_path = f"{_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as file:
+        if _path.endswith(".jsonl"):
+            for record in spans:
+                file.write(json.dumps(record) + "\n")
+        else:
+            json.dump({"traceEvents": [_to_chrome(record) for record in spans], "displayTimeUnit": "ms"}, file)
+    os.replace(tmp_path, _path)
@@ -0,0 +1,204 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from urllib.parse import unquote, urlparse
+
+from . import process
+
+# Upgrades refresh the wheelhouse from the index at most this often (seconds) for the
+# same requirement arguments; in between they upgrade from the wheelhouse alone.
+UPGRADE_REFRESH_INTERVAL = 3600
+
+# Lock file guarding the wheels against eviction while they are in use (see lock()).
+LOCK_FILE = ".lock"
+
+
+@contextlib.contextmanager
+def lock(wheel_dir, exclusive=False, blocking=True):
+    """
+    Lock the wheelhouse: installs hold a shared lock while they resolve and install
+    from it, eviction holds an exclusive one, so it never deletes a wheel that a
+    concurrent (possibly offline) install depends on. See envlock.file_lock().
+
+    Yields:
+        bool: True if the lock is held, False if blocking is off and it is busy.
+    """
+    from .envlock import file_lock
+    with file_lock(os.path.join(wheel_dir, LOCK_FILE), exclusive, blocking) as locked:
+        yield locked
+
+
+def fill(pip_executable, args, wheel_dir):
+    """
+    Download (or build) wheels for the given requirements into the wheelhouse.
+    Wheels already present in the wheelhouse are reused by pip.
+
+    Parameters:
+        pip_executable (str): The pip executable inside the virtual environment.
+        args (list): Requirement arguments (e.g. ["-r", "requirements.txt"] or package names).
+        wheel_dir (str): The wheelhouse directory.
+
+    Raises:
+        subprocess.CalledProcessError: If pip fails.
+    """
+    os.makedirs(wheel_dir, exist_ok=True)
+    logging.info("Filling wheelhouse %s for %s", wheel_dir, " ".join(args))
+    process.run([pip_executable, "wheel", "--wheel-dir", wheel_dir] + args, check=True)
+
+
+def install(pip_executable, args, wheel_dir, upgrade=False, offline=False, max_size=None):
+    """
+    Install requirements from the wheelhouse without contacting the package index.
+
+    - Plain installs are first attempted from the wheelhouse alone; on a miss the
+      wheelhouse is filled from the index and the install is retried offline.
+    - Upgrades refresh the wheelhouse from the index first, since only the index
+      knows about newer versions, unless the same arguments were refreshed within
+      UPGRADE_REFRESH_INTERVAL; then a single offline run upgrades to the newest
+      wheels at hand (filling and retrying only if it fails).
+    - In offline mode the index is never contacted.
+    - The wheelhouse is locked (shared) meanwhile; eviction runs afterwards, and is
+      skipped if another install is using the wheelhouse (gc evicts it later).
+
+    Parameters:
+        pip_executable (str): The pip executable inside the virtual environment.
+        args (list): Requirement arguments passed to pip.
+        wheel_dir (str): The wheelhouse directory.
+        upgrade (bool): Pass --upgrade to pip.
+        offline (bool): Never fill the wheelhouse from the index.
+        max_size (int): Wheelhouse size cap in bytes (None disables eviction).
+
+    Raises:
+        subprocess.CalledProcessError: If the install fails.
+    """
+    stamp = _fill_stamp(wheel_dir, args)
+    with lock(wheel_dir):
+        refreshed = False
+        if upgrade and not offline and not _fresh(stamp):
+            fill(pip_executable, args, wheel_dir)
+            _touch(stamp)
+            refreshed = True
+        try:
+            _install_offline(pip_executable, args, wheel_dir, upgrade, quiet=not (offline or refreshed))
+        except subprocess.CalledProcessError:
+            if offline or refreshed:
+                raise
+            logging.info("Wheelhouse miss for %s. Filling from the index.", " ".join(args))
+            fill(pip_executable, args, wheel_dir)
+            if upgrade:
+                _touch(stamp)
+            _install_offline(pip_executable, args, wheel_dir, upgrade)
+    if max_size:
+        evict(wheel_dir, max_size, wait=False)
+
+
+def _fill_stamp(wheel_dir, args):
+    # Kept in a subdirectory, so evict() and size() only see wheels.
+    key = hashlib.sha256("\0".join(args).encode()).hexdigest()[:16]
+    return os.path.join(wheel_dir, ".refreshed", key)
+
+
+def _fresh(stamp):
+    try:
+        return time.time() - os.path.getmtime(stamp) < UPGRADE_REFRESH_INTERVAL
+    except OSError:
+        return False
+
+
+def _touch(stamp):
+    os.makedirs(os.path.dirname(stamp), exist_ok=True)
+    with open(stamp, "a"):
+        pass
+    os.utime(stamp)
+
+
+def _install_offline(pip_executable, args, wheel_dir, upgrade, quiet=False):
+    """
+    Run "pip install --no-index --find-links <wheel_dir>" and mark the wheels it
+    used as recently used (their mtime is the LRU stamp used by evict()).
+
+    Parameters:
+        quiet (bool): Capture pip's error output instead of showing it (used for the
+          first attempt, whose failure only means the wheelhouse must be filled).
+    """
+    fd, report_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    command = [pip_executable, "install", "--no-index", "--find-links", wheel_dir,
+               "--report", report_path] + (["--upgrade"] if upgrade else []) + args
+    try:
+        if quiet:
+            result = process.run(command, stderr=subprocess.PIPE, text=True)
+            if result.returncode != 0:
+                logging.info("Offline install failed: %s", result.stderr.strip())
+                raise subprocess.CalledProcessError(result.returncode, command, stderr=result.stderr)
+        else:
+            process.run(command, check=True)
+        touch_used(report_path, wheel_dir)
+    finally:
+        os.remove(report_path)
+
+
+def touch_used(report_path, wheel_dir):
+    """
+    Update the mtime of every wheelhouse file listed in a pip installation report.
+    """
+    try:
+        with open(report_path, "r") as file:
+            report = json.load(file)
+    except (OSError, ValueError):
+        return
+    root = os.path.realpath(wheel_dir)
+    for item in report.get("install", []):
+        url = item.get("download_info", {}).get("url", "")
+        if not url.startswith("file:"):
+            continue
+        path = os.path.realpath(unquote(urlparse(url).path))
+        if os.path.dirname(path) == root and os.path.exists(path):
+            os.utime(path)
+
+
+def size(wheel_dir):
+    """
+    Return the total size of the wheelhouse in bytes.
+    """
+    total = 0
+    if os.path.isdir(wheel_dir):
+        for entry in os.scandir(wheel_dir):
+            if entry.is_file() and not entry.name.startswith("."):
+                total += entry.stat().st_size
+    return total
+
+
+def evict(wheel_dir, max_size, wait=True):
+    """
+    Delete least recently used wheels until the wheelhouse fits in max_size bytes,
+    holding the wheelhouse lock exclusively.
+
+    Parameters:
+        wait (bool): Wait for the installs using the wheelhouse to finish; if False
+          and it is in use, nothing is evicted.
+
+    Returns:
+        list: The names of the evicted files.
+    """
+    with lock(wheel_dir, exclusive=True, blocking=wait) as locked:
+        if not locked:
+            logging.info("Wheelhouse %s is in use. Skipping eviction.", wheel_dir)
+            return []
+        entries = [entry for entry in os.scandir(wheel_dir) if entry.is_file() and not entry.name.startswith(".")]
+        total = sum(entry.stat().st_size for entry in entries)
+        evicted = []
+        for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+            if total <= max_size:
+                break
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+            evicted.append(entry.name)
+    if evicted:
+        logging.info("Evicted %d wheels from %s to respect the size cap.", len(evicted), wheel_dir)
+    return evicted
@@ -0,0 +1,339 @@
+"""
+Startup-latency benchmarks for the init/activate path.
+
+Every scenario runs in a fresh process with an isolated HOME (so CONFIG_DIR,
+templates and the wheelhouse start empty) against a local stand-in package index
+served from 127.0.0.1, so the benchmark runs offline:
+
+    cold-init   create + set up an environment with empty caches
+    warm-init   create + set up a new environment with caches populated
+    noop-init   set up an environment that is already up to date
+    install     "ezvenv install" in a set-up project
+    update      "ezvenv update" in a set-up project
+    activate    activate_env() re-exec into the environment's interpreter
+
+Results (median of --repeat runs) are appended to a JSON history file and compared
+with the previous entry; slowdowns above --threshold are reported as regressions.
+
+The stand-in index serves small generated wheels plus wheels of the core packages
+(pip, setuptools, pyyaml). Those are taken from --seed-wheels if given, else from
+the wheels bundled with ensurepip, else repacked from the distributions installed
+in the running interpreter; the benchmark aborts if one cannot be found. A
+scenario that exits non-zero or reports a failure ("❌") aborts it as well, so
+failure paths are never recorded as timings.
+
+Usage:
+    python scripts/benchmark.py [--repeat N] [--history FILE] [--threshold PCT] [--fail-on-regression]
+"""
+import argparse
+import base64
+import glob
+import hashlib
+import http.server
+import importlib.metadata
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_HISTORY = os.path.join(os.path.expanduser("~"), ".EZVenv", "benchmarks.json")
+
+# Packages the stand-in index must serve for templates and core updates to work.
+SEED_PACKAGES = ["pip", "setuptools", "pyyaml"]
+
+# Generated stand-in distributions: (name, version, dependencies)
+STAND_IN_DISTS = [
+    ("ezbench-a", "1.0", []),
+    ("ezbench-a", "1.1", []),
+    ("ezbench-b", "1.0", ["ezbench-a"]),
+]
+
+SETUP_CODE = """
+import sys
+from ezvenv.core import EZVenv
+EZVenv(config_file=sys.argv[1] + "/ezvenv.yaml", env_dir=sys.argv[1], auto_activate=False).setup_env()
+"""
+
+ACTIVATE_CODE = """
+import os, sys
+if os.environ.get("EZVENV_ALREADY_ACTIVATED") == "1":
+    sys.exit(0)
+from ezvenv.core import EZVenv
+EZVenv(config_file=sys.argv[1] + "/ezvenv.yaml", env_dir=sys.argv[1]).activate_env()
+"""
+
+
+def build_wheel(directory, name, version, dependencies):
+    """
+    Write a minimal pure-Python wheel for a stand-in distribution.
+    """
+    module = name.replace("-", "_")
+    dist_info = f"{module}-{version}.dist-info"
+    metadata = f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n"
+    metadata += "".join(f"Requires-Dist: {dep}\n" for dep in dependencies)
+    files = {
+        f"{module}/__init__.py": f"__version__ = {version!r}\n",
+        f"{dist_info}/METADATA": metadata,
+        f"{dist_info}/WHEEL": "Wheel-Version: 1.0\nGenerator: ezvenv-benchmark\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+    }
+    record = []
+    for path, content in files.items():
+        digest = base64.urlsafe_b64encode(hashlib.sha256(content.encode()).digest()).rstrip(b"=").decode()
+        record.append(f"{path},sha256={digest},{len(content.encode())}")
+    record.append(f"{dist_info}/RECORD,,")
+    files[f"{dist_info}/RECORD"] = "\n".join(record) + "\n"
+    wheel_path = os.path.join(directory, f"{module}-{version}-py3-none-any.whl")
+    with zipfile.ZipFile(wheel_path, "w") as archive:
+        for path, content in files.items():
+            archive.writestr(path, content)
+    return wheel_path
+
+
+def _record_line(path, content):
+    digest = base64.urlsafe_b64encode(hashlib.sha256(content).digest()).rstrip(b"=").decode()
+    return f"{path},sha256={digest},{len(content)}"
+
+
+def repack_installed(directory, name):
+    """
+    Build a wheel of a distribution installed in the running interpreter from its
+    RECORD (files outside site-packages, such as scripts, are regenerated by the
+    installer from entry_points.txt).
+
+    Returns:
+        str or None: The wheel path, or None if the distribution is not installed.
+    """
+    try:
+        dist = importlib.metadata.distribution(name)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+    wheel_info = dist.read_text("WHEEL") or ""
+    tags = [line.split(":", 1)[1].strip() for line in wheel_info.splitlines() if line.startswith("Tag:")]
+    dist_name = dist.metadata["Name"].replace("-", "_")
+    wheel_path = os.path.join(directory, f"{dist_name}-{dist.version}-{tags[0] if tags else 'py3-none-any'}.whl")
+    record = []
+    record_path = None
+    with zipfile.ZipFile(wheel_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for file in dist.files or []:
+            path = file.as_posix()
+            if path.startswith("..") or "__pycache__" in path or path.endswith(".pyc"):
+                continue
+            if path.endswith(".dist-info/RECORD"):
+                record_path = path
+                continue
+            if path.endswith(("INSTALLER", "REQUESTED", "direct_url.json")) and ".dist-info/" in path:
+                continue
+            with open(file.locate(), "rb") as handle:
+                content = handle.read()
+            archive.writestr(path, content)
+            record.append(_record_line(path, content))
+        record.append(f"{record_path},,")
+        archive.writestr(record_path, "\n".join(record) + "\n")
+    return wheel_path
+
+
+def seed_wheels(directory, seed_dir=None):
+    """
+    Put a wheel of every SEED_PACKAGES distribution into directory, without network:
+    from seed_dir, the ensurepip bundle or the running interpreter.
+
+    Raises:
+        RuntimeError: If a seed wheel cannot be found or built.
+    """
+    import ensurepip
+    sources = [seed_dir] if seed_dir else []
+    sources.append(os.path.join(os.path.dirname(ensurepip.__file__), "_bundled"))
+    for package in SEED_PACKAGES:
+        for source in sources:
+            found = sorted(path for path in glob.glob(os.path.join(source, "*.whl"))
+                           if os.path.basename(path).split("-")[0].lower() == package)
+            if found:
+                shutil.copy(found[-1], directory)
+                break
+        else:
+            if repack_installed(directory, package) is None:
+                raise RuntimeError(f"No wheel for {package}: pass --seed-wheels or install it in {sys.executable}")
+
+
+def build_index(root, seed_dir=None):
+    """
+    Build a PEP 503 simple index in root from the stand-in wheels and the seed wheels.
+    """
+    files_dir = os.path.join(root, "files")
+    os.makedirs(files_dir)
+    for name, version, dependencies in STAND_IN_DISTS:
+        build_wheel(files_dir, name, version, dependencies)
+    seed_wheels(files_dir, seed_dir)
+    projects = {}
+    for entry in sorted(os.listdir(files_dir)):
+        project = entry.split("-")[0].replace("_", "-").lower()
+        projects.setdefault(project, []).append(entry)
+    for project, wheels in projects.items():
+        project_dir = os.path.join(root, "simple", project)
+        os.makedirs(project_dir)
+        links = "".join(f'<a href="../../files/{wheel}">{wheel}</a>\n' for wheel in wheels)
+        with open(os.path.join(project_dir, "index.html"), "w") as file:
+            file.write(f"<html><body>\n{links}</body></html>\n")
+
+
+def serve(root):
+    """
+    Serve root over HTTP on a random local port in a background thread.
+
+    Returns:
+        tuple: (server, base URL)
+    """
+    class QuietHandler(http.server.SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=root, **kwargs)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/simple/"
+
+
+class Workspace:
+    """
+    An isolated HOME plus project directories for one benchmark repetition.
+    """
+
+    def __init__(self, index_url):
+        self.root = tempfile.mkdtemp(prefix="ezvenv-bench-")
+        self.home = os.path.join(self.root, "home")
+        os.makedirs(self.home)
+        self.env = dict(os.environ, HOME=self.home, PIP_INDEX_URL=index_url,
+                        PIP_DISABLE_PIP_VERSION_CHECK="1", PYTHONPATH=PACKAGE_ROOT)
+        self.env.pop("EZVENV_ALREADY_ACTIVATED", None)
+        self.env.pop("XDG_CACHE_HOME", None)
+        self.count = 0
+
+    def new_project(self, requirement="ezbench-b"):
+        self.count += 1
+        project = os.path.join(self.root, f"project{self.count}")
+        os.makedirs(project)
+        with open(os.path.join(project, "requirements.txt"), "w") as file:
+            file.write(requirement + "\n")
+        return project
+
+    def run(self, args, cwd=None):
+        """
+        Run a command in the workspace and return its wall time in seconds.
+
+        Raises:
+            RuntimeError: If the command exits non-zero or reports a failure ("❌").
+        """
+        start = time.perf_counter()
+        result = subprocess.run(args, cwd=cwd, env=self.env, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, text=True)
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0 or "❌" in result.stdout:
+            raise RuntimeError(f"{' '.join(args)} failed:\n{result.stdout}")
+        return elapsed
+
+    def setup(self, project):
+        return self.run([sys.executable, "-c", SETUP_CODE, project])
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def run_once(index_url):
+    """
+    Run every scenario once and return scenario -> seconds.
+    """
+    workspace = Workspace(index_url)
+    try:
+        results = {}
+        results["cold-init"] = workspace.setup(workspace.new_project())
+        project = workspace.new_project()
+        results["warm-init"] = workspace.setup(project)
+        results["noop-init"] = workspace.setup(project)
+        cli = [sys.executable, "-m", "ezvenv.cli"]
+        results["install"] = workspace.run(cli + ["install"], cwd=project)
+        results["update"] = workspace.run(cli + ["update"], cwd=project)
+        # activate_env re-executes sys.argv, so the activation code must live in a file.
+        script = os.path.join(workspace.root, "activate_bench.py")
+        with open(script, "w") as file:
+            file.write(ACTIVATE_CODE)
+        results["activate"] = workspace.run([sys.executable, script, project])
+        return results
+    finally:
+        workspace.cleanup()
+
+
+def load_history(path):
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the EZVenv init/activate path")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per scenario (median is kept)")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON history file")
+    parser.add_argument("--seed-wheels", default=None,
+                        help="Directory with pip/setuptools/pyyaml wheels served by the stand-in index "
+                             "(default: the ensurepip bundle, then the running interpreter's packages)")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Regression threshold in percent")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on a regression")
+    args = parser.parse_args()
+
+    index_root = tempfile.mkdtemp(prefix="ezvenv-index-")
+    try:
+        build_index(index_root, args.seed_wheels)
+        server, index_url = serve(index_root)
+        try:
+            runs = [run_once(index_url) for _ in range(args.repeat)]
+        finally:
+            server.shutdown()
+    except RuntimeError as e:
+        print(f"❌ Benchmark aborted, nothing recorded: {e}", file=sys.stderr)
+        sys.exit(2)
+    finally:
+        shutil.rmtree(index_root, ignore_errors=True)
+
+    results = {scenario: statistics.median(run[scenario] for run in runs) for scenario in runs[0]}
+    history = load_history(args.history)
+    previous = history[-1]["results"] if history else {}
+
+    regressions = []
+    for scenario, seconds in results.items():
+        line = f"{scenario:<10} {seconds * 1000:9.1f}ms"
+        if scenario in previous and previous[scenario] > 0:
+            change = (seconds - previous[scenario]) / previous[scenario] * 100
+            line += f"  ({change:+.1f}% vs previous)"
+            if change > args.threshold:
+                regressions.append(scenario)
+                line += "  ❌ regression"
+        print(line)
+
+    history.append({
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    })
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+    with open(args.history, "w") as file:
+        json.dump(history, file, indent=2)
+    print(f"📈 Results recorded in {args.history}")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
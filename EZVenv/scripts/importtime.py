@@ -0,0 +1,76 @@
+"""
+Check the import-time budget of "import ezvenv" and "ezvenv --help".
+
+Runs each scenario several times under "python -X importtime", keeps the best
+run, and fails if the ezvenv imports exceed the budget or if modules that should
+be imported lazily (ezvenv.core, yaml) show up.
+
+Usage:
+    python scripts/importtime.py [--runs N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# scenario name -> (code to run, budget in microseconds, modules that must not be imported)
+SCENARIOS = {
+    "import ezvenv": (
+        "import ezvenv",
+        5000,
+        ["ezvenv.core", "yaml"],
+    ),
+    "ezvenv --help": (
+        "import sys; sys.argv = ['ezvenv', '--help']; from ezvenv.cli import main; main()",
+        15000,
+        ["ezvenv.core", "yaml"],
+    ),
+}
+
+
+def measure(code):
+    """
+    Run code under -X importtime and return (microseconds spent in top-level ezvenv
+    imports, set of all imported module names).
+    """
+    env = dict(os.environ, PYTHONPATH=PACKAGE_ROOT)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, env=env)
+    total = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        modules.add(name.strip())
+        # Only count top-level entries (no indentation) belonging to ezvenv.
+        if name.startswith(" ezvenv"):
+            total += int(cumulative)
+    return total, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the EZVenv import-time budget")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per scenario (the best one is kept)")
+    args = parser.parse_args()
+
+    failed = False
+    for scenario, (code, budget, forbidden) in SCENARIOS.items():
+        runs = [measure(code) for _ in range(args.runs)]
+        best = min(total for total, modules in runs)
+        leaked = sorted(set(forbidden) & runs[0][1])
+        ok = best <= budget and not leaked
+        failed = failed or not ok
+        status = "✅" if ok else "❌"
+        print(f"{status} {scenario}: {best / 1000:.1f}ms (budget {budget / 1000:.1f}ms)")
+        if leaked:
+            print(f"    eagerly imported: {', '.join(leaked)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
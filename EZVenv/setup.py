@@ -8,6 +8,7 @@ setup(
     entry_points={
         "console_scripts": [
             "ezvenv=ezvenv.cli:main",
+            "ezvenvd=ezvenv.daemon:main",
         ],
     },
 )
@@ -0,0 +1,31 @@
+import os
+import sys
+import zipfile
+
+import pytest
+
+# Run against the source tree without installing it.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_wheel(directory, name, version, files):
+    """
+    Build a minimal wheel holding files (archive path -> bytes) plus its .dist-info.
+    """
+    dist_info = f"{name}-{version}.dist-info"
+    path = os.path.join(directory, f"{name}-{version}-py3-none-any.whl")
+    with zipfile.ZipFile(path, "w") as archive:
+        for member, data in files.items():
+            archive.writestr(member, data)
+        archive.writestr(f"{dist_info}/METADATA", f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n")
+        archive.writestr(f"{dist_info}/WHEEL", "Wheel-Version: 1.0\nRoot-Is-Purelib: true\nTag: py3-none-any\n")
+        archive.writestr(f"{dist_info}/RECORD", "")
+    return path
+
+
+@pytest.fixture
+def scheme(tmp_path):
+    from ezvenv import installer
+    site_packages = tmp_path / "env" / "lib" / "python3.11" / "site-packages"
+    site_packages.mkdir(parents=True)
+    return installer.env_scheme(str(tmp_path / "env"), str(site_packages))
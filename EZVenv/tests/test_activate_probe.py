@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from ezvenv import core
+from ezvenv.core import EZVenv
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    monkeypatch.delenv("PYTHONPATH", raising=False)
+    env_path = tmp_path / "venv"
+    (env_path / "lib" / "python3.11" / "site-packages").mkdir(parents=True)
+    (env_path / "pyvenv.cfg").write_text("include-system-site-packages = false\n")
+    ezvenv = EZVenv.__new__(EZVenv)
+    ezvenv.envPath = str(env_path)
+    return ezvenv
+
+
+def _site_packages(env):
+    return env._get_site_packages()
+
+
+def _changed(path):
+    # Directory mtimes may be coarse; make the change visible.
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+@pytest.mark.parametrize("entry, content", [
+    ("ezvenv/__init__.py", ""),
+    ("EZVenv-0.5.0.dist-info/METADATA", ""),
+    ("EZVenv.egg-link", "/src/EZVenv\n"),
+    ("__editable__.ezvenv-0.5.0.pth", "import __editable___ezvenv_finder; __editable___ezvenv_finder.install()\n"),
+])
+def test_site_packages_provide_recognizes_installs(tmp_path, entry, content):
+    path = tmp_path / entry
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+    assert core._site_packages_provide(str(tmp_path), "ezvenv")
+    assert not core._site_packages_provide(str(tmp_path), "other")
+
+
+def test_site_packages_provide_follows_pth_paths(tmp_path):
+    source = tmp_path / "src"
+    (source / "ezvenv").mkdir(parents=True)
+    (source / "ezvenv" / "__init__.py").write_text("")
+    site_packages = tmp_path / "site-packages"
+    site_packages.mkdir()
+    (site_packages / "local.pth").write_text(f"# comment\n{source}\n")
+
+    assert core._site_packages_provide(str(site_packages), "ezvenv")
+
+
+def test_probe_result_is_cached_until_site_packages_changes(env, monkeypatch):
+    assert not env._ezvenv_importable()
+    assert env._read_state()["ezvenvImportable"]["value"] is False
+
+    # The cached answer is used while site-packages is unchanged.
+    calls = []
+    real = core._site_packages_provide
+    monkeypatch.setattr(core, "_site_packages_provide", lambda *args: calls.append(args) or real(*args))
+    assert not env._ezvenv_importable()
+    assert calls == []
+
+    os.makedirs(os.path.join(_site_packages(env), "ezvenv-0.5.0.dist-info"))
+    _changed(_site_packages(env))
+    assert env._ezvenv_importable()
+    assert len(calls) == 1
+
+
+def test_system_site_packages_ask_the_interpreter(env, monkeypatch):
+    with open(os.path.join(env.envPath, "pyvenv.cfg"), "w") as file:
+        file.write("include-system-site-packages = true\n")
+    commands = []
+
+    class Result:
+        returncode = 0
+    monkeypatch.setattr(core.process, "run", lambda command, **kwargs: commands.append(command) or Result())
+
+    assert env._ezvenv_importable()
+    assert commands == [[env._get_executable_path("python"), "-c", "import ezvenv"]]
+
+
+def test_pythonpath_wins_without_looking_at_site_packages(env, tmp_path, monkeypatch):
+    (tmp_path / "src" / "ezvenv").mkdir(parents=True)
+    (tmp_path / "src" / "ezvenv" / "__init__.py").write_text("")
+    monkeypatch.setenv("PYTHONPATH", str(tmp_path / "src"))
+
+    assert env._ezvenv_importable()
+    assert "ezvenvImportable" not in env._read_state()
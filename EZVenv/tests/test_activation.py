@@ -0,0 +1,124 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from ezvenv import activation
+
+requires_bash = pytest.mark.skipif(shutil.which("bash") is None, reason="bash is not installed")
+
+
+def _bash(script, env):
+    """
+    Run script in a clean bash and return the variables it prints (NAME=value lines).
+    """
+    result = subprocess.run(["bash", "--norc", "--noprofile", "-c", script], env=env,
+                            capture_output=True, text=True, check=True)
+    return dict(line.split("=", 1) for line in result.stdout.splitlines() if "=" in line)
+
+
+def test_activation_diff():
+    assert activation.activation_diff("/e", "/e/bin") == {
+        "set": {"VIRTUAL_ENV": "/e"}, "prepend": {"PATH": "/e/bin"}, "unset": ["PYTHONHOME"]}
+    assert activation.activation_diff("/e", "/e/bin", "/p")["prepend"] == {"PATH": "/e/bin", "PYTHONPATH": "/p"}
+
+
+@requires_bash
+def test_rendered_diff_activates_in_the_shell():
+    env_path = "/tmp/it's a $HOME env"
+    diff = activation.activation_diff(env_path, env_path + "/bin", "/src")
+    script = activation.render(diff) + 'echo "VIRTUAL_ENV=$VIRTUAL_ENV"; echo "PATH=$PATH"\n' \
+                                       'echo "PYTHONPATH=$PYTHONPATH"; echo "HOME_SET=${PYTHONHOME+1}"\n'
+
+    out = _bash(script, {"PATH": "/usr/bin:/bin", "PYTHONHOME": "/x"})
+
+    assert out["VIRTUAL_ENV"] == env_path
+    assert out["PATH"] == env_path + "/bin:/usr/bin:/bin"
+    assert out["PYTHONPATH"] == "/src"  # no trailing ":" when it was unset
+    assert out["HOME_SET"] == ""
+
+
+def test_write_cache(tmp_path):
+    diff = activation.activation_diff("/e", "/e/bin")
+
+    script = activation.write_cache(str(tmp_path), "/home/me/project", diff)
+
+    path = activation.cache_path(str(tmp_path), "/home/me/project")
+    assert os.path.basename(path) == "%home%me%project.sh"
+    with open(path) as file:
+        assert file.read() == script == activation.render(diff)
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+
+
+@pytest.fixture
+def project(tmp_path):
+    root = tmp_path / "work" / "project"
+    (root / "src" / "pkg").mkdir(parents=True)
+    (root / "ezvenv.yaml").write_text("envName: venv\n")
+    return root
+
+
+def _hook_session(tmp_path, command, steps):
+    cache_dir = str(tmp_path / "cache")
+    script = activation.hook_script("bash", cache_dir, command)
+    for directory in steps:
+        script += f'cd {directory}; _ezvenv_hook; echo "{directory}=${{VIRTUAL_ENV-unset}}:$PATH:${{PYTHONPATH-unset}}"\n'
+    return cache_dir, _bash(script, {"PATH": "/usr/bin:/bin", "PYTHONPATH": "/mine", "HOME": str(tmp_path)})
+
+
+@requires_bash
+def test_hook_activates_inside_the_project_and_restores_outside(tmp_path, project):
+    diff = activation.activation_diff("/venv", "/venv/bin", str(project / "src"))
+    activation.write_cache(str(tmp_path / "cache"), str(project), diff)
+
+    _, out = _hook_session(tmp_path, "false", [project / "src" / "pkg", tmp_path])
+
+    assert out[str(project / "src" / "pkg")] == f"/venv:/venv/bin:/usr/bin:/bin:{project}/src:/mine"
+    assert out[str(tmp_path)] == "unset:/usr/bin:/bin:/mine"
+
+
+@requires_bash
+def test_hook_writes_a_missing_or_stale_cache_once(tmp_path, project):
+    calls = tmp_path / "calls"
+    command = tmp_path / "ezvenv"
+    code = ("import sys; sys.path.insert(0, %r); from ezvenv import activation; "
+            "open(%r, 'a').write(' '.join(sys.argv[1:]) + '\\n'); "
+            "activation.write_cache(%r, sys.argv[4], activation.activation_diff('/venv', '/venv/bin'))"
+            % (os.path.dirname(os.path.dirname(activation.__file__)), str(calls), str(tmp_path / "cache")))
+    command.write_text(f"#!/bin/sh\nexec {sys.executable} -c \"{code}\" \"$@\"\n")
+    command.chmod(0o755)
+
+    _, out = _hook_session(tmp_path, str(command), [project, project / "src", tmp_path, project])
+
+    assert out[str(project)].startswith("/venv:/venv/bin:")
+    assert out[str(project / "src")].startswith("/venv:")
+    assert calls.read_text().splitlines() == [f"hook bash --project {project}"]
+
+    os.utime(project / "ezvenv.yaml", (os.path.getmtime(calls) + 10,) * 2)
+    _hook_session(tmp_path, str(command), [project])
+    assert len(calls.read_text().splitlines()) == 2
+
+
+def test_hook_script_rejects_unknown_shells(tmp_path):
+    assert "add-zsh-hook precmd _ezvenv_hook" in activation.hook_script("zsh", str(tmp_path), "ezvenv")
+    with pytest.raises(ValueError):
+        activation.hook_script("fish", str(tmp_path), "ezvenv")
+
+
+def test_apply_activates_the_running_interpreter(tmp_path, monkeypatch):
+    site_packages = tmp_path / "env" / "lib" / "site-packages"
+    site_packages.mkdir(parents=True)
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    monkeypatch.setattr(sys, "prefix", sys.prefix)
+    monkeypatch.setattr(sys, "exec_prefix", sys.exec_prefix)
+    monkeypatch.setenv("PATH", "/env/bin:/usr/bin")
+    monkeypatch.setenv("PYTHONHOME", "/x")
+
+    activation.apply(activation.activation_diff(str(tmp_path / "env"), "/env/bin", "/src"), str(site_packages))
+
+    assert os.environ["PATH"] == "/env/bin:/usr/bin"
+    assert "PYTHONHOME" not in os.environ
+    assert sys.path[:2] == [str(site_packages), "/src"]
+    assert sys.prefix == sys.exec_prefix == str(tmp_path / "env")
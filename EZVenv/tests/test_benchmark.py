@@ -0,0 +1,63 @@
+import importlib.util
+import os
+import sys
+import zipfile
+
+import pytest
+
+from ezvenv import installer
+
+_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "benchmark.py")
+_spec = importlib.util.spec_from_file_location("benchmark", _SCRIPT)
+benchmark = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(benchmark)
+
+
+def test_build_index_serves_stand_ins_and_seed_wheels(tmp_path):
+    root = str(tmp_path / "index")
+
+    benchmark.build_index(root)
+
+    projects = sorted(os.listdir(os.path.join(root, "simple")))
+    assert {"ezbench-a", "ezbench-b", "pip", "setuptools", "pyyaml"} <= set(projects)
+    with open(os.path.join(root, "simple", "ezbench-a", "index.html")) as file:
+        page = file.read()
+    assert "../../files/ezbench_a-1.0-py3-none-any.whl" in page
+    assert "../../files/ezbench_a-1.1-py3-none-any.whl" in page
+
+
+def test_seed_wheels_fails_without_a_source(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark, "SEED_PACKAGES", ["ezvenv-no-such-package"])
+
+    with pytest.raises(RuntimeError, match="No wheel for ezvenv-no-such-package"):
+        benchmark.seed_wheels(str(tmp_path))
+
+
+def test_repacked_wheel_is_installable(tmp_path, scheme):
+    wheel = benchmark.repack_installed(str(tmp_path), "pytest")
+
+    with zipfile.ZipFile(wheel) as archive:
+        assert archive.testzip() is None
+    installer.install_wheels([wheel], scheme)
+    assert installer.find_dist_info(scheme["purelib"], "pytest")
+    assert os.path.exists(os.path.join(scheme["purelib"], "pytest", "__init__.py"))
+
+
+def test_generated_wheel_declares_its_dependencies(tmp_path, scheme):
+    wheel = benchmark.build_wheel(str(tmp_path), "ezbench-b", "1.0", ["ezbench-a"])
+
+    dist_info = installer.install_wheel(wheel, scheme)
+
+    with open(os.path.join(dist_info, "METADATA")) as file:
+        assert "Requires-Dist: ezbench-a" in file.read()
+
+
+@pytest.mark.parametrize("code", ["import sys; sys.exit(3)", "print('❌ Failed to sync dependencies.')"])
+def test_failed_scenarios_abort_the_run(code):
+    workspace = benchmark.Workspace("http://127.0.0.1:1/simple/")
+    try:
+        with pytest.raises(RuntimeError, match="failed"):
+            workspace.run([sys.executable, "-c", code])
+        assert workspace.run([sys.executable, "-c", "print('✅ ok')"]) > 0
+    finally:
+        workspace.cleanup()
@@ -0,0 +1,132 @@
+import os
+
+import pytest
+
+from ezvenv import cleanup, registry
+
+NOW = 1_000_000_000.0
+DAY = 86400
+
+
+@pytest.fixture
+def make_env(tmp_path):
+    def make(name, project="project", last_seen=NOW, size=100):
+        project_dir = tmp_path / project
+        project_dir.mkdir(exist_ok=True)
+        path = project_dir / name
+        path.mkdir()
+        (path / "pyvenv.cfg").write_text("")
+        return {"path": str(path), "project_dir": str(project_dir), "last_seen": last_seen, "size": size}
+    return make
+
+
+def _reasons(selected):
+    return {os.path.basename(env["path"]): reason for env, reason in selected}
+
+
+def test_select_missing_orphaned_and_unused(tmp_path, make_env):
+    fresh = make_env("fresh")
+    old = make_env("old", last_seen=NOW - 40 * DAY)
+    orphan = make_env("orphan", project="gone")
+    os.rename(orphan["project_dir"], tmp_path / "elsewhere")
+    orphan["path"] = str(tmp_path / "elsewhere" / "orphan")
+    missing = dict(fresh, path=str(tmp_path / "missing"))
+
+    selected = cleanup.select([fresh, old, orphan, missing], 30 * DAY, None, now=NOW)
+
+    assert _reasons(selected) == {"old": "unused", "orphan": "orphaned", "missing": "missing"}
+
+
+def test_select_size_cap_deletes_least_recently_used_and_spares_protected(make_env):
+    envs = [make_env("a", last_seen=NOW - 3), make_env("b", last_seen=NOW - 2), make_env("c", last_seen=NOW - 1)]
+
+    assert _reasons(cleanup.select(envs, None, 250, now=NOW)) == {"a": "over size cap"}
+    assert _reasons(cleanup.select(envs, None, 150, protected={envs[0]["path"]}, now=NOW)) == {
+        "b": "over size cap", "c": "over size cap"}
+    assert cleanup.select(envs, 0, None, protected={env["path"] for env in envs}, now=NOW) == []
+
+
+def test_select_duplicates_keeps_the_configured_environment(make_env):
+    envs = [make_env("a", last_seen=NOW - 1), make_env("b", last_seen=NOW - 2), make_env("c", last_seen=NOW - 3)]
+
+    assert _reasons(cleanup.select(envs, None, None, now=NOW, duplicates=True)) == {
+        "b": "duplicate", "c": "duplicate"}
+    configured = {envs[0]["project_dir"]: envs[2]["path"]}
+    assert _reasons(cleanup.select(envs, None, None, now=NOW, duplicates=True, configured=configured)) == {
+        "a": "duplicate", "b": "duplicate"}
+    assert _reasons(cleanup.select(envs, None, None, protected={envs[1]["path"]}, now=NOW, duplicates=True)) == {
+        "a": "duplicate", "c": "duplicate"}
+
+
+def test_last_use_takes_the_newest_evidence(make_env, tmp_path):
+    env = make_env("a")
+    env.update(last_used=None, last_sync=5.0, created=1.0)
+    cfg = os.path.join(env["path"], "pyvenv.cfg")
+    os.utime(cfg, (10.0, 10.0))
+    hook_cache = tmp_path / "cache.sh"
+    hook_cache.write_text("")
+    os.utime(hook_cache, (20.0, 20.0))
+
+    assert cleanup.last_use(env) == 10.0
+    assert cleanup.last_use(env, [str(hook_cache), str(tmp_path / "missing")]) == 20.0
+
+
+def test_dir_sizes_matches_a_serial_walk(tmp_path):
+    for name in ("one", "two"):
+        for sub in ("a", "b/c"):
+            directory = tmp_path / name / sub
+            directory.mkdir(parents=True)
+            (directory / "f").write_bytes(b"x" * 5000)
+        (tmp_path / name / "top").write_bytes(b"y" * 100)
+    paths = [str(tmp_path / "one"), str(tmp_path / "two"), str(tmp_path / "missing")]
+
+    sizes = cleanup.dir_sizes(paths, jobs=4)
+
+    assert sizes == {path: registry.dir_size(path) for path in paths}
+    assert sizes[paths[0]] > 10000 and sizes[paths[2]] == 0
+
+
+def test_remove_environment_only_deletes_virtual_environments(make_env, tmp_path):
+    env = make_env("a")
+    other = tmp_path / "data"
+    other.mkdir()
+
+    assert not cleanup.remove_environment(str(other))
+    assert cleanup.remove_environment(env["path"])
+    assert other.is_dir() and not os.path.exists(env["path"])
+
+
+def test_trim_file_keeps_whole_newest_lines(tmp_path):
+    log = tmp_path / "ezvenv.log"
+    log.write_bytes(b"first line\nsecond line\nthird\n")
+
+    assert cleanup.trim_file(str(log), 100) == 0
+    assert cleanup.trim_file(str(log), 15) == len(b"first line\nsecond line\n")
+    assert log.read_bytes() == b"third\n"
+    assert cleanup.trim_file(str(tmp_path / "missing"), 1) == 0
+
+
+def test_prune_store_keeps_linked_and_recent_objects(tmp_path):
+    objects = tmp_path / "objects" / "ab"
+    objects.mkdir(parents=True)
+    for name in ("linked", "unlinked"):
+        (objects / name).write_bytes(b"x" * 10)
+    os.link(objects / "linked", tmp_path / "installed")
+
+    assert cleanup.prune_store(str(tmp_path)) == 0
+    assert cleanup.prune_store(str(tmp_path), min_age=-1) == 10
+    assert sorted(os.listdir(objects)) == ["linked"]
+
+
+def test_prune_older_than(tmp_path):
+    (tmp_path / "old-dir").mkdir()
+    (tmp_path / "old-dir" / "f").write_bytes(b"x" * 10)
+    (tmp_path / "old-file").write_bytes(b"x" * 10)
+    (tmp_path / "new").write_bytes(b"x")
+    for name in ("old-dir", "old-file"):
+        os.utime(tmp_path / name, (NOW - 2 * DAY, NOW - 2 * DAY))
+    os.utime(tmp_path / "new", (NOW, NOW))
+
+    assert cleanup.prune_older_than(str(tmp_path), DAY, now=NOW) >= 20
+    assert os.listdir(tmp_path) == ["new"]
+    assert cleanup.prune_older_than(str(tmp_path / "missing"), DAY) == 0
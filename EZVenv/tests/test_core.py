@@ -0,0 +1,34 @@
+import os
+import stat
+
+from ezvenv import core
+
+
+def _tool(directory, name):
+    path = directory / name
+    path.write_text("#!/bin/sh\n")
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+def test_which_notices_a_tool_installed_later(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    monkeypatch.setattr(core, "_WHICH_MEMO", {})
+    assert core._which("ezvenv-test-tool") is None
+
+    path = _tool(tmp_path, "ezvenv-test-tool")
+    assert core._which("ezvenv-test-tool") is None  # still memoized
+
+    monkeypatch.setattr(core, "_WHICH_MEMO_TTL", 0)
+    assert core._which("ezvenv-test-tool") == path
+
+
+def test_which_forgets_a_removed_tool(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    monkeypatch.setattr(core, "_WHICH_MEMO", {})
+    path = _tool(tmp_path, "ezvenv-test-tool")
+    assert core._which("ezvenv-test-tool") == path
+
+    os.remove(path)
+
+    assert core._which("ezvenv-test-tool") is None
@@ -0,0 +1,79 @@
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+
+from ezvenv import daemon
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(daemon.__file__))
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """
+    A running ezvenvd serving a copy of the ezvenv sources (so a test can change
+    them) with its own HOME; the client side is pointed at its socket.
+    """
+    source = tmp_path / "src"
+    shutil.copytree(PACKAGE_DIR, source / "ezvenv", ignore=shutil.ignore_patterns("__pycache__"))
+    home = tmp_path / "home"
+    home.mkdir()
+    path = str(tmp_path / "ezvenvd.sock")
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("EZVENVD_SOCKET", path)
+    monkeypatch.setenv("PYTHONPATH", str(source))
+    monkeypatch.delenv("EZVENV_NO_DAEMON", raising=False)
+    monkeypatch.chdir(tmp_path)
+    proc = subprocess.Popen([sys.executable, "-m", "ezvenv.daemon", "--idle-timeout", "60"],
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    deadline = time.monotonic() + 30
+    while not os.path.exists(path):
+        assert proc.poll() is None, proc.stdout.read()
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    proc.source = source
+    yield proc
+    if proc.poll() is None:
+        proc.kill()
+    proc.wait()
+    proc.stdout.close()
+
+
+def test_client_runs_in_process_without_a_daemon(tmp_path, monkeypatch):
+    monkeypatch.setenv("EZVENVD_SOCKET", str(tmp_path / "missing.sock"))
+    assert daemon.client_run(["list"]) is None
+
+
+def test_commands_run_in_the_daemon_with_the_clients_fds(server, capfd):
+    assert daemon._request("ping") == str(server.pid)
+
+    assert daemon.client_run(["list"]) == 0
+    assert "LAST USED" in capfd.readouterr().out
+
+    assert daemon.client_run(["show", "missing"]) == 1
+    assert "No registered environment" in capfd.readouterr().err
+
+    assert daemon.client_run(["list", "--jobs", "x"]) == 2
+
+
+def test_client_is_bypassed_when_disabled(server, monkeypatch):
+    monkeypatch.setenv("EZVENV_NO_DAEMON", "1")
+    assert daemon.client_run(["list"]) is None
+
+
+def test_daemon_exits_when_its_sources_change(server):
+    newest = max(path.stat().st_mtime for path in (server.source / "ezvenv").glob("*.py"))
+    os.utime(server.source / "ezvenv" / "cli.py", (newest + 1, newest + 1))
+
+    assert daemon.client_run(["list"]) is None
+    assert server.wait(timeout=10) == 0
+    assert not os.path.exists(daemon.socket_path())
+
+
+def test_stop(server):
+    assert daemon._request("stop") == "0"
+    assert server.wait(timeout=10) == 0
+    assert daemon.client_run(["list"]) is None
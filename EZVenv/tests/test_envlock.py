@@ -0,0 +1,72 @@
+import threading
+import time
+
+from ezvenv.envlock import BuildLock
+
+
+def _build_while_waiting(tmp_path, env_path, fingerprint, status="done", builder_fingerprint="abc"):
+    """
+    Hold the lock in a thread (flock() locks are per open file, so a second
+    BuildLock in the same process waits for it), then acquire it ourselves.
+    """
+    lock_dir = str(tmp_path / "locks")
+    holder = BuildLock(lock_dir, env_path, builder_fingerprint).acquire()
+    waits = []
+    waiter = BuildLock(lock_dir, env_path, fingerprint, on_wait=waits.append)
+
+    def finish():
+        time.sleep(0.2)
+        holder.release(status)
+    thread = threading.Thread(target=finish)
+    thread.start()
+    waiter.acquire()
+    thread.join()
+    return waiter, waits
+
+
+def test_waiter_reuses_a_finished_build_of_the_same_fingerprint(tmp_path):
+    env_path = tmp_path / "venv"
+    env_path.mkdir()
+
+    waiter, waits = _build_while_waiting(tmp_path, str(env_path), "abc")
+    try:
+        assert waiter.reusable()
+        assert waits and waits[0]["status"] == "building"
+    finally:
+        waiter.release()
+
+
+def test_waiter_rebuilds_after_a_failed_build(tmp_path):
+    env_path = tmp_path / "venv"
+    env_path.mkdir()
+
+    waiter, _ = _build_while_waiting(tmp_path, str(env_path), "abc", status="failed")
+    try:
+        assert not waiter.reusable()
+    finally:
+        waiter.release()
+
+
+def test_waiter_rebuilds_for_another_fingerprint(tmp_path):
+    env_path = tmp_path / "venv"
+    env_path.mkdir()
+
+    waiter, _ = _build_while_waiting(tmp_path, str(env_path), "def")
+    try:
+        assert not waiter.reusable()
+    finally:
+        waiter.release()
+
+
+def test_uncontended_lock_is_never_reusable(tmp_path):
+    env_path = tmp_path / "venv"
+    env_path.mkdir()
+    lock_dir = str(tmp_path / "locks")
+    with BuildLock(lock_dir, str(env_path), "abc"):
+        pass
+
+    # The previous build finished before we asked for the lock: nothing was waited for.
+    with BuildLock(lock_dir, str(env_path), "abc") as lock:
+        assert not lock.reusable()
+        assert lock.read_state()["status"] == "building"
+    assert lock.read_state()["status"] == "done"
@@ -0,0 +1,188 @@
+import http.server
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from ezvenv import indexcache
+
+
+class Upstream:
+    """
+    A local stand-in index: serves pages (path -> body) with an ETag, answers
+    matching If-None-Match with 304 and records every request.
+    """
+
+    def __init__(self):
+        self.pages = {}
+        self.requests = []
+        upstream = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                upstream.requests.append((self.path, self.headers.get("If-None-Match")))
+                body = upstream.pages.get(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                etag = f'"{hash(body)}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/simple/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def upstream():
+    server = Upstream()
+    server.pages["/simple/demo/"] = b'<a href="../../files/demo-1.0-py3-none-any.whl#sha256=ab">demo</a>'
+    yield server
+    server.stop()
+
+
+def test_fresh_entries_are_served_without_contacting_the_index(tmp_path, upstream):
+    cache = indexcache.IndexCache(str(tmp_path), max_age=600)
+    url = upstream.url + "demo/"
+
+    first = cache.fetch(url)
+    second = cache.fetch(url)
+
+    assert first == second == (200, "text/html", upstream.pages["/simple/demo/"])
+    assert len(upstream.requests) == 1
+    assert (cache.misses, cache.hits) == (1, 1)
+
+
+def test_stale_entry_is_revalidated_with_its_etag(tmp_path, upstream):
+    cache = indexcache.IndexCache(str(tmp_path), max_age=0)
+    url = upstream.url + "demo/"
+    cache.fetch(url)
+
+    assert cache.fetch(url) == (200, "text/html", upstream.pages["/simple/demo/"])
+
+    assert upstream.requests[1][1] is not None  # If-None-Match was sent
+    assert cache.revalidated == 1 and cache.misses == 1
+
+
+def test_changed_page_replaces_the_cached_body(tmp_path, upstream):
+    cache = indexcache.IndexCache(str(tmp_path), max_age=0)
+    url = upstream.url + "demo/"
+    cache.fetch(url)
+    upstream.pages["/simple/demo/"] = b'<a href="demo-2.0.tar.gz">demo</a>'
+
+    assert cache.fetch(url)[2] == b'<a href="demo-2.0.tar.gz">demo</a>'
+    assert cache.misses == 2
+
+
+def test_stale_entry_is_served_when_the_index_is_down(tmp_path, upstream):
+    cache = indexcache.IndexCache(str(tmp_path), max_age=0, timeout=2)
+    url = upstream.url + "demo/"
+    cache.fetch(url)
+    upstream.stop()
+
+    assert cache.fetch(url)[2] == upstream.pages["/simple/demo/"]
+    with pytest.raises(urllib.error.URLError):
+        cache.fetch(upstream.url + "other/")
+
+
+def test_missing_project_and_immutable_entries(tmp_path, upstream):
+    cache = indexcache.IndexCache(str(tmp_path), max_age=0)
+    assert cache.fetch(upstream.url + "missing/")[0] == 404
+
+    upstream.pages["/files/demo.whl.metadata"] = b"Name: demo\n"
+    url = upstream.url.replace("/simple/", "/files/demo.whl.metadata")
+    cache.fetch(url, accept="*/*", immutable=True)
+    cache.fetch(url, accept="*/*", immutable=True)
+    assert [path for path, etag in upstream.requests].count("/files/demo.whl.metadata") == 1
+
+
+def test_compact_evicts_least_recently_used_entries(tmp_path, upstream):
+    cache = indexcache.IndexCache(str(tmp_path), max_age=600)
+    upstream.pages["/simple/other/"] = b"x" * 100
+    cache.fetch(upstream.url + "demo/")
+    cache.fetch(upstream.url + "other/")
+    old = [entry.path for entry in os.scandir(tmp_path)]
+    for path in old:
+        os.utime(path, (1, 1))
+    cache.fetch(upstream.url + "demo/")  # refreshes demo's entry
+    (tmp_path / "leftover.json.1.2.tmp").write_text("{}")
+
+    cache.compact(max_size=sum(os.path.getsize(path) for path in old) - 1)
+
+    assert len(os.listdir(tmp_path)) == 2
+    assert cache.fetch(upstream.url + "demo/")[2] == upstream.pages["/simple/demo/"]
+    assert cache.hits == 2
+
+
+@pytest.fixture
+def proxy(tmp_path, upstream):
+    proxy = indexcache.IndexProxy(indexcache.IndexCache(str(tmp_path / "cache")), upstream.url).start()
+    yield proxy
+    proxy.stop()
+
+
+def test_proxy_rewrites_file_links_through_itself(proxy, upstream):
+    with urllib.request.urlopen(proxy.url + "demo/") as response:
+        page = response.read().decode()
+
+    artifact = upstream.url.replace("/simple/", "/files/demo-1.0-py3-none-any.whl")
+    href = page.split('href="')[1].split('"')[0]
+    absolute = urllib.request.urljoin(proxy.url + "demo/", href)
+    assert absolute.startswith(proxy.files_url)
+    assert indexcache.original_url(absolute, proxy.files_url) == artifact + "#sha256=ab"
+
+
+def test_proxy_redirects_artifacts_to_the_upstream(proxy, upstream):
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args):
+            return None
+    target = upstream.url.replace("/simple/", "/files/demo-1.0-py3-none-any.whl")
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.build_opener(NoRedirect).open(proxy.files_url + urllib.request.quote(target, safe=""))
+
+    assert error.value.code == 307
+    assert error.value.headers["Location"] == target
+
+
+def test_rewrite_handles_relative_absolute_and_escaped_links(proxy):
+    page = (b'<a href="../../packages/a.whl#sha256=1">a</a>'
+            b'<a href="https://files.example/b.tar.gz?x=1&amp;y=2">b</a>')
+
+    body = proxy._rewrite("https://pypi.example/simple/demo/", page).decode()
+
+    links = [proxy.files_url + href.split('"')[0][len("/files/"):] for href in body.split('href="')[1:]]
+    assert [indexcache.original_url(link, proxy.files_url) for link in links] == [
+        "https://pypi.example/packages/a.whl#sha256=1",
+        "https://files.example/b.tar.gz?x=1&y=2",
+    ]
+
+
+def test_original_url_only_unwraps_the_running_proxy():
+    files_url = "http://127.0.0.1:4000/files/"
+    proxied = files_url + "https%3A%2F%2Ffiles.example%2Fa.whl#sha256=1"
+    local_index = "http://127.0.0.1:5000/files/a-1.0-py3-none-any.whl"
+
+    assert indexcache.original_url(proxied, files_url) == "https://files.example/a.whl#sha256=1"
+    assert indexcache.original_url(local_index, files_url) == local_index
+    assert indexcache.original_url(proxied) == proxied
@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from conftest import make_wheel
+from ezvenv import installer
+
+
+def test_install_wheels_refuses_two_wheels_writing_the_same_file(tmp_path, scheme):
+    first = make_wheel(tmp_path, "first", "1.0", {"shared/__init__.py": b"a = 1\n"})
+    second = make_wheel(tmp_path, "second", "1.0", {"shared/__init__.py": b"b = 2\n"})
+
+    with pytest.raises(installer.InstallError, match="provided by both"):
+        installer.install_wheels([first, second], scheme)
+    # Conflicts are found while planning, before anything is written.
+    assert os.listdir(scheme["purelib"]) == []
+
+
+def test_install_wheels_refuses_to_overwrite_unowned_files(tmp_path, scheme):
+    wheel = make_wheel(tmp_path, "demo", "1.0", {"demo.py": b"x = 1\n"})
+    with open(os.path.join(scheme["purelib"], "demo.py"), "w") as file:
+        file.write("# hand-written\n")
+
+    with pytest.raises(installer.InstallError, match="already exists"):
+        installer.install_wheels([wheel], scheme)
+    with open(os.path.join(scheme["purelib"], "demo.py")) as file:
+        assert file.read() == "# hand-written\n"
+
+
+def test_install_wheels_replaces_the_installed_version(tmp_path, scheme):
+    old = make_wheel(tmp_path, "demo", "1.0", {"demo/__init__.py": b"v = 1\n", "demo/old.py": b""})
+    new = make_wheel(tmp_path, "demo", "2.0", {"demo/__init__.py": b"v = 2\n"})
+    installer.install_wheels([old], scheme)
+
+    installer.install_wheels([new], scheme)
+
+    site_packages = scheme["purelib"]
+    assert installer.find_dist_info(site_packages, "demo").endswith("demo-2.0.dist-info")
+    assert not os.path.exists(os.path.join(site_packages, "demo-1.0.dist-info"))
+    assert not os.path.exists(os.path.join(site_packages, "demo", "old.py"))
+    with open(os.path.join(site_packages, "demo", "__init__.py")) as file:
+        assert file.read() == "v = 2\n"
+
+
+def test_install_wheel_writes_dist_info_last(tmp_path, scheme):
+    wheel = make_wheel(tmp_path, "demo", "1.0", {"demo.py": b"x = 1\n"})
+
+    dist_info_path = installer.install_wheel(wheel, scheme)
+
+    site_packages = scheme["purelib"]
+    assert sorted(os.listdir(site_packages)) == ["demo-1.0.dist-info", "demo.py"]
+    assert sorted(os.listdir(dist_info_path)) == ["INSTALLER", "METADATA", "RECORD", "WHEEL"]
+    recorded = installer.recorded_files(site_packages, "demo")
+    assert os.path.join(site_packages, "demo.py") in recorded
+
+
+def test_failed_install_leaves_no_dist_info_or_files(tmp_path, scheme, monkeypatch):
+    wheel = make_wheel(tmp_path, "demo", "1.0", {"demo.py": b"x = 1\n"})
+
+    def fail(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(installer, "_write_record", fail)
+
+    with pytest.raises(OSError):
+        installer.install_wheel(wheel, scheme)
+    # Neither the .dist-info directory, its staging directory nor the files written so far remain.
+    assert os.listdir(scheme["purelib"]) == []
+    assert installer.find_dist_info(scheme["purelib"], "demo") is None
+
+
+def test_failed_upgrade_restores_the_previous_version(tmp_path, scheme, monkeypatch):
+    old = make_wheel(tmp_path, "demo", "1.0", {"demo/__init__.py": b"v = 1\n", "demo/old.py": b""})
+    new = make_wheel(tmp_path, "demo", "2.0", {"demo/__init__.py": b"v = 2\n"})
+    installer.install_wheels([old], scheme)
+    site_packages = scheme["purelib"]
+    before = sorted(os.listdir(site_packages))
+
+    def fail(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(installer, "_write_record", fail)
+
+    with pytest.raises(installer.InstallError, match="disk full"):
+        installer.install_wheels([new], scheme)
+
+    assert sorted(os.listdir(site_packages)) == before
+    assert installer.find_dist_info(site_packages, "demo").endswith("demo-1.0.dist-info")
+    assert os.path.exists(os.path.join(site_packages, "demo", "old.py"))
+    with open(os.path.join(site_packages, "demo", "__init__.py")) as file:
+        assert file.read() == "v = 1\n"
+
+
+def test_only_the_failed_wheel_is_rolled_back(tmp_path, scheme, monkeypatch):
+    installer.install_wheels([make_wheel(tmp_path, "good", "1.0", {"good.py": b"v = 1\n"}),
+                              make_wheel(tmp_path, "bad", "1.0", {"bad.py": b"v = 1\n"})], scheme)
+    upgrades = tmp_path / "upgrades"
+    upgrades.mkdir()
+    good = make_wheel(upgrades, "good", "2.0", {"good.py": b"v = 2\n"})
+    bad = make_wheel(upgrades, "bad", "2.0", {"bad.py": b"v = 2\n"})
+    real_install = installer.install_wheel
+
+    def install_wheel(wheel, *args):
+        if wheel == bad:
+            raise installer.InstallError("corrupt wheel")
+        return real_install(wheel, *args)
+    monkeypatch.setattr(installer, "install_wheel", install_wheel)
+
+    with pytest.raises(installer.InstallError, match="corrupt wheel"):
+        installer.install_wheels([good, bad], scheme)
+
+    site_packages = scheme["purelib"]
+    assert installer.find_dist_info(site_packages, "good").endswith("good-2.0.dist-info")
+    assert installer.find_dist_info(site_packages, "bad").endswith("bad-1.0.dist-info")
+    assert not [entry for entry in os.listdir(site_packages) if entry.endswith(".stash")]
+
+
+def test_uninstall_removes_files_and_empty_directories(tmp_path, scheme):
+    wheel = make_wheel(tmp_path, "demo", "1.0", {"demo/__init__.py": b"", "demo/sub/mod.py": b""})
+    installer.install_wheels([wheel], scheme)
+
+    assert installer.uninstall(scheme["purelib"], "demo")
+
+    assert os.listdir(scheme["purelib"]) == []
+    assert not installer.uninstall(scheme["purelib"], "demo")
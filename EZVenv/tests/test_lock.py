@@ -0,0 +1,51 @@
+from ezvenv import lock
+
+
+def _lock(requirements, packages):
+    return {
+        "requirements": requirements,
+        "packages": {name: {"version": version, "dependencies": dependencies}
+                     for name, (version, dependencies) in packages.items()},
+    }
+
+
+LOCK = _lock(
+    {"requests": "requests>=2", "flask": "flask==2.0"},
+    {
+        "requests": ("2.31.0", ["urllib3", "idna"]),
+        "urllib3": ("2.0.7", []),
+        "idna": ("3.4", []),
+        "flask": ("2.0.0", ["werkzeug", "idna"]),
+        "werkzeug": ("2.0.3", []),
+    },
+)
+
+
+def test_unchanged_requirements_keep_their_whole_subtree_pinned():
+    requirements = [("requests", ">=2", "requests>=2"), ("flask", "==2.0", "flask==2.0")]
+
+    constraints, changed = lock.incremental_constraints(LOCK, requirements)
+
+    assert changed == []
+    assert constraints == {"requests": "2.31.0", "urllib3": "2.0.7", "idna": "3.4",
+                           "flask": "2.0.0", "werkzeug": "2.0.3"}
+
+
+def test_changed_requirement_frees_only_its_own_subtree():
+    requirements = [("requests", ">=2", "requests>=2"), ("flask", "==3.0", "flask==3.0")]
+
+    constraints, changed = lock.incremental_constraints(LOCK, requirements)
+
+    assert changed == ["flask"]
+    # idna stays pinned: the unchanged requests requirement still needs it.
+    assert constraints == {"requests": "2.31.0", "urllib3": "2.0.7", "idna": "3.4"}
+
+
+def test_added_and_removed_requirements():
+    requirements = [("requests", ">=2", "requests>=2"), ("rich", "", "rich")]
+
+    constraints, changed = lock.incremental_constraints(LOCK, requirements)
+
+    assert changed == ["rich"]
+    assert "flask" not in constraints and "werkzeug" not in constraints
+    assert constraints["requests"] == "2.31.0"
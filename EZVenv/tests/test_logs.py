@@ -0,0 +1,100 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+
+from ezvenv import logs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(logs.__file__)))
+
+
+def _record(message, **extra):
+    record = logging.LogRecord("ezvenv", logging.INFO, __file__, 1, message, None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_rotation_keeps_backup_count_files(tmp_path):
+    path = str(tmp_path / "ezvenv.log")
+    handler = logs.SharedRotatingFileHandler(path, max_bytes=100, backup_count=2)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    try:
+        for index in range(20):
+            handler.emit(_record(f"line {index:02d} " + "x" * 20))
+    finally:
+        handler.close()
+
+    assert sorted(os.listdir(tmp_path)) == ["ezvenv.log", "ezvenv.log.1", "ezvenv.log.2", "ezvenv.log.lock"]
+    assert all(os.path.getsize(f"{path}{suffix}") <= 100 for suffix in ("", ".1", ".2"))
+    assert open(path).read().splitlines()[-1].startswith("line 19")
+
+
+def test_handler_follows_a_rotation_by_another_process(tmp_path):
+    path = str(tmp_path / "ezvenv.log")
+    first = logs.SharedRotatingFileHandler(path, max_bytes=60, backup_count=1)
+    second = logs.SharedRotatingFileHandler(path, max_bytes=60, backup_count=1)
+    for handler in (first, second):
+        handler.setFormatter(logging.Formatter("%(message)s"))
+    try:
+        second.emit(_record("second opens the file"))
+        first.emit(_record("first fills it " + "x" * 30))  # rotates
+        second.emit(_record("second again"))
+    finally:
+        first.close()
+        second.close()
+
+    assert open(path + ".1").read() == "second opens the file\n"
+    assert open(path).read().splitlines() == ["first fills it " + "x" * 30, "second again"]
+
+
+def test_json_formatter_fields():
+    entry = json.loads(logs.JsonFormatter().format(_record("Phase sync", env="/envs/a", phase="sync",
+                                                           duration=0.5, status="ok")))
+
+    assert {key: entry[key] for key in ("level", "env", "message", "phase", "duration", "status")} == {
+        "level": "INFO", "env": "/envs/a", "message": "Phase sync", "phase": "sync", "duration": 0.5,
+        "status": "ok"}
+    assert "phase" not in json.loads(logs.JsonFormatter().format(_record("plain")))
+
+
+_SCRIPT = """
+import logging, os, sys
+from ezvenv import logs
+path = sys.argv[1]
+assert logs.configure(path, fmt="json")
+logs.bind("/envs/parent")
+logging.info("from the parent")
+pid = os.fork()
+if pid == 0:
+    logs.bind("/envs/child")
+    logging.info("from the child")
+    logs.flush()
+    os._exit(0)
+os.waitpid(pid, 0)
+logs.configure(path, fmt="text")
+logging.info("as text")
+"""
+
+
+def test_configure_writes_through_the_queue_across_fork(tmp_path):
+    path = tmp_path / "config" / "ezvenv.log"
+
+    subprocess.run([sys.executable, "-c", _SCRIPT, str(path)], cwd=ROOT, check=True)
+
+    lines = path.read_text().splitlines()
+    parent, child = (json.loads(line) for line in lines[:2])
+    assert (parent["env"], parent["message"]) == ("/envs/parent", "from the parent")
+    assert (child["env"], child["message"]) == ("/envs/child", "from the child")
+    assert child["pid"] != parent["pid"]
+    assert lines[2].endswith(" - INFO - as text")
+
+
+def test_configure_leaves_a_configured_root_logger_alone(tmp_path):
+    script = ("import logging, sys; from ezvenv import logs; logging.basicConfig(); "
+              "sys.exit(logs.configure(sys.argv[1]))")
+
+    result = subprocess.run([sys.executable, "-c", script, str(tmp_path / "ezvenv.log")], cwd=ROOT)
+
+    assert result.returncode == 0
+    assert not os.path.exists(tmp_path / "ezvenv.log")
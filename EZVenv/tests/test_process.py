@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+
+from ezvenv import process
+
+
+def _child_value(name):
+    return process.run([sys.executable, "-c", f"import os; print(os.environ.get({name!r}, ''))"],
+                       stdout=subprocess.PIPE, text=True).stdout.strip()
+
+
+def test_set_env_reaches_subprocesses_but_not_our_environment(monkeypatch):
+    monkeypatch.delenv("EZVENV_TEST_INDEX", raising=False)
+    process.set_env("EZVENV_TEST_INDEX", "http://127.0.0.1:1/simple/")
+    try:
+        assert _child_value("EZVENV_TEST_INDEX") == "http://127.0.0.1:1/simple/"
+        assert "EZVENV_TEST_INDEX" not in os.environ
+    finally:
+        process.set_env("EZVENV_TEST_INDEX", None)
+    assert _child_value("EZVENV_TEST_INDEX") == ""
+
+
+def test_overrides_apply_on_top_of_an_explicit_env():
+    process.set_env("EZVENV_TEST_INDEX", "proxy")
+    try:
+        env = process.child_env({"OTHER": "1"})
+    finally:
+        process.set_env("EZVENV_TEST_INDEX", None)
+    assert env == {"OTHER": "1", "EZVENV_TEST_INDEX": "proxy"}
+    assert process.child_env({"OTHER": "1"}) == {"OTHER": "1"}
@@ -0,0 +1,109 @@
+import os
+
+import pytest
+
+from ezvenv import core, registry
+from ezvenv.core import EZVenv
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / "config" / "registry.db")
+
+
+def test_record_inserts_then_updates_only_the_given_fields(db):
+    registry.record(db, "/envs/a", "/p/a", interpreter="/usr/bin/python3", size=10)
+    created = registry.find(db, "/envs/a")[0]["created"]
+
+    registry.record(db, "/envs/a", "/p/a", size=20, last_sync=5.0)
+
+    [row] = registry.find(db, "/envs/a")
+    assert row["interpreter"] == "/usr/bin/python3"
+    assert (row["size"], row["last_sync"], row["created"]) == (20, 5.0, created)
+
+
+def test_record_rejects_unknown_fields(db):
+    with pytest.raises(ValueError):
+        registry.record(db, "/envs/a", "/p/a", colour="red")
+
+
+def test_list_find_touch_and_remove(db):
+    assert registry.list_environments(db) == []
+    assert registry.find(db, "/p/a") == []
+    registry.record(db, "/envs/a1", "/p/a", last_used=1.0)
+    registry.record(db, "/envs/a2", "/p/a")
+    registry.record(db, "/envs/b", "/p/b", last_used=2.0)
+
+    assert [env["path"] for env in registry.list_environments(db)] == ["/envs/b", "/envs/a1", "/envs/a2"]
+    assert [env["path"] for env in registry.find(db, "/p/a")] == ["/envs/a1", "/envs/a2"]
+    assert [env["path"] for env in registry.find(db, "/envs/b")] == ["/envs/b"]
+    with pytest.raises(ValueError):
+        registry.list_environments(db, order="path; DROP TABLE environments")
+
+    registry.touch(db, "/envs/a2")
+    registry.touch(db, "/envs/unknown")
+    registry.remove(db, ["/envs/b"])
+
+    assert [env["path"] for env in registry.list_environments(db)] == ["/envs/a2", "/envs/a1"]
+
+
+def test_dir_size_counts_hardlinks_once_and_skips_symlinks(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a").write_bytes(b"x" * 10000)
+    base = registry.dir_size(str(tmp_path))
+    assert base >= 10000
+
+    os.link(tmp_path / "a", tmp_path / "sub" / "b")
+    (tmp_path / "link").symlink_to(tmp_path / "sub")
+
+    # The symlink's own blocks (for a long target) count, not the tree it points to.
+    assert registry.dir_size(str(tmp_path)) == base + os.lstat(tmp_path / "link").st_blocks * 512
+    assert registry.dir_size(str(tmp_path / "missing")) == 0
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch, db):
+    monkeypatch.setattr(core, "REGISTRY_DB", db)
+    env_path = tmp_path / "project" / "venv"
+    (env_path / "lib" / "python3.11" / "site-packages").mkdir(parents=True)
+    (env_path / "pyvenv.cfg").write_text("home = /usr/bin\nexecutable = /usr/bin/python3.11\nversion = 3.11.7\n")
+    ezvenv = EZVenv.__new__(EZVenv)
+    ezvenv.envPath = str(env_path)
+    ezvenv.envDir = str(tmp_path / "project")
+    ezvenv._staging = False
+    return ezvenv
+
+
+def test_register_measures_the_size_only_when_site_packages_changed(env, db, monkeypatch):
+    env.register()
+    [row] = registry.find(db, env.envPath)
+    assert (row["interpreter"], row["python_version"], row["project_dir"]) == ("/usr/bin/python3.11", "3.11.7",
+                                                                              env.envDir)
+
+    walks = []
+    monkeypatch.setattr(registry, "dir_size", lambda path: walks.append(path) or 123)
+    env.register(used=True)
+    assert walks == []
+    assert registry.find(db, env.envPath)[0]["last_used"] is not None
+
+    site_packages = env._get_site_packages()
+    os.mkdir(os.path.join(site_packages, "pkg"))
+    stat = os.stat(site_packages)
+    os.utime(site_packages, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    env.register()
+
+    assert walks == [env.envPath]
+    assert registry.find(db, env.envPath)[0]["size"] == 123
+
+
+def test_register_records_the_requirements_hash_after_a_sync(env, db):
+    from ezvenv.lock import requirements_hash
+    requirements = os.path.join(env.envDir, "requirements.txt")
+    with open(requirements, "w") as file:
+        file.write("requests\n")
+
+    env.register(synced=True)
+
+    [row] = registry.find(db, env.envDir)
+    assert row["requirements_hash"] == requirements_hash(requirements)
+    assert row["last_sync"] is not None
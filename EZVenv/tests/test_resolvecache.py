@@ -0,0 +1,59 @@
+import json
+import os
+
+import pytest
+
+from ezvenv import resolvecache
+
+
+@pytest.fixture(autouse=True)
+def clear_preloaded():
+    resolvecache._PRELOADED.clear()
+    yield
+    resolvecache._PRELOADED.clear()
+
+
+def _spy_reads(monkeypatch):
+    reads = []
+    real_load = json.load
+
+    def load(file, *args, **kwargs):
+        reads.append(file.name)
+        return real_load(file, *args, **kwargs)
+    monkeypatch.setattr(resolvecache.json, "load", load)
+    return reads
+
+
+def test_preloaded_entry_stays_valid_after_hits(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path)
+    resolvecache.put(cache_dir, "key", {"alpha": {"version": "1.0"}}, max_entries=10)
+    resolvecache.preload(cache_dir)
+    reads = _spy_reads(monkeypatch)
+
+    for _ in range(3):
+        assert resolvecache.get(cache_dir, "key", ttl=60) == {"alpha": {"version": "1.0"}}
+
+    # Served from memory every time, although each hit refreshes the LRU mtime.
+    assert reads == []
+
+
+def test_rewritten_entry_is_read_again(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path)
+    resolvecache.put(cache_dir, "key", {"alpha": {"version": "1.0"}}, max_entries=10)
+    resolvecache.preload(cache_dir)
+    resolvecache.put(cache_dir, "key", {"alpha": {"version": "2.0"}}, max_entries=10)
+
+    assert resolvecache.get(cache_dir, "key", ttl=60) == {"alpha": {"version": "2.0"}}
+
+
+def test_hit_refreshes_the_lru_stamp(tmp_path):
+    cache_dir = str(tmp_path)
+    for key in ("old", "new"):
+        resolvecache.put(cache_dir, key, {}, max_entries=10)
+    path = os.path.join(cache_dir, "old.json")
+    os.utime(path, (1, 1))
+
+    resolvecache.get(cache_dir, "old", ttl=60)
+    resolvecache.put(cache_dir, "third", {}, max_entries=2)
+
+    assert sorted(os.listdir(cache_dir)) == ["old.json", "third.json"]
@@ -0,0 +1,125 @@
+import os
+
+import pytest
+
+from ezvenv import staging
+
+
+def _env(path, marker):
+    os.makedirs(path)
+    with open(os.path.join(path, "marker"), "w") as file:
+        file.write(marker)
+    return str(path)
+
+
+def _marker(path):
+    with open(os.path.join(path, "marker")) as file:
+        return file.read()
+
+
+@pytest.fixture(params=[True, False], ids=["exchange", "renames"])
+def exchange(request, monkeypatch):
+    # Run every swap/rollback test with renameat2() and with the two-rename fallback.
+    if not request.param:
+        monkeypatch.setattr(staging, "_exchange", lambda a, b: False)
+    return request.param
+
+
+def test_relocate_rewrites_embedded_paths(tmp_path):
+    old = str(tmp_path / "venv.staging-1")
+    new = str(tmp_path / "venv")
+    bin_dir = os.path.join(old, "bin")
+    os.makedirs(bin_dir)
+    with open(os.path.join(old, "pyvenv.cfg"), "w") as file:
+        file.write(f"home = /usr/bin\ncommand = /usr/bin/python3 -m venv {old}\n")
+    script = os.path.join(bin_dir, "tool")
+    with open(script, "w") as file:
+        file.write(f"#!{old}/bin/python\nprint('hi')\n")
+    os.chmod(script, 0o755)
+    os.symlink(os.path.join(old, "bin", "python3"), os.path.join(bin_dir, "python"))
+    os.symlink("/usr/bin/python3", os.path.join(bin_dir, "python3"))
+
+    staging.relocate(old, old, new)
+
+    with open(script) as file:
+        assert file.readline() == f"#!{new}/bin/python\n"
+    assert os.stat(script).st_mode & 0o111
+    with open(os.path.join(old, "pyvenv.cfg")) as file:
+        assert new in file.read()
+    assert os.readlink(os.path.join(bin_dir, "python")) == os.path.join(new, "bin", "python3")
+    assert os.readlink(os.path.join(bin_dir, "python3")) == "/usr/bin/python3"
+
+
+def test_relocate_does_not_write_through_hardlinks(tmp_path):
+    old = str(tmp_path / "old")
+    os.makedirs(os.path.join(old, "bin"))
+    shared = str(tmp_path / "template-activate")
+    with open(shared, "w") as file:
+        file.write(f"VIRTUAL_ENV={old}\n")
+    os.link(shared, os.path.join(old, "bin", "activate"))
+
+    staging.relocate(old, old, str(tmp_path / "new"))
+
+    with open(shared) as file:
+        assert file.read() == f"VIRTUAL_ENV={old}\n"
+
+
+def test_swap_installs_a_new_environment(tmp_path, exchange):
+    env_path = str(tmp_path / "venv")
+    staged = _env(staging.staging_path(env_path), "new")
+
+    staging.swap(staged, env_path)
+
+    assert _marker(env_path) == "new"
+    assert not os.path.exists(staged)
+    assert not os.path.exists(staging.previous_path(env_path))
+
+
+def test_swap_keeps_the_replaced_environment(tmp_path, exchange):
+    env_path = _env(tmp_path / "venv", "v1")
+    staging.swap(_env(staging.staging_path(env_path), "v2"), env_path)
+    staging.swap(_env(staging.staging_path(env_path), "v3"), env_path)
+
+    assert _marker(env_path) == "v3"
+    # Only the environment replaced last is kept.
+    assert _marker(staging.previous_path(env_path)) == "v2"
+    assert not os.path.exists(staging.staging_path(env_path))
+
+
+def test_swap_can_drop_the_replaced_environment(tmp_path, exchange):
+    env_path = _env(tmp_path / "venv", "v1")
+
+    staging.swap(_env(staging.staging_path(env_path), "v2"), env_path, keep_previous=False)
+
+    assert _marker(env_path) == "v2"
+    assert not os.path.exists(staging.previous_path(env_path))
+
+
+def test_rollback_and_roll_forward(tmp_path, exchange):
+    env_path = _env(tmp_path / "venv", "v1")
+    staging.swap(_env(staging.staging_path(env_path), "v2"), env_path)
+
+    assert staging.rollback(env_path)
+    assert _marker(env_path) == "v1"
+    assert _marker(staging.previous_path(env_path)) == "v2"
+
+    assert staging.rollback(env_path)
+    assert _marker(env_path) == "v2"
+    assert not os.path.exists(staging.staging_path(env_path))
+
+
+def test_rollback_without_previous_environment(tmp_path):
+    env_path = _env(tmp_path / "venv", "v1")
+
+    assert not staging.rollback(env_path)
+    assert _marker(env_path) == "v1"
+
+
+def test_remove_stale_deletes_interrupted_builds_only(tmp_path):
+    env_path = _env(tmp_path / "venv", "v1")
+    _env(f"{env_path}.staging-123", "partial")
+    _env(staging.previous_path(env_path), "v0")
+
+    staging.remove_stale(env_path)
+
+    assert sorted(os.listdir(tmp_path)) == ["venv", "venv.previous"]
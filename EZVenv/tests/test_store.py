@@ -0,0 +1,114 @@
+import os
+
+from ezvenv import store
+
+
+def test_put_bytes_stores_identical_content_once(tmp_path):
+    root = str(tmp_path / "store")
+
+    first = store.put_bytes(root, b"print('hello')\n")
+    second = store.put_bytes(root, b"print('hello')\n")
+
+    assert first == second
+    objects = [name for _, _, files in os.walk(os.path.join(root, "objects")) for name in files]
+    assert len(objects) == 1
+
+
+def test_link_bytes_hardlinks_environments_to_one_object(tmp_path):
+    root = str(tmp_path / "store")
+    a = str(tmp_path / "a" / "mod.py")
+    b = str(tmp_path / "b" / "mod.py")
+
+    store.link_bytes(root, b"x = 1\n", a)
+    store.link_bytes(root, b"x = 1\n", b)
+
+    assert os.stat(a).st_ino == os.stat(b).st_ino
+
+
+def test_executable_and_plain_copies_are_separate_objects(tmp_path):
+    root = str(tmp_path / "store")
+
+    plain = store.put_bytes(root, b"#!/bin/sh\n")
+    executable = store.put_bytes(root, b"#!/bin/sh\n", executable=True)
+
+    assert plain != executable
+    assert os.stat(executable).st_mode & 0o111
+    assert not os.stat(plain).st_mode & 0o111
+
+
+def test_put_bytes_replaces_a_truncated_object(tmp_path):
+    root = str(tmp_path / "store")
+    obj = store.put_bytes(root, b"0123456789")
+    os.chmod(obj, 0o644)
+    with open(obj, "wb") as file:
+        file.write(b"01234")
+
+    assert store.put_bytes(root, b"0123456789") == obj
+    with open(obj, "rb") as file:
+        assert file.read() == b"0123456789"
+
+
+def test_verify_removes_objects_whose_content_changed(tmp_path):
+    root = str(tmp_path / "store")
+    good = store.put_bytes(root, b"good")
+    bad = store.put_bytes(root, b"bad!")
+    os.chmod(bad, 0o644)
+    with open(bad, "wb") as file:
+        file.write(b"evil")
+
+    assert store.verify(root) == [bad]
+    assert not os.path.exists(bad)
+    assert os.path.exists(good)
+
+
+def test_dedupe_file_links_equal_files_to_the_same_object(tmp_path):
+    root = str(tmp_path / "store")
+    a = tmp_path / "a.py"
+    b = tmp_path / "b.py"
+    a.write_bytes(b"shared\n")
+    b.write_bytes(b"shared\n")
+
+    assert store.dedupe_file(root, str(a))
+    assert store.dedupe_file(root, str(b))
+
+    assert os.stat(a).st_ino == os.stat(b).st_ino
+    assert b.read_bytes() == b"shared\n"
+
+
+def test_put_bytes_replaces_an_object_corrupted_in_place(tmp_path):
+    root = str(tmp_path / "store")
+    obj = store.put_bytes(root, b"0123456789")
+    os.chmod(obj, 0o644)
+    with open(obj, "wb") as file:
+        file.write(b"9876543210")
+
+    assert store.put_bytes(root, b"0123456789") == obj
+    with open(obj, "rb") as file:
+        assert file.read() == b"0123456789"
+
+
+def test_link_bytes_skips_a_store_on_another_filesystem(tmp_path, monkeypatch):
+    root = str(tmp_path / "store")
+    target = str(tmp_path / "env" / "bin" / "tool")
+    real_stat = os.stat
+
+    class OtherDevice:
+        def __init__(self, result):
+            self.result = result
+
+        def __getattr__(self, name):
+            return getattr(self.result, name)
+
+        st_dev = -1
+
+    def stat(path, *args, **kwargs):
+        result = real_stat(path, *args, **kwargs)
+        return OtherDevice(result) if path == root else result
+    monkeypatch.setattr(store.os, "stat", stat)
+
+    assert store.link_bytes(root, b"#!/bin/sh\n", target, executable=True) == "copy"
+
+    with open(target, "rb") as file:
+        assert file.read() == b"#!/bin/sh\n"
+    assert real_stat(target).st_mode & 0o111
+    assert not os.path.exists(os.path.join(root, "objects"))
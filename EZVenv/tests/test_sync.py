@@ -0,0 +1,161 @@
+import os
+import platform
+import shutil
+import sys
+
+import pytest
+
+from ezvenv import lock as lockfile
+from ezvenv.core import EZVenv
+
+INDEX = {"alpha": "1.5", "beta": "2.5", "gamma": "0.3"}
+
+
+class FakeBackend:
+    """
+    Installs and removes distributions by creating and deleting their .dist-info
+    directories, so the environment's real metadata and state file are used.
+    """
+
+    def __init__(self, site_packages):
+        self.site_packages = site_packages
+        self.installed = []
+        self.removed = []
+
+    def sync_project(self, upgrade=False):
+        return False
+
+    def install_locked(self, packages):
+        for package in packages:
+            self._remove(package["name"])
+            os.makedirs(os.path.join(self.site_packages, f"{package['name']}-{package['version']}.dist-info"))
+            self.installed.append((package["name"], package["version"]))
+
+    def uninstall(self, names):
+        for name in names:
+            self._remove(name)
+            self.removed.append(name)
+
+    def _remove(self, name):
+        for entry in os.listdir(self.site_packages):
+            if entry.split("-")[0] == name:
+                shutil.rmtree(os.path.join(self.site_packages, entry))
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    """
+    An EZVenv for tmp_path whose environment is a bare site-packages directory.
+    Only the backend and the resolver (both need pip and an index) are replaced;
+    "resolutions" records the constraints every resolution was asked to respect.
+    """
+    (tmp_path / "requirements.txt").write_text("alpha>=1.0\nbeta>=2.0\n")
+    env_path = tmp_path / "venv"
+    site_packages = env_path / "lib" / "python3.11" / "site-packages"
+    site_packages.mkdir(parents=True)
+    (env_path / "pyvenv.cfg").write_text(f"version = {platform.python_version()}\n")
+    ezvenv = EZVenv.__new__(EZVenv)
+    ezvenv.envDir = str(tmp_path)
+    ezvenv.envPath = str(env_path)
+    ezvenv.pkgManager = "native"
+    ezvenv.backend = FakeBackend(str(site_packages))
+    ezvenv.resolutions = []
+
+    def resolve(reqPath, requirements, refresh=False, constraints=None):
+        ezvenv.resolutions.append((refresh, dict(constraints or {})))
+        versions = dict(INDEX, **(constraints or {}))
+        return {name: {"version": versions[name]} for name in INDEX}
+
+    monkeypatch.setattr(ezvenv, "_get_backend", lambda: ezvenv.backend)
+    monkeypatch.setattr(ezvenv, "_resolve_cached", resolve)
+    return ezvenv
+
+
+def _install(env, **versions):
+    env.backend.install_locked([{"name": name, "version": version} for name, version in versions.items()])
+    env.backend.installed.clear()
+
+
+def _write_lock(env, packages, requirements):
+    report = {"environment": {"python_full_version": platform.python_version(), "sys_platform": sys.platform,
+                              "platform_machine": platform.machine()}}
+    data = lockfile.build_lock(report, requirements, os.path.join(env.envDir, "requirements.txt"))
+    data["packages"] = {name: {"version": version, "dependencies": []} for name, version in packages.items()}
+    lockfile.write(env._lock_path(), data)
+
+
+def test_install_keeps_satisfied_packages_at_their_version(env):
+    # alpha is satisfied but older than the index; beta is missing.
+    _install(env, alpha="1.0", gamma="0.1")
+
+    env.sync()
+
+    refresh, constraints = env.resolutions[0]
+    assert not refresh
+    assert constraints == {"alpha": "1.0", "gamma": "0.1"}
+    assert env.backend.installed == [("beta", "2.5")]
+
+
+def test_install_with_everything_satisfied_does_not_resolve(env):
+    _install(env, alpha="1.0", beta="2.0")
+
+    env.sync()
+
+    assert env.resolutions == []
+    assert env.backend.installed == []
+
+
+def test_install_replaces_an_unsatisfying_version(env):
+    _install(env, alpha="0.9", beta="2.0")
+
+    env.sync()
+
+    refresh, constraints = env.resolutions[0]
+    assert "alpha" not in constraints
+    assert constraints["beta"] == "2.0"
+    assert env.backend.installed == [("alpha", "1.5"), ("gamma", "0.3")]
+
+
+def test_upgrade_resolves_fresh_without_pins(env):
+    _install(env, alpha="1.0", beta="2.0", gamma="0.1")
+
+    env.sync(upgrade=True, force=True)
+
+    assert env.resolutions == [(True, {})]
+    assert env.backend.installed == [("alpha", "1.5"), ("beta", "2.5"), ("gamma", "0.3")]
+
+
+def test_sync_removes_requirements_dropped_since_the_last_sync(env):
+    env.sync()
+    with open(os.path.join(env.envDir, "requirements.txt"), "w") as file:
+        file.write("alpha>=1.0\n")
+
+    env.sync()
+
+    # beta was a requirement; gamma was only ever a dependency and is left alone.
+    assert env.backend.removed == ["beta"]
+
+
+def test_sync_without_the_lock_keeps_its_transitive_packages(env):
+    requirements = [("alpha", ">=1.0", "alpha>=1.0"), ("beta", ">=2.0", "beta>=2.0")]
+    _write_lock(env, {"alpha": "1.5", "beta": "2.5", "gamma": "0.3"}, requirements)
+    env.sync()
+    assert sorted(env.backend.installed) == [("alpha", "1.5"), ("beta", "2.5"), ("gamma", "0.3")]
+
+    # With the lock gone the next sync resolves; the lock's dependencies must survive it.
+    os.remove(env._lock_path())
+    env.sync(force=True)
+
+    assert env.backend.removed == []
+    assert env._installed_distributions() == {"alpha": "1.5", "beta": "2.5", "gamma": "0.3"}
+
+
+def test_lock_sync_removes_packages_dropped_from_the_lock(env):
+    requirements = [("alpha", ">=1.0", "alpha>=1.0"), ("beta", ">=2.0", "beta>=2.0")]
+    _write_lock(env, {"alpha": "1.5", "beta": "2.5", "gamma": "0.3"}, requirements)
+    env.sync()
+
+    _write_lock(env, {"alpha": "1.5", "beta": "2.5"}, requirements)
+    env.sync(force=True)
+
+    assert env.backend.removed == ["gamma"]
@@ -0,0 +1,103 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from ezvenv import template
+
+
+@pytest.fixture
+def fake_venv(monkeypatch):
+    """
+    Replace the venv and pip subprocesses of a template build with a minimal
+    environment whose files embed the build path; "builds" counts the builds.
+    """
+    builds = []
+
+    def run(command, check=False, **kwargs):
+        if command[1:3] == ["-m", "venv"]:
+            path = command[-1]
+            builds.append(path)
+            os.makedirs(os.path.join(path, "bin"), exist_ok=True)
+            with open(os.path.join(path, "pyvenv.cfg"), "w") as file:
+                file.write(f"home = /usr/bin\ncommand = python -m venv {path}\n")
+            with open(os.path.join(path, "bin", "pip"), "w") as file:
+                file.write(f"#!{path}/bin/python\n")
+            os.symlink(os.path.join(path, "bin", "python3"), os.path.join(path, "bin", "python"))
+            os.makedirs(os.path.join(path, "lib", "site-packages"))
+            with open(os.path.join(path, "lib", "site-packages", "module.py"), "w") as file:
+                file.write("x = 1\n")
+    monkeypatch.setattr(template.process, "run", run)
+    return builds
+
+
+def _build(tmp_path, max_age=3600):
+    return template.ensure_template(sys.executable, str(tmp_path / "templates"), ["pip"], max_age,
+                                    lock_dir=str(tmp_path / "locks"))
+
+
+def test_template_is_built_once_and_reused(tmp_path, fake_venv):
+    first = _build(tmp_path)
+    second = _build(tmp_path)
+
+    assert first == second
+    assert len(fake_venv) == 1
+    assert template.read_marker(first)["python"] == sys.executable
+
+
+def test_stale_template_is_rebuilt(tmp_path, fake_venv):
+    path = _build(tmp_path)
+    marker_path = os.path.join(path, template.TEMPLATE_MARKER)
+    with open(marker_path) as file:
+        marker = json.load(file)
+    marker["created"] -= 7200
+    with open(marker_path, "w") as file:
+        json.dump(marker, file)
+
+    _build(tmp_path)
+
+    assert len(fake_venv) == 2
+    assert not [entry for entry in os.listdir(tmp_path / "templates") if entry.startswith(".")]
+
+
+def test_clone_rewrites_the_build_path(tmp_path, fake_venv):
+    path = _build(tmp_path)
+    build_path = template.read_marker(path)["buildPath"]
+    dest = str(tmp_path / "venv")
+
+    template.clone_template(path, dest)
+
+    with open(os.path.join(dest, "bin", "pip")) as file:
+        assert file.read() == f"#!{dest}/bin/python\n"
+    with open(os.path.join(dest, "pyvenv.cfg")) as file:
+        assert build_path not in file.read()
+    assert os.readlink(os.path.join(dest, "bin", "python")) == os.path.join(dest, "bin", "python3")
+    assert not os.path.exists(os.path.join(dest, template.TEMPLATE_MARKER))
+    # Files without the build path are hardlinked from the template.
+    module = os.path.join("lib", "site-packages", "module.py")
+    assert os.stat(os.path.join(dest, module)).st_ino == os.stat(os.path.join(path, module)).st_ino
+
+
+def test_rebuild_waits_for_clones_in_progress(tmp_path, fake_venv):
+    path = _build(tmp_path)
+    lock_dir = str(tmp_path / "locks")
+    events = []
+
+    def rebuild():
+        _build(tmp_path, max_age=0)
+        events.append("replaced")
+
+    with template.using(path, lock_dir):
+        thread = threading.Thread(target=rebuild)
+        thread.start()
+        time.sleep(0.3)
+        # The new template is built, but the old one is not removed while it is being cloned.
+        assert len(fake_venv) == 2
+        assert template.read_marker(path) is not None
+        events.append("clone done")
+    thread.join()
+
+    assert events == ["clone done", "replaced"]
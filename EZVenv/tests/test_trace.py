@@ -0,0 +1,102 @@
+import asyncio
+import json
+import sys
+
+import pytest
+
+from ezvenv import aio, process, trace
+
+
+@pytest.fixture
+def tracing(tmp_path, monkeypatch):
+    """
+    Enable tracing into tmp_path/trace.jsonl and count the flushes.
+    """
+    monkeypatch.setattr(trace, "_path", None)
+    monkeypatch.setattr(trace, "_pid", None)
+    monkeypatch.setattr(trace, "_spans", [])
+    monkeypatch.delenv(trace._PARENT_ENV, raising=False)
+    flushes = []
+    original = trace.flush
+    monkeypatch.setattr(trace, "flush", lambda: flushes.append(len(trace._spans)) or original())
+
+    def enable(name="trace.jsonl"):
+        trace.enable(str(tmp_path / name))
+        return tmp_path / name
+
+    enable.flushes = flushes
+    return enable
+
+
+def _read(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_disabled_tracing_records_nothing(tracing, tmp_path):
+    with trace.span("outer"):
+        trace.record("measured", 0.0, 1.0, "ok")
+    assert trace._spans == [] and tracing.flushes == []
+
+
+def test_nested_spans_are_written_once_when_the_root_ends(tracing):
+    path = tracing()
+    with trace.span("outer", project="p"):
+        with trace.span("inner", "step") as inner:
+            inner.child_max_rss = 2048
+        trace.record("worker", 1.0, 0.5, "exit 1", category="project")
+        assert tracing.flushes == []
+
+    assert tracing.flushes == [3]
+    inner, worker, outer = _read(path)
+    assert [inner["name"], worker["name"], outer["name"]] == ["inner", "worker", "outer"]
+    assert outer["childMaxRss"] == 2048 and outer["args"] == {"project": "p"}
+    assert worker["status"] == "exit 1" and worker["cat"] == "project"
+
+
+def test_spans_in_aio_call_workers_nest_under_the_caller(tracing):
+    path = tracing()
+
+    def step():
+        with trace.span("step"):
+            process.run([sys.executable, "-c", "raise SystemExit(3)"])
+
+    async def main():
+        with trace.span("root"):
+            await asyncio.gather(aio.call(step), aio.call(step))
+
+    asyncio.run(main())
+
+    assert tracing.flushes == [5]
+    spans = _read(path)
+    assert sorted(span["name"] for span in spans) == ["python -c"] * 2 + ["root"] + ["step"] * 2
+    subprocess_span = next(span for span in spans if span["cat"] == "subprocess")
+    assert subprocess_span["status"] == "exit 3" and subprocess_span["args"]["exitCode"] == 3
+    assert spans[-1]["name"] == "root" and spans[-1]["childMaxRss"] > 0
+
+
+def test_failed_span_status(tracing):
+    path = tracing()
+    with pytest.raises(RuntimeError):
+        with trace.span("broken"):
+            raise RuntimeError("boom")
+    with pytest.raises(SystemExit):
+        with trace.span("exiting"):
+            raise SystemExit(1)
+
+    assert [span["status"] for span in _read(path)] == ["error", "exit"]
+
+
+def test_chrome_trace_survives_a_re_exec(tracing):
+    path = tracing("trace.json")
+    with trace.span("before exec"):
+        pass
+
+    events = json.loads(path.read_text())["traceEvents"]
+    assert events[0]["ph"] == "X" and events[0]["args"]["status"] == "ok"
+
+    # activate_env re-executes the process (same pid, EZVENV_TRACE_PARENT kept).
+    tracing("trace.json")
+    with trace.span("after exec"):
+        pass
+
+    assert [event["name"] for event in json.loads(path.read_text())["traceEvents"]] == ["before exec", "after exec"]
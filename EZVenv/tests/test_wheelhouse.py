@@ -0,0 +1,128 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from ezvenv import wheelhouse
+
+
+def _wheel(wheel_dir, name, size, age):
+    path = os.path.join(wheel_dir, name)
+    with open(path, "wb") as file:
+        file.write(b"\0" * size)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_evict_removes_least_recently_used_wheels(tmp_path):
+    wheel_dir = str(tmp_path)
+    _wheel(wheel_dir, "old-1.0-py3-none-any.whl", 1000, age=300)
+    _wheel(wheel_dir, "mid-1.0-py3-none-any.whl", 1000, age=200)
+    _wheel(wheel_dir, "new-1.0-py3-none-any.whl", 1000, age=100)
+
+    assert wheelhouse.evict(wheel_dir, 2000) == ["old-1.0-py3-none-any.whl"]
+    assert wheelhouse.size(wheel_dir) == 2000
+
+
+def test_size_and_evict_ignore_the_lock_and_refresh_stamps(tmp_path):
+    wheel_dir = str(tmp_path)
+    _wheel(wheel_dir, "a-1.0-py3-none-any.whl", 1000, age=100)
+    with wheelhouse.lock(wheel_dir):
+        pass
+
+    assert wheelhouse.size(wheel_dir) == 1000
+    assert wheelhouse.evict(wheel_dir, 0) == ["a-1.0-py3-none-any.whl"]
+    assert os.path.exists(os.path.join(wheel_dir, wheelhouse.LOCK_FILE))
+
+
+def test_evict_skips_a_wheelhouse_in_use(tmp_path):
+    wheel_dir = str(tmp_path)
+    _wheel(wheel_dir, "a-1.0-py3-none-any.whl", 1000, age=100)
+    holder = subprocess.Popen(
+        [sys.executable, "-c", "import sys, time; from ezvenv import wheelhouse\n"
+                               f"with wheelhouse.lock({wheel_dir!r}):\n"
+                               "    print('held', flush=True); sys.stdin.read()"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    try:
+        assert holder.stdout.readline() == "held\n"
+        assert wheelhouse.evict(wheel_dir, 0, wait=False) == []
+    finally:
+        holder.communicate("")
+    assert wheelhouse.evict(wheel_dir, 0, wait=False) == ["a-1.0-py3-none-any.whl"]
+
+
+def test_touch_used_refreshes_only_wheelhouse_files(tmp_path):
+    wheel_dir = tmp_path / "wheels"
+    wheel_dir.mkdir()
+    used = _wheel(str(wheel_dir), "used-1.0-py3-none-any.whl", 10, age=1000)
+    other = _wheel(str(tmp_path), "elsewhere-1.0-py3-none-any.whl", 10, age=1000)
+    report = tmp_path / "report.json"
+    report.write_text(json.dumps({"install": [
+        {"download_info": {"url": f"file://{used}"}},
+        {"download_info": {"url": f"file://{other}"}},
+        {"download_info": {"url": "https://files.example/x-1.0-py3-none-any.whl"}},
+    ]}))
+
+    wheelhouse.touch_used(str(report), str(wheel_dir))
+
+    assert time.time() - os.path.getmtime(used) < 60
+    assert time.time() - os.path.getmtime(other) > 900
+
+
+class FakePip:
+    """
+    Records the pip commands of wheelhouse.install(); the next fail_offline
+    offline installs fail.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.fail_offline = 0
+
+    def run(self, command, check=False, **kwargs):
+        kind = "wheel" if command[1] == "wheel" else "install"
+        self.calls.append((kind, "--upgrade" in command))
+        failed = kind == "install" and self.fail_offline > 0
+        if failed:
+            self.fail_offline -= 1
+            if check:
+                raise subprocess.CalledProcessError(1, command)
+        return subprocess.CompletedProcess(command, 1 if failed else 0, "", "")
+
+
+@pytest.fixture
+def pip(monkeypatch):
+    fake = FakePip()
+    monkeypatch.setattr(wheelhouse.process, "run", fake.run)
+    return fake
+
+
+def test_install_fills_the_wheelhouse_only_on_a_miss(tmp_path, pip):
+    wheelhouse.install("pip", ["demo"], str(tmp_path))
+    assert pip.calls == [("install", False)]
+
+    pip.calls.clear()
+    pip.fail_offline = 1
+    wheelhouse.install("pip", ["demo"], str(tmp_path))
+    assert pip.calls == [("install", False), ("wheel", False), ("install", False)]
+
+
+def test_offline_install_never_fills(tmp_path, pip):
+    pip.fail_offline = 1
+
+    with pytest.raises(subprocess.CalledProcessError):
+        wheelhouse.install("pip", ["demo"], str(tmp_path), offline=True)
+    assert pip.calls == [("install", False)]
+
+
+def test_upgrade_refreshes_the_wheelhouse_once_per_interval(tmp_path, pip):
+    wheelhouse.install("pip", ["demo"], str(tmp_path), upgrade=True)
+    wheelhouse.install("pip", ["demo"], str(tmp_path), upgrade=True)
+
+    # The second upgrade of the same requirements runs pip once, from the wheelhouse.
+    assert pip.calls == [("wheel", False), ("install", True), ("install", True)]